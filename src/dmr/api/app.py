@@ -1,18 +1,33 @@
 from __future__ import annotations
+import asyncio
 import os
 import time
 import uuid
+from contextlib import asynccontextmanager
 from typing import List
 import redis
+import redis.asyncio as aioredis
 import numpy as np
 from fastapi import FastAPI
 from pydantic import BaseModel
 from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 
 from dmr.vectorize import DeterministicVectorizer
-from dmr.index import FaissHNSWHotIndex
-from dmr.storage import RedisHotStorage, SQLiteColdStore, ColdRow
-from dmr.core.retrieval import DeterministicRetriever, RetrievalPolicy, EvidenceItem
+from dmr.index import FaissHNSWHotIndex, HotIndexSnapshotter, PackedHotIndex
+from dmr.index.ef_model import EfCostModel
+from dmr.index.faiss_hot import DEFAULT_FLAT_THRESHOLD
+from dmr.storage import (
+    AsyncRedisHotStorage,
+    RedisHotStorage,
+    SQLiteColdStore,
+    ColdRow,
+)
+from dmr.core.retrieval import (
+    AsyncDeterministicRetriever,
+    RetrievalPolicy,
+    EvidenceItem,
+)
+from dmr.core.pre_cache import PreResponseCache, pre_cache_key
 from dmr.core.signatures import pack_signature, sha256_hex
 from dmr.metrics import LAT, mark
 
@@ -36,6 +51,7 @@ class PreResponse(BaseModel):
     pack_signature: str
     evidence: List[EvidenceOut]
     evidence_block: str
+    degraded: List[str] = []
 
 
 class PostRequest(BaseModel):
@@ -65,27 +81,135 @@ def build_components():
     dim = int(os.environ.get("DMR_VECTOR_DIM", str(vectorizer.dim)))
 
     redis_url = os.environ.get("DMR_REDIS_URL", "redis://localhost:6379/0")
-    r = redis.Redis.from_url(redis_url, decode_responses=True)
-    hot_storage = RedisHotStorage(r)
+    # socket_timeout acota cada llamada a Redis (también el fetch del tier hot,
+    # que además se cancela al vencer su deadline)
+    socket_timeout = (
+        float(os.environ.get("DMR_REDIS_SOCKET_TIMEOUT_MS", "500")) / 1000.0
+    )
+    r = aioredis.Redis.from_url(
+        redis_url, decode_responses=True, socket_timeout=socket_timeout
+    )
+    hot_storage = AsyncRedisHotStorage(r)
 
     faiss_dir = os.environ.get("DMR_FAISS_DIR", "./dmr_faiss_hot")
-    hot_index = FaissHNSWHotIndex(dim=dim, index_dir=faiss_dir, omp_threads=1)
+    # DMR_HOT_LAYOUT=per_user (un índice por usuario) | packed (particiones)
+    if os.environ.get("DMR_HOT_LAYOUT", "per_user").strip().lower() == "packed":
+        # las particiones no se expulsan: un presupuesto de RAM no se cumpliría
+        if int(os.environ.get("DMR_HOT_MAX_BYTES", "0") or 0):
+            raise RuntimeError(
+                "DMR_HOT_MAX_BYTES is not supported with DMR_HOT_LAYOUT=packed"
+            )
+        hot_index = PackedHotIndex(
+            dim=dim,
+            index_dir=faiss_dir,
+            partitions=int(os.environ.get("DMR_HOT_PARTITIONS", "64")),
+            omp_threads=1,
+            wal_fsync=os.environ.get("DMR_HOT_WAL_FSYNC", "0") == "1",
+        )
+    else:
+        # tabla de `dmr calibrate-hot`: efSearch por consulta según el presupuesto
+        ef_table = os.environ.get("DMR_EF_TABLE", "")
+        # índices antiguos sin ids: su turn_id por posición sale del idxmap
+        # (la carga corre en el executor, de ahí el cliente síncrono)
+        legacy = RedisHotStorage(
+            redis.Redis.from_url(
+                redis_url, decode_responses=True, socket_timeout=socket_timeout
+            )
+        )
+        # presupuesto de RAM para índices hot residentes (0 = sin límite)
+        hot_index = FaissHNSWHotIndex(
+            dim=dim,
+            index_dir=faiss_dir,
+            omp_threads=1,
+            max_bytes=int(os.environ.get("DMR_HOT_MAX_BYTES", str(1 << 30))),
+            wal_fsync=os.environ.get("DMR_HOT_WAL_FSYNC", "0") == "1",
+            flat_threshold=int(
+                os.environ.get("DMR_HOT_FLAT_THRESHOLD", str(DEFAULT_FLAT_THRESHOLD))
+            ),
+            ef_model=EfCostModel.load(ef_table) if ef_table else None,
+            legacy_turns=lambda user_key, n: legacy.get_index_map(user_key, range(n)),
+        )
 
     cold_path = os.environ.get("DMR_COLD_SQLITE", "./dmr_cold.sqlite3")
     cold_store = SQLiteColdStore(path=cold_path)
 
-    retriever = DeterministicRetriever(
-        vectorizer, hot_index, hot_storage, cold_store, policy
+    # FAISS/SQLite son bloqueantes: executor acotado compartido por la app
+    retriever = AsyncDeterministicRetriever(
+        vectorizer,
+        hot_index,
+        hot_storage,
+        cold_store,
+        policy,
+        max_workers=int(os.environ.get("DMR_BLOCKING_WORKERS", "8")),
+    )
+    # DMR_PRE_CACHE=off|local|redis (redis: compartida entre réplicas). local
+    # solo vale con un único proceso: un /post o /forget servido por otro
+    # worker no invalidaría sus entradas. Por defecto: redis con varios
+    # workers (WEB_CONCURRENCY), off si no
+    workers = int(os.environ.get("WEB_CONCURRENCY", "1") or 1)
+    cache_mode = (
+        os.environ.get("DMR_PRE_CACHE", "redis" if workers > 1 else "off")
+        .strip()
+        .lower()
+    )
+    if cache_mode == "local" and workers > 1:
+        raise RuntimeError("DMR_PRE_CACHE=local requires a single worker process")
+    pre_cache = None
+    if cache_mode in ("local", "redis"):
+        pre_cache = PreResponseCache(
+            max_entries=int(os.environ.get("DMR_PRE_CACHE_MAX", "10000")),
+            redis=r if cache_mode == "redis" else None,
+            ttl_s=int(os.environ.get("DMR_PRE_CACHE_TTL_S", "300")),
+        )
+    return (
+        retriever,
+        policy,
+        vectorizer,
+        hot_index,
+        hot_storage,
+        cold_store,
+        pre_cache,
     )
-    return retriever, policy, vectorizer, hot_index, hot_storage, cold_store
 
 
-retriever, policy, vectorizer, hot_index, hot_storage, cold_store = build_components()
+(
+    retriever,
+    policy,
+    vectorizer,
+    hot_index,
+    hot_storage,
+    cold_store,
+    pre_cache,
+) = build_components()
+
+POLICY_DICT = {
+    "threshold": policy.threshold,
+    "k_final": policy.k_final,
+    "max_chars": policy.max_chars,
+    "budget_ms_hot": policy.budget_ms_hot,
+    "budget_ms_cold": policy.budget_ms_cold,
+}
+
+# snapshots de índices hot fuera del camino de /post (el WAL cubre el hueco)
+snapshotter = HotIndexSnapshotter(
+    hot_index, interval_s=float(os.environ.get("DMR_SNAPSHOT_INTERVAL_S", "5"))
+)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    snapshotter.start()
+    try:
+        yield
+    finally:
+        await asyncio.to_thread(snapshotter.stop)
+
 
 app = FastAPI(
     title="Deterministic Memory Router (DMR)",
     description="Deterministic, offline memory layer. No cloud. No randomness. No prompt saturation.",
     version="2026.0.2",
+    lifespan=lifespan,
 )
 
 
@@ -101,37 +225,46 @@ def _format_block(ev: List[EvidenceItem]) -> str:
 
 
 @app.post("/pre", response_model=PreResponse)
-def pre(req: PreRequest):
+async def pre(req: PreRequest):
     mark("pre")
     t0 = time.perf_counter()
     try:
-        ev = retriever.retrieve(req.tenant_id, req.user_id, req.query)
-        policy_dict = {
-            "threshold": policy.threshold,
-            "k_final": policy.k_final,
-            "max_chars": policy.max_chars,
-            "budget_ms_hot": policy.budget_ms_hot,
-            "budget_ms_cold": policy.budget_ms_cold,
-        }
+        user_key = f"{req.tenant_id}:{req.user_id}"
+        if pre_cache is not None:
+            ckey = pre_cache_key(req.query, POLICY_DICT)
+            epoch, cached = await pre_cache.get(user_key, ckey)
+            if cached is not None:
+                return PreResponse(**cached)
+
+        res = await retriever.retrieve_with_status(
+            req.tenant_id, req.user_id, req.query
+        )
+        ev = res.evidence
         sig = pack_signature(
             req.tenant_id,
             req.user_id,
             req.query,
-            policy_dict,
+            POLICY_DICT,
             [(e.turn_id, e.signature, e.score, e.source) for e in ev],
+            degraded=res.degraded,
         )
-        return PreResponse(
+        out = PreResponse(
             reliable=(len(ev) > 0),
             pack_signature=sig,
             evidence=[EvidenceOut(**e.__dict__) for e in ev],
             evidence_block=_format_block(ev),
+            degraded=list(res.degraded),
         )
+        # una respuesta degradada depende del timing: no se cachea
+        if pre_cache is not None and not res.degraded:
+            await pre_cache.put(user_key, epoch, ckey, out.model_dump())
+        return out
     finally:
         LAT.labels(endpoint="pre").observe((time.perf_counter() - t0) * 1000.0)
 
 
 @app.post("/post")
-def post(req: PostRequest):
+async def post(req: PostRequest):
     mark("post")
     t0 = time.perf_counter()
     try:
@@ -142,11 +275,15 @@ def post(req: PostRequest):
         ts = time.time()
 
         v = vectorizer.text_to_vector(text).astype(np.float32)
-        hot_index.add(user_key, v, persist=False)
-        hot_storage.put_turn(user_key, turn_id, text, signature, ts)
-        cold_store.put_many(
-            [ColdRow(req.tenant_id, req.user_id, turn_id, signature, ts, text)]
+        # el vector va con id estable derivado de turn_id: sin orden que mantener
+        await retriever.run_blocking(hot_index.add, user_key, v, False, turn_id)
+        await hot_storage.put_turn(user_key, turn_id, text, signature, ts)
+        await retriever.run_blocking(
+            cold_store.put_many,
+            [ColdRow(req.tenant_id, req.user_id, turn_id, signature, ts, text)],
         )
+        if pre_cache is not None:
+            await pre_cache.bump(user_key)  # tras escribir: /pre posteriores recalculan
 
         return {"status": "ok", "turn_id": turn_id, "signature": signature}
     finally:
@@ -154,10 +291,12 @@ def post(req: PostRequest):
 
 
 @app.post("/forget")
-def forget(req: ForgetRequest):
+async def forget(req: ForgetRequest):
     mark("forget")
     user_key = f"{req.tenant_id}:{req.user_id}"
-    ok = hot_storage.tombstone(user_key, req.turn_id)
+    ok = await hot_storage.tombstone(user_key, req.turn_id)
+    if ok and pre_cache is not None:
+        await pre_cache.bump(user_key)
     return {"status": "ok" if ok else "not_found", "turn_id": req.turn_id}
 
 
@@ -0,0 +1,157 @@
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from dmr.index import FaissHNSWHotIndex, PackedHotIndex
+
+# Benchmark del layout hot: un índice HNSW por usuario frente a particiones
+# empaquetadas (PackedHotIndex). Mismos datos, mismas consultas, misma semilla.
+
+
+def _dir_stats(path: str) -> Tuple[int, int]:
+    files, size = 0, 0
+    for name in os.listdir(path):
+        p = os.path.join(path, name)
+        if os.path.isfile(p) and os.path.getsize(p) > 0:
+            files += 1
+            size += os.path.getsize(p)
+    return files, size
+
+
+def _pct(xs: List[float], p: float) -> float:
+    return round(float(np.percentile(np.asarray(xs), p)), 6) if xs else 0.0
+
+
+def _recall(got: List[List[int]], truth: List[List[int]]) -> float:
+    hit = sum(len(set(g) & set(t)) for g, t in zip(got, truth))
+    tot = sum(len(t) for t in truth)
+    return round(hit / tot, 6) if tot else 1.0
+
+
+def _bench_layout(
+    idx: Any,
+    index_dir: str,
+    data: Dict[str, np.ndarray],
+    queries: List[Tuple[str, np.ndarray]],
+    truth: List[List[int]],
+    k: int,
+    batch: int,
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    for key, vs in data.items():
+        for v in vs:
+            idx.add(key, v)
+    build_s = time.perf_counter() - t0
+    t0 = time.perf_counter()
+    idx.snapshot_dirty()
+    persist_s = time.perf_counter() - t0
+    files, disk = _dir_stats(index_dir)
+
+    lat: List[float] = []
+    got: List[List[int]] = []
+    for key, q in queries:
+        t0 = time.perf_counter()
+        pairs = idx.search_rerank_exact(key, q, k_candidates=k)
+        lat.append((time.perf_counter() - t0) * 1e3)
+        got.append([i for i, _ in pairs])
+
+    t0 = time.perf_counter()
+    for s in range(0, len(queries), batch):
+        chunk = queries[s : s + batch]
+        if hasattr(idx, "search_batch"):
+            idx.search_batch(chunk, k=k)
+        else:
+            for key, q in chunk:
+                idx.search_rerank_exact(key, q, k_candidates=k)
+    batch_s = time.perf_counter() - t0
+
+    return {
+        "build_s": round(build_s, 6),
+        "persist_s": round(persist_s, 6),
+        "files": files,
+        "disk_bytes": disk,
+        "single_ms_p50": _pct(lat, 50),
+        "single_ms_p99": _pct(lat, 99),
+        "batch_qps": round(len(queries) / batch_s, 3) if batch_s > 0 else 0.0,
+        f"recall_at_{k}": _recall(got, truth),
+    }
+
+
+def run_bench_hot(
+    users: int = 2000,
+    per_user: int = 20,
+    dim: int = 64,
+    queries: int = 1000,
+    partitions: int = 64,
+    k: int = 10,
+    batch: int = 64,
+    seed: int = 0,
+    work_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    rng = np.random.default_rng(seed)
+    data = {
+        f"B:u{u}": rng.random((per_user, dim), dtype=np.float32) for u in range(users)
+    }
+    keys = list(data)
+    qs = [
+        (keys[int(rng.integers(len(keys)))], rng.random(dim, dtype=np.float32))
+        for _ in range(queries)
+    ]
+    truth = []
+    for key, q in qs:
+        d = ((data[key].astype(np.float64) - q) ** 2).sum(axis=1)
+        truth.append(sorted(range(len(d)), key=lambda j: (d[j], j))[:k])
+
+    layouts: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        per_user_dir = os.path.join(tmp, "per_user")
+        packed_dir = os.path.join(tmp, "packed")
+        layouts["per_user"] = _bench_layout(
+            FaissHNSWHotIndex(dim=dim, index_dir=per_user_dir),
+            per_user_dir,
+            data,
+            qs,
+            truth,
+            k,
+            batch,
+        )
+        layouts["packed"] = _bench_layout(
+            PackedHotIndex(dim=dim, index_dir=packed_dir, partitions=partitions),
+            packed_dir,
+            data,
+            qs,
+            truth,
+            k,
+            batch,
+        )
+    return {
+        "users": users,
+        "per_user": per_user,
+        "dim": dim,
+        "queries": queries,
+        "partitions": partitions,
+        "k": k,
+        "batch": batch,
+        "seed": seed,
+        "layouts": layouts,
+    }
+
+
+def run_bench_hot_cli(out: str, **kwargs: Any) -> int:
+    report = run_bench_hot(**kwargs)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    k = report["k"]
+    for name, r in report["layouts"].items():
+        print(
+            f"[bench-hot] {name}: files={r['files']} disk={r['disk_bytes']}B "
+            f"p50={r['single_ms_p50']}ms p99={r['single_ms_p99']}ms "
+            f"batch_qps={r['batch_qps']} recall@{k}={r[f'recall_at_{k}']}"
+        )
+    return 0
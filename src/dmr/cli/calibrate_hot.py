@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from dmr.index.ef_model import EF_TABLE_SCHEMA
+from dmr.index.faiss_hot import HNSW_EF_CONSTRUCTION, HNSW_M, create_hnsw
+
+try:
+    import faiss  # type: ignore
+except Exception as e:  # pragma: no cover
+    raise RuntimeError("faiss is required for calibrate-hot") from e
+
+# Calibración recall/latencia del índice hot: por tamaño, latencia de un scan
+# flat y, por efSearch, latencia y recall@k de HNSW frente al flat exacto.
+# La tabla resultante alimenta EfCostModel (DMR_EF_TABLE).
+
+DEFAULT_SIZES = (256, 1_000, 4_000, 16_000)
+DEFAULT_EFS = (16, 32, 64, 128, 256)
+
+
+def _latencies(fn, qs: np.ndarray) -> List[float]:
+    out = []
+    for q in qs:
+        t0 = time.perf_counter()
+        fn(q.reshape(1, -1))
+        out.append((time.perf_counter() - t0) * 1e3)
+    return out
+
+
+def _ms(xs: List[float], p: float) -> float:
+    return round(float(np.percentile(np.asarray(xs), p)), 6)
+
+
+def calibrate(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    efs: Sequence[int] = DEFAULT_EFS,
+    dim: int = 64,
+    queries: int = 200,
+    k: int = 10,
+    seed: int = 0,
+    vectors: Optional[np.ndarray] = None,
+    recall_target: float = 0.99,
+) -> Dict[str, Any]:
+    """
+    vectors: muestra real (n, dim) de la que se toman índice y consultas; sin
+    ella se usan vectores uniformes (cota pesimista del recall de HNSW). Las
+    consultas se apartan sin reemplazo y los tamaños que el resto de la
+    muestra no cubre se omiten.
+    """
+    faiss.omp_set_num_threads(1)
+    rng = np.random.default_rng(seed)
+    if vectors is not None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        dim = int(vectors.shape[1])
+        if len(vectors) <= queries:
+            raise ValueError(
+                f"sample of {len(vectors)} vectors cannot cover {queries} queries"
+            )
+        perm = rng.permutation(len(vectors))
+        # consultas fijas y fuera de la base: sin duplicados ni solapamiento
+        xq_real, base = vectors[perm[:queries]], perm[queries:]
+    flat_rows: List[Dict[str, Any]] = []
+    hnsw_rows: List[Dict[str, Any]] = []
+
+    for n in sizes:
+        if vectors is not None:
+            if n > len(base):
+                print(
+                    f"[calibrate-hot] skip n={n}: sample leaves {len(base)} base vectors",
+                    file=sys.stderr,
+                )
+                continue
+            xb, xq = vectors[rng.choice(base, size=n, replace=False)], xq_real
+        else:
+            xb = rng.random((n, dim), dtype=np.float32)
+            xq = rng.random((queries, dim), dtype=np.float32)
+        kk = min(k, len(xb))
+
+        flat = faiss.IndexFlatL2(dim)
+        flat.add(xb)
+        _, truth = flat.search(xq, kk)
+        lat = _latencies(lambda q, ix=flat, kk=kk: ix.search(q, kk), xq)
+        flat_rows.append(
+            {"ntotal": len(xb), "ms_p50": _ms(lat, 50), "ms_p99": _ms(lat, 99)}
+        )
+
+        hnsw = create_hnsw(dim)
+        hnsw.add(xb)
+        for ef in efs:
+            params = faiss.SearchParametersHNSW(efSearch=max(int(ef), kk))
+            lat = _latencies(
+                lambda q, ix=hnsw, kk=kk, p=params: ix.search(q, kk, params=p), xq
+            )
+            _, got = hnsw.search(xq, kk, params=params)
+            hit = sum(len(set(g) & set(t)) for g, t in zip(got, truth))
+            hnsw_rows.append(
+                {
+                    "ntotal": len(xb),
+                    "ef": int(ef),
+                    "ms_p50": _ms(lat, 50),
+                    "ms_p99": _ms(lat, 99),
+                    "recall": round(hit / truth.size, 6),
+                }
+            )
+
+    return {
+        "schema": EF_TABLE_SCHEMA,
+        "dim": dim,
+        "k": k,
+        "m": HNSW_M,
+        "ef_construction": HNSW_EF_CONSTRUCTION,
+        "recall_target": recall_target,
+        "flat": flat_rows,
+        "hnsw": hnsw_rows,
+        "suggested_flat_threshold": suggest_flat_threshold(
+            flat_rows, hnsw_rows, recall_target
+        ),
+    }
+
+
+def suggest_flat_threshold(
+    flat_rows: List[Dict[str, Any]],
+    hnsw_rows: List[Dict[str, Any]],
+    recall_target: float,
+) -> int:
+    """
+    Mayor tamaño calibrado hasta el que el flat (exacto) no es más lento que
+    el HNSW más rápido que alcanza recall_target, en todos los tamaños menores.
+    """
+    best = 0
+    for fr in sorted(flat_rows, key=lambda r: r["ntotal"]):
+        ok = [
+            r
+            for r in hnsw_rows
+            if r["ntotal"] == fr["ntotal"] and r["recall"] >= recall_target
+        ]
+        if ok and fr["ms_p99"] > min(r["ms_p99"] for r in ok):
+            break
+        best = int(fr["ntotal"])
+    return best
+
+
+def run_calibrate_cli(
+    out: str, vectors_path: Optional[str] = None, **kwargs: Any
+) -> int:
+    vectors = np.load(vectors_path) if vectors_path else None
+    table = calibrate(vectors=vectors, **kwargs)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(table, f, indent=2)
+    for fr in table["flat"]:
+        n = fr["ntotal"]
+        row = " ".join(
+            f"ef{r['ef']}={r['ms_p99']}ms/r{r['recall']}"
+            for r in table["hnsw"]
+            if r["ntotal"] == n
+        )
+        print(f"[calibrate-hot] n={n} flat={fr['ms_p99']}ms {row}")
+    print(
+        f"[calibrate-hot] suggested flat threshold: {table['suggested_flat_threshold']}"
+    )
+    return 0
@@ -42,8 +42,8 @@ def _redis_try(redis_url: str) -> redis.Redis:
 class NullHotStorage:
     """Hot storage stub that satisfies retrieval.py when Redis is unavailable."""
 
-    def idxmap_mget(self, user_key: str, indices: Sequence[int]) -> List[str]:
-        return []
+    def fetch_hot(self, user_key: str, turn_ids: Sequence[str]) -> List[Optional[dict]]:
+        return [None for _ in turn_ids]
 
     def get_turn(self, user_key: str, turn_id: str) -> Optional[dict]:
         return None
@@ -142,7 +142,7 @@ def run_doctor(
         for i in range(80):
             text = f"Human: pref_{i}=val_{i}\nAI: ok"
             v = vectorizer.text_to_vector(text).astype(np.float32)
-            hot_index.add(user_key, v, persist=False)
+            hot_index.add(user_key, v, persist=False, turn_id=f"h{i}")
             hot.put_turn(
                 user_key,
                 f"h{i}",
@@ -159,8 +159,9 @@ def run_doctor(
     retriever = DeterministicRetriever(vectorizer, hot_index, hot_storage, cold, policy)
 
     q = "alpha"
-    ev1 = retriever.retrieve(tenant_id, user_id, q)
-    ev2 = retriever.retrieve(tenant_id, user_id, q)
+    res1 = retriever.retrieve_with_status(tenant_id, user_id, q)
+    res2 = retriever.retrieve_with_status(tenant_id, user_id, q)
+    ev1, ev2 = res1.evidence, res2.evidence
 
     same_evidence = [
         (e.turn_id, e.signature, round(e.score, 6), e.source) for e in ev1
@@ -181,6 +182,7 @@ def run_doctor(
         q,
         pol_dict,
         [(e.turn_id, e.signature, e.score, e.source) for e in ev1],
+        degraded=res1.degraded,
     )
     s2 = pack_signature(
         tenant_id,
@@ -188,13 +190,14 @@ def run_doctor(
         q,
         pol_dict,
         [(e.turn_id, e.signature, e.score, e.source) for e in ev2],
+        degraded=res2.degraded,
     )
 
     checks.append(
         CheckResult(
             "strict_determinism_pre",
             bool(same_evidence and s1 == s2 and len(ev1) > 0),
-            {"sig1": s1, "sig2": s2},
+            {"sig1": s1, "sig2": s2, "degraded": list(res1.degraded)},
         )
     )
 
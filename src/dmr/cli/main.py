@@ -25,6 +25,36 @@ def build_parser() -> argparse.ArgumentParser:
     d.add_argument("--cert-md", default="./DMR_COMPLIANCE_CERT.md")
     d.add_argument("--runs", type=int, default=50)
     d.add_argument("--strict", action="store_true")
+
+    b = sub.add_parser(
+        "bench-hot",
+        help="Benchmark per-user HNSW hot indexes vs packed partitions",
+    )
+    b.add_argument("--users", type=int, default=2000)
+    b.add_argument("--per-user", type=int, default=20)
+    b.add_argument("--vector-dim", type=int, default=64)
+    b.add_argument("--queries", type=int, default=1000)
+    b.add_argument("--partitions", type=int, default=64)
+    b.add_argument("--k", type=int, default=10)
+    b.add_argument("--batch", type=int, default=64)
+    b.add_argument("--seed", type=int, default=0)
+    b.add_argument("--out", default="./dmr_bench_hot.json")
+
+    c = sub.add_parser(
+        "calibrate-hot",
+        help="Measure recall vs latency of the hot index and write the efSearch table",
+    )
+    c.add_argument("--sizes", default="256,1000,4000,16000")
+    c.add_argument("--efs", default="16,32,64,128,256")
+    c.add_argument("--vector-dim", type=int, default=64)
+    c.add_argument("--queries", type=int, default=200)
+    c.add_argument("--k", type=int, default=10)
+    c.add_argument("--seed", type=int, default=0)
+    c.add_argument("--recall-target", type=float, default=0.99)
+    c.add_argument(
+        "--vectors", default=None, help=".npy sample of real vectors (n, dim)"
+    )
+    c.add_argument("--out", default="./dmr_ef_table.json")
     return p
 
 
@@ -46,4 +76,32 @@ def main(argv: list[str] | None = None) -> int:
             runs=args.runs,
             strict=args.strict,
         )
+    if args.cmd == "bench-hot":
+        from dmr.cli.bench_hot import run_bench_hot_cli
+
+        return run_bench_hot_cli(
+            out=args.out,
+            users=args.users,
+            per_user=args.per_user,
+            dim=args.vector_dim,
+            queries=args.queries,
+            partitions=args.partitions,
+            k=args.k,
+            batch=args.batch,
+            seed=args.seed,
+        )
+    if args.cmd == "calibrate-hot":
+        from dmr.cli.calibrate_hot import run_calibrate_cli
+
+        return run_calibrate_cli(
+            out=args.out,
+            vectors_path=args.vectors,
+            sizes=[int(x) for x in args.sizes.split(",") if x.strip()],
+            efs=[int(x) for x in args.efs.split(",") if x.strip()],
+            dim=args.vector_dim,
+            queries=args.queries,
+            k=args.k,
+            seed=args.seed,
+            recall_target=args.recall_target,
+        )
     return 2
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from redis.exceptions import RedisError
+
+from dmr.metrics import PRE_CACHE
+
+# entrada local: (caduca en, time.monotonic(); respuesta)
+_Entry = Tuple[float, Dict[str, Any]]
+
+
+def pre_cache_key(query: str, policy: Dict[str, Any]) -> str:
+    blob = json.dumps({"q": query, "p": policy}, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()[:32]
+
+
+class PreResponseCache:
+    """
+    Caché de respuestas /pre por usuario, clave (query, policy).
+
+    Invalidación por época: /post y /forget incrementan la época del usuario y
+    las entradas se guardan bajo la época vigente al leer, así que nunca se
+    sirve una respuesta calculada antes de la última escritura (una /pre
+    concurrente con una /post guarda bajo la época vieja y queda inalcanzable).
+
+    Con `redis` (cliente redis.asyncio) épocas y entradas se comparten entre
+    réplicas; sin él, todo vive en memoria del proceso y solo es correcto con
+    un único proceso (un /post en otro worker no invalida esta caché). La
+    caché es opcional: si Redis falla, get() es un miss y put() no guarda
+    (resultados get_error / put_error en la métrica), nunca un error de /pre.
+
+    En local, entradas y épocas son LRU acotadas a max_entries y las entradas
+    caducan a ttl_s. Las épocas salen de un reloj del proceso: un usuario cuya
+    época se expulsa pasa a leer el valor del reloj en esa expulsión, siempre
+    >= su última época, así que nunca reaparecen entradas anteriores a un bump.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 10_000,
+        redis=None,
+        prefix: str = "dmr",
+        ttl_s: int = 300,
+    ) -> None:
+        self.max_entries = int(max_entries)
+        self.redis = redis
+        self.prefix = prefix
+        self.ttl_s = int(ttl_s)
+        self._epochs: "OrderedDict[str, int]" = OrderedDict()
+        self._clock = 0
+        self._floor = 0
+        self._local: "OrderedDict[Tuple[str, int, str], _Entry]" = OrderedDict()
+
+    def _epoch_key(self, user_key: str) -> str:
+        return f"{self.prefix}:pre_epoch:{user_key}"
+
+    def _entry_key(self, user_key: str, epoch: int, key: str) -> str:
+        return f"{self.prefix}:pre:{user_key}:{epoch}:{key}"
+
+    async def epoch(self, user_key: str) -> int:
+        if self.redis is None:
+            return self._epochs.get(user_key, self._floor)
+        return int(await self.redis.get(self._epoch_key(user_key)) or 0)
+
+    async def bump(self, user_key: str) -> int:
+        """Invalida todas las respuestas cacheadas del usuario."""
+        if self.redis is None:
+            self._clock += 1
+            self._epochs[user_key] = self._clock
+            self._epochs.move_to_end(user_key)
+            if len(self._epochs) > self.max_entries:
+                self._epochs.popitem(last=False)
+                self._floor = self._clock
+            return self._clock
+        return int(await self.redis.incr(self._epoch_key(user_key)))
+
+    async def get(
+        self, user_key: str, key: str
+    ) -> Tuple[Optional[int], Optional[Dict]]:
+        """
+        (época leída, respuesta o None). La época se pasa luego a put(); es
+        None si Redis falló (sin época conocida no se puede guardar).
+        """
+        if self.redis is not None:
+            try:
+                epoch = await self.epoch(user_key)
+                raw = await self.redis.get(self._entry_key(user_key, epoch, key))
+            except RedisError:
+                PRE_CACHE.labels(result="get_error").inc()
+                return None, None
+            got = json.loads(raw) if raw else None
+        else:
+            epoch = await self.epoch(user_key)
+            got = None
+            hit = self._local.get((user_key, epoch, key))
+            if hit is not None:
+                if hit[0] > time.monotonic():
+                    got = hit[1]
+                    self._local.move_to_end((user_key, epoch, key))
+                else:
+                    del self._local[(user_key, epoch, key)]
+        PRE_CACHE.labels(result="hit" if got is not None else "miss").inc()
+        return epoch, got
+
+    async def put(
+        self,
+        user_key: str,
+        epoch: Optional[int],
+        key: str,
+        response: Dict[str, Any],
+    ) -> None:
+        if epoch is None:
+            return  # get() no pudo leer la época
+        if self.redis is None:
+            self._local[(user_key, epoch, key)] = (
+                time.monotonic() + self.ttl_s,
+                response,
+            )
+            if len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+            return
+        try:
+            await self.redis.set(
+                self._entry_key(user_key, epoch, key),
+                json.dumps(response, ensure_ascii=False),
+                ex=self.ttl_s,
+            )
+        except RedisError:
+            PRE_CACHE.labels(result="put_error").inc()
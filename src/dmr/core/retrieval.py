@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
 from dataclasses import dataclass
-from typing import List, Optional, Sequence
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
@@ -30,6 +35,127 @@ class EvidenceItem:
     text: str
 
 
+@dataclass(frozen=True)
+class RetrievalResult:
+    evidence: List[EvidenceItem]
+    # tiers que no respondieron dentro de su presupuesto (orden fijo: hot, cold)
+    degraded: Tuple[str, ...] = ()
+
+
+# fracción del presupuesto hot para la búsqueda ANN; el resto es fetch_hot
+ANN_BUDGET_SHARE = 0.5
+
+
+def ann_budget_ms(policy: RetrievalPolicy) -> float:
+    return float(policy.budget_ms_hot) * ANN_BUDGET_SHARE
+
+
+class _Tier:
+    """
+    Trabajo de un tier en un executor compartido. Su deadline corre desde que
+    un hilo lo arranca, no desde que se encola: la espera en cola (acotada a
+    un presupuesto; si no arrancó se cancela, sin coste) no degrada un tier
+    cuyo trabajo es rápido. Una vez arrancado, el propio trabajo se acota al
+    deadline (efSearch, interrupt de SQLite, timeout de Redis).
+    """
+
+    def __init__(self, budget_ms: float) -> None:
+        self.budget_s = float(budget_ms) / 1000.0
+        # límite de la espera en cola: un presupuesto desde que se encola
+        self.queue_deadline = time.perf_counter() + self.budget_s
+        self.deadline = 0.0
+        self.started = threading.Event()
+
+    def start(self) -> float:
+        # en el hilo del executor, al empezar el trabajo
+        self.deadline = time.perf_counter() + self.budget_s
+        self.started.set()
+        return self.deadline
+
+    def remaining(self) -> float:
+        return self.deadline - time.perf_counter()
+
+    def queue_remaining(self) -> float:
+        return max(0.0, self.queue_deadline - time.perf_counter())
+
+
+class _AsyncTier(_Tier):
+    """_Tier que además avisa al event loop cuando el executor lo arranca."""
+
+    def __init__(self, budget_ms: float, loop: asyncio.AbstractEventLoop) -> None:
+        super().__init__(budget_ms)
+        self._loop = loop
+        self.started_async = asyncio.Event()
+
+    def start(self) -> float:
+        deadline = super().start()
+        self._loop.call_soon_threadsafe(self.started_async.set)
+        return deadline
+
+
+def merge_evidence(
+    merged: List[EvidenceItem], policy: RetrievalPolicy
+) -> List[EvidenceItem]:
+    # tiers completos o nada => el merge solo depende de qué tiers llegaron
+    merged.sort(key=lambda e: (-e.score, e.turn_id))
+
+    out: List[EvidenceItem] = []
+    total_chars = 0
+    for e in merged:
+        if len(out) >= int(policy.k_final):
+            break
+        if e.score < float(policy.threshold):
+            continue
+        if total_chars + len(e.text) > int(policy.max_chars):
+            continue
+        out.append(e)
+        total_chars += len(e.text)
+
+    return out
+
+
+def hot_evidence(
+    pairs: Sequence[Tuple[str, float]], recs: Sequence[Optional[Dict]]
+) -> List[EvidenceItem]:
+    out: List[EvidenceItem] = []
+    for (_, dist), rec in zip(pairs, recs):
+        if not rec:
+            continue
+        score = 1.0 / (1.0 + max(float(dist), 0.0))
+        out.append(
+            EvidenceItem(
+                turn_id=str(rec["turn_id"]),
+                signature=str(rec.get("signature", "")),
+                score=float(score),
+                source="hot",
+                text=str(rec.get("text", "")),
+            )
+        )
+    return out
+
+
+def cold_evidence(query: str, rows: Sequence[ColdRow]) -> List[EvidenceItem]:
+    out: List[EvidenceItem] = []
+    for r in rows:
+        # cold rows don't have vector distance; we use stable rank proxy:
+        # score derived deterministically from text length and exact token presence.
+        # (FTS already filtered; this keeps deterministic monotonic behavior.)
+        score = 0.50
+        if query.lower() in r.text.lower():
+            score = 0.75
+
+        out.append(
+            EvidenceItem(
+                turn_id=str(r.turn_id),
+                signature=str(r.signature),
+                score=float(score),
+                source="cold",
+                text=str(r.text),
+            )
+        )
+    return out
+
+
 class DeterministicRetriever:
     def __init__(
         self,
@@ -38,76 +164,97 @@ class DeterministicRetriever:
         hot_storage,
         cold_store: SQLiteColdStore,
         policy: Optional[RetrievalPolicy] = None,
+        max_workers: int = 4,
     ):
         self.vectorizer = vectorizer
         self.hot_index = hot_index
         self.hot_storage = hot_storage
         self.cold_store = cold_store
         self.policy = policy or RetrievalPolicy()
+        # hot y cold corren en paralelo, cada uno con su _Tier. Al vencer el
+        # deadline, cold se interrumpe dentro de SQLite (libera el hilo) y hot
+        # queda acotado por el efSearch de ann_budget_ms y no llega a Redis.
+        # hot_storage debería usar un cliente con socket_timeout. max_workers:
+        # dos por petición concurrente esperada
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(2, int(max_workers)), thread_name_prefix="dmr-tier"
+        )
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
 
     def retrieve(self, tenant_id: str, user_id: str, query: str) -> List[EvidenceItem]:
+        return self.retrieve_with_status(tenant_id, user_id, query).evidence
+
+    def retrieve_with_status(
+        self, tenant_id: str, user_id: str, query: str
+    ) -> RetrievalResult:
         user_key = f"{tenant_id}:{user_id}"
         qv = self.vectorizer.text_to_vector(query).astype(np.float32)
 
-        hot = self._retrieve_hot(user_key, qv)
-        cold = self._retrieve_cold(tenant_id, user_id, query)
+        hot_t = _Tier(self.policy.budget_ms_hot)
+        cold_t = _Tier(self.policy.budget_ms_cold)
+        hot_f = self._submit(hot_t, self._retrieve_hot, user_key, qv)
+        cold_f = self._submit(cold_t, self._retrieve_cold, tenant_id, user_id, query)
 
-        merged = hot + cold
-        merged.sort(key=lambda e: (-e.score, e.turn_id))
+        degraded: List[str] = []
+        hot = self._await_tier(hot_t, hot_f)
+        if hot is None:
+            degraded.append("hot")
+        cold = self._await_tier(cold_t, cold_f)
+        if cold is None:
+            degraded.append("cold")
 
-        out: List[EvidenceItem] = []
-        total_chars = 0
-        for e in merged:
-            if len(out) >= int(self.policy.k_final):
-                break
-            if e.score < float(self.policy.threshold):
-                continue
-            if total_chars + len(e.text) > int(self.policy.max_chars):
-                continue
-            out.append(e)
-            total_chars += len(e.text)
+        evidence = self._merge((hot or []) + (cold or []))
+        return RetrievalResult(evidence=evidence, degraded=tuple(degraded))
 
-        return out
+    def _submit(self, tier: _Tier, fn: Callable[..., Any], *args: Any) -> Future:
+        # fn(*args, deadline): el deadline se fija al arrancar en el pool
+        return self._pool.submit(lambda: fn(*args, tier.start()))
 
-    def _retrieve_hot(self, user_key: str, qv: np.ndarray) -> List[EvidenceItem]:
+    @staticmethod
+    def _await_tier(tier: _Tier, fut: Future) -> Optional[List[EvidenceItem]]:
+        """Resultado del tier o None si no arranca a tiempo o vence su deadline."""
+        if not tier.started.wait(tier.queue_remaining()) and fut.cancel():
+            return None  # seguía en cola: cancel() evita que llegue a correr
+        tier.started.wait()
+        try:
+            return fut.result(timeout=max(0.0, tier.remaining()))
+        except FutureTimeout:
+            return None
+        except TimeoutError:
+            return None  # el propio tier cortó su trabajo (ColdDeadlineExceeded)
+
+    def _merge(self, merged: List[EvidenceItem]) -> List[EvidenceItem]:
+        return merge_evidence(merged, self.policy)
+
+    def _retrieve_hot(
+        self, user_key: str, qv: np.ndarray, deadline: float
+    ) -> List[EvidenceItem]:
         # Hot path is optional (Redis may be unavailable). Retrieval must degrade safely.
         try:
             k = int(self.policy.k_hot_candidates)
-            dists, idxs = self.hot_index.search(user_key, qv, k=k)
-            if len(idxs) == 0:
-                return []
-            indices = [int(i) for i in idxs if int(i) >= 0]
-            if not indices:
+            pairs = self.hot_index.search_turns(
+                user_key, qv, k_candidates=k, budget_ms=ann_budget_ms(self.policy)
+            )
+            if not pairs:
                 return []
-
-            # Map FAISS indices to turn_ids via hot storage
-            turn_ids: Sequence[str] = self.hot_storage.idxmap_mget(user_key, indices)
-            out: List[EvidenceItem] = []
-            for i, tid in enumerate(turn_ids):
-                if not tid:
-                    continue
-                if self.hot_storage.tombstoned(user_key, tid):
-                    continue
-                rec = self.hot_storage.get_turn(user_key, tid)
-                if not rec:
-                    continue
-                dist = float(dists[i]) if i < len(dists) else 1e9
-                score = 1.0 / (1.0 + max(dist, 0.0))
-                out.append(
-                    EvidenceItem(
-                        turn_id=str(rec.get("turn_id", tid)),
-                        signature=str(rec.get("signature", "")),
-                        score=float(score),
-                        source="hot",
-                        text=str(rec.get("text", "")),
-                    )
-                )
-            return out
+            if time.perf_counter() >= deadline:
+                raise TimeoutError  # ya descartado: no se consulta Redis
+            # turn_ids del índice -> turnos vivos (tombstones + hash) en bloque
+            recs = self.hot_storage.fetch_hot(user_key, [t for t, _ in pairs])
+            return hot_evidence(pairs, recs)
+        except TimeoutError:
+            raise
         except Exception:
             return []
 
     def _retrieve_cold(
-        self, tenant_id: str, user_id: str, query: str
+        self,
+        tenant_id: str,
+        user_id: str,
+        query: str,
+        deadline: float,
     ) -> List[EvidenceItem]:
         rows: List[ColdRow] = self.cold_store.search_fts(
             tenant_id,
@@ -115,24 +262,144 @@ class DeterministicRetriever:
             query,
             limit=int(self.policy.k_cold_candidates),
             budget_ms=float(self.policy.budget_ms_cold),
+            deadline=deadline,
+        )
+        return cold_evidence(query, rows)
+
+
+class AsyncDeterministicRetriever:
+    """
+    Variante asyncio: el hot storage es redis.asyncio (AsyncRedisHotStorage) y
+    FAISS/SQLite (bloqueantes) corren en un executor acotado. Mismo merge y
+    mismos deadlines por tier (_Tier) que DeterministicRetriever: corren desde
+    que el executor arranca el trabajo del tier, y el fetch de Redis del tier
+    hot se cancela (asyncio) al vencer el suyo.
+    """
+
+    def __init__(
+        self,
+        vectorizer: DeterministicVectorizer,
+        hot_index: FaissHNSWHotIndex,
+        hot_storage,
+        cold_store: SQLiteColdStore,
+        policy: Optional[RetrievalPolicy] = None,
+        max_workers: int = 4,
+    ):
+        self.vectorizer = vectorizer
+        self.hot_index = hot_index
+        self.hot_storage = hot_storage
+        self.cold_store = cold_store
+        self.policy = policy or RetrievalPolicy()
+        self.executor = ThreadPoolExecutor(
+            max_workers=max(1, int(max_workers)), thread_name_prefix="dmr-async"
+        )
+
+    def close(self) -> None:
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    async def run_blocking(self, fn, *args):
+        """Ejecuta una llamada bloqueante (FAISS/SQLite) en el executor acotado."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, fn, *args
+        )
+
+    async def retrieve(
+        self, tenant_id: str, user_id: str, query: str
+    ) -> List[EvidenceItem]:
+        return (await self.retrieve_with_status(tenant_id, user_id, query)).evidence
+
+    async def retrieve_with_status(
+        self, tenant_id: str, user_id: str, query: str
+    ) -> RetrievalResult:
+        user_key = f"{tenant_id}:{user_id}"
+        qv = self.vectorizer.text_to_vector(query).astype(np.float32)
+
+        loop = asyncio.get_running_loop()
+        hot_t = _AsyncTier(self.policy.budget_ms_hot, loop)
+        cold_t = _AsyncTier(self.policy.budget_ms_cold, loop)
+        hot_f = asyncio.ensure_future(self._retrieve_hot(hot_t, user_key, qv))
+        cold_f = asyncio.ensure_future(
+            self._retrieve_cold(cold_t, tenant_id, user_id, query)
         )
 
-        out: List[EvidenceItem] = []
-        for r in rows:
-            # cold rows don't have vector distance; we use stable rank proxy:
-            # score derived deterministically from text length and exact token presence.
-            # (FTS already filtered; this keeps deterministic monotonic behavior.)
-            score = 0.50
-            if query.lower() in r.text.lower():
-                score = 0.75
-
-            out.append(
-                EvidenceItem(
-                    turn_id=str(r.turn_id),
-                    signature=str(r.signature),
-                    score=float(score),
-                    source="cold",
-                    text=str(r.text),
-                )
+        degraded: List[str] = []
+        hot = await self._await_tier(hot_t, hot_f)
+        if hot is None:
+            degraded.append("hot")
+        cold = await self._await_tier(cold_t, cold_f)
+        if cold is None:
+            degraded.append("cold")
+
+        evidence = merge_evidence((hot or []) + (cold or []), self.policy)
+        return RetrievalResult(evidence=evidence, degraded=tuple(degraded))
+
+    async def _run_tier(self, tier: _Tier, fn: Callable[..., Any], *args: Any):
+        """fn(*args, deadline) en el executor; el deadline del tier arranca con él."""
+        return await self.run_blocking(lambda: fn(*args, tier.start()))
+
+    @staticmethod
+    async def _await_tier(
+        tier: "_AsyncTier", task: "asyncio.Future"
+    ) -> Optional[List[EvidenceItem]]:
+        waiter = asyncio.ensure_future(tier.started_async.wait())
+        try:
+            await asyncio.wait(
+                {task, waiter},
+                timeout=tier.queue_remaining(),
+                return_when=asyncio.FIRST_COMPLETED,
             )
-        return out
+        finally:
+            waiter.cancel()
+        if not tier.started.is_set() and not task.done():
+            # cancelar el task cancela el trabajo que sigue en cola del executor
+            task.cancel()
+            return None
+        done, _ = await asyncio.wait({task}, timeout=max(0.0, tier.remaining()))
+        if not done:
+            task.cancel()  # el trabajo ya arrancado se acota solo
+            return None
+        try:
+            return task.result()
+        except TimeoutError:
+            return None
+
+    def _search_hot(
+        self, user_key: str, qv: np.ndarray, deadline: float
+    ) -> List[Tuple[str, float]]:
+        # acotada por el efSearch de ann_budget_ms, no por el deadline
+        return self.hot_index.search_turns(
+            user_key, qv, int(self.policy.k_hot_candidates), ann_budget_ms(self.policy)
+        )
+
+    async def _retrieve_hot(
+        self, tier: _Tier, user_key: str, qv: np.ndarray
+    ) -> List[EvidenceItem]:
+        try:
+            pairs = await self._run_tier(tier, self._search_hot, user_key, qv)
+            if not pairs:
+                return []
+            if tier.remaining() <= 0:
+                raise TimeoutError  # ya descartado: no se consulta Redis
+            recs = await asyncio.wait_for(
+                self.hot_storage.fetch_hot(user_key, [t for t, _ in pairs]),
+                tier.remaining(),
+            )
+            return hot_evidence(pairs, recs)
+        except TimeoutError:
+            raise
+        except Exception:
+            return []
+
+    async def _retrieve_cold(
+        self, tier: _Tier, tenant_id: str, user_id: str, query: str
+    ) -> List[EvidenceItem]:
+        rows = await self._run_tier(
+            tier,
+            self.cold_store.search_fts,
+            tenant_id,
+            user_id,
+            query,
+            int(self.policy.k_cold_candidates),
+            float(self.policy.budget_ms_cold),
+        )
+        return cold_evidence(query, rows)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 import hashlib
-from typing import Iterable, Tuple
+from typing import Iterable, Sequence, Tuple
 
 
 def sha256_hex(s: str) -> str:
@@ -13,6 +13,7 @@ def pack_signature(
     query: str,
     policy: dict,
     evidence_items: Iterable[Tuple[str, str, float, str]],
+    degraded: Sequence[str] = (),
 ) -> str:
     norm = []
     for turn_id, sig, score, source in evidence_items:
@@ -24,4 +25,7 @@ def pack_signature(
         f"bh={float(policy['budget_ms_hot']):.3f}|bc={float(policy['budget_ms_cold']):.3f}|"
         f"ev={norm}"
     )
+    if degraded:
+        # un pack sin algún tier no debe firmar igual que el completo
+        s += f"|dg={','.join(sorted(degraded))}"
     return sha256_hex(s)[:16]
@@ -1,3 +1,5 @@
 from .faiss_hot import FaissHNSWHotIndex
+from .packed_hot import PackedHotIndex
+from .snapshotter import HotIndexSnapshotter
 
-__all__ = ["FaissHNSWHotIndex"]
+__all__ = ["FaissHNSWHotIndex", "PackedHotIndex", "HotIndexSnapshotter"]
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+from typing import Any, Dict, List, Optional
+
+EF_TABLE_SCHEMA = "dmr_ef_table.v1"
+DEFAULT_EF_SEARCH = 64
+
+
+class EfCostModel:
+    """
+    Elige efSearch por consulta a partir de una tabla calibrada
+    (dmr calibrate-hot): filas {ntotal, ef, ms_p99, recall} medidas sobre el
+    mismo tipo de índice. Para un tamaño de índice se usa la fila de
+    calibración de mayor ntotal <= tamaño (o la menor si no hay) y, entre los
+    ef cuyo ms_p99 cabe en el presupuesto, el menor que alcanza recall_target;
+    si ninguno lo alcanza, el mayor que cabe. La elección depende solo de la
+    tabla y del presupuesto, no de tiempos medidos en vivo: es determinista.
+    """
+
+    def __init__(
+        self,
+        rows: List[Dict[str, Any]],
+        recall_target: float = 0.99,
+        default_ef: int = DEFAULT_EF_SEARCH,
+    ) -> None:
+        self.recall_target = float(recall_target)
+        self.default_ef = int(default_ef)
+        self._by_size: Dict[int, List[Dict[str, Any]]] = {}
+        for r in rows:
+            self._by_size.setdefault(int(r["ntotal"]), []).append(r)
+        for rs in self._by_size.values():
+            rs.sort(key=lambda r: int(r["ef"]))
+        self._sizes = sorted(self._by_size)
+
+    @classmethod
+    def from_table(cls, table: Dict[str, Any], **kwargs: Any) -> "EfCostModel":
+        if table.get("schema") != EF_TABLE_SCHEMA:
+            raise ValueError(f"unsupported ef table schema: {table.get('schema')!r}")
+        return cls(table["hnsw"], **kwargs)
+
+    @classmethod
+    def load(cls, path: str, **kwargs: Any) -> "EfCostModel":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_table(json.load(f), **kwargs)
+
+    def _rows_for(self, ntotal: int) -> List[Dict[str, Any]]:
+        below = [s for s in self._sizes if s <= ntotal]
+        return self._by_size[below[-1] if below else self._sizes[0]]
+
+    def choose_ef(self, ntotal: int, budget_ms: Optional[float], k: int) -> int:
+        if budget_ms is None or not self._sizes:
+            return max(self.default_ef, int(k))
+        rows = self._rows_for(int(ntotal))
+        fits = [r for r in rows if float(r["ms_p99"]) <= float(budget_ms)]
+        if not fits:
+            ef = int(rows[0]["ef"])
+        else:
+            good = [r for r in fits if float(r["recall"]) >= self.recall_target]
+            ef = int((good[0] if good else fits[-1])["ef"])
+        # efSearch < k devolvería menos de k resultados
+        return max(ef, int(k))
@@ -1,23 +1,280 @@
 from __future__ import annotations
 
+import hashlib
+import json
 import os
+import struct
+import tempfile
 import threading
-from typing import List, Tuple
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Set, Tuple
 
 import numpy as np
 
+from dmr.index.ef_model import DEFAULT_EF_SEARCH, EfCostModel
+from dmr.metrics import HOT_EVICTIONS, HOT_RELOADS, HOT_RESIDENT_BYTES, HOT_SNAPSHOTS
+
 try:
     import faiss  # type: ignore
 except Exception as e:  # pragma: no cover
     raise RuntimeError("faiss is required for FaissHNSWHotIndex") from e
 
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 128
+# por debajo de este tamaño un scan flat es más rápido y exacto (calibrate-hot)
+DEFAULT_FLAT_THRESHOLD = 1024
+_INDEX_OVERHEAD_BYTES = 4096
+# id_map (int64) + rev_map (unordered_map) + entrada de la tabla id -> turn_id
+_ID_BYTES_PER_VECTOR = 160
+# registro WAL: (posición del primer vector, nº de vectores, bytes del JSON)
+# + int64[n] ids + float32[n * dim] + JSON (aquí los turn_ids, null = posicional)
+_WAL_HEADER = struct.Struct("<qii")
+_ID_MASK = (1 << 63) - 1
+DEFAULT_LOCK_STRIPES = 256
+
+
+def turn_vector_id(turn_id: str) -> int:
+    """id int64 estable del vector de un turno (blake2b, 63 bits: nunca -1)."""
+    h = hashlib.blake2b(turn_id.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(h, "little") & _ID_MASK
+
+
+def wal_record(start: int, v: np.ndarray, ids: np.ndarray, meta: Any) -> bytes:
+    blob = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+    return (
+        _WAL_HEADER.pack(int(start), int(v.shape[0]), len(blob))
+        + ids.tobytes()
+        + v.tobytes()
+        + blob
+    )
+
+
+def read_wal(path: str, dim: int) -> Iterator[Tuple[int, np.ndarray, np.ndarray, Any]]:
+    """Registros completos del WAL: (posición, ids, vectores, JSON)."""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return
+    off = 0
+    while off + _WAL_HEADER.size <= len(data):
+        pos, count, tlen = _WAL_HEADER.unpack_from(data, off)
+        ids_off = off + _WAL_HEADER.size
+        vec_off = ids_off + 8 * count
+        meta_off = vec_off + 4 * count * dim
+        end = meta_off + tlen
+        if count <= 0 or tlen < 0 or end > len(data):
+            return  # cola truncada por una caída a mitad de escritura
+        ids = np.frombuffer(data, dtype=np.int64, count=count, offset=ids_off)
+        v = np.frombuffer(data, dtype=np.float32, count=count * dim, offset=vec_off)
+        meta = json.loads(data[meta_off:end].decode("utf-8"))
+        yield pos, ids, v.reshape(count, dim), meta
+        off = end
+
+
+def append_wal(path: str, rec: bytes, fsync: bool) -> None:
+    with open(path, "ab") as f:
+        f.write(rec)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def wal_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except FileNotFoundError:
+        return 0
+
+
+def trim_wal(path: str, upto: int, fsync: bool) -> None:
+    """
+    Quita del WAL los primeros `upto` bytes (lo que cubre un snapshot) y
+    conserva lo anexado después. Requiere excluir a los add.
+    """
+    size = wal_size(path)
+    if size <= upto:
+        with open(path, "wb"):
+            pass
+        return
+    with open(path, "rb") as f:
+        f.seek(upto)
+        tail = f.read()
+    d = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=".wal-", suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(tail)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def create_hnsw(dim: int) -> faiss.Index:
+    # HNSW flat L2
+    idx = faiss.IndexHNSWFlat(int(dim), HNSW_M)
+    idx.hnsw.efSearch = DEFAULT_EF_SEARCH
+    idx.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+    return idx
+
+
+def inner_index(idx: faiss.Index) -> faiss.Index:
+    # índice envuelto por un IndexIDMap2 (o el propio índice si no lo es)
+    return faiss.downcast_index(idx.index) if hasattr(idx, "id_map") else idx
+
+
+def is_hnsw(idx: faiss.Index) -> bool:
+    return hasattr(inner_index(idx), "hnsw")
+
+
+def estimate_index_bytes(ntotal: int, dim: int, m: int = HNSW_M) -> int:
+    """
+    Tamaño aproximado en RAM de un IndexIDMap2(IndexHNSWFlat): vectores
+    float32 + vecinos int32 (2*M en el nivel 0 y M/(M-1) esperados en niveles
+    superiores) + levels (int32) y offsets (size_t) por nodo + ids y tabla
+    id -> turn_id. m=0: IndexIDMap2(IndexFlatL2).
+    """
+    if m <= 0:
+        return int(_INDEX_OVERHEAD_BYTES + ntotal * (4 * dim + _ID_BYTES_PER_VECTOR))
+    links = 2 * m + m / (m - 1)
+    per_node = 4 * dim + 4 * links + 4 + 8 + _ID_BYTES_PER_VECTOR
+    return int(_INDEX_OVERHEAD_BYTES + ntotal * per_node)
+
+
+class RWLock:
+    """Lock lectores/escritor: muchas búsquedas a la vez, add/carga en exclusiva."""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+
+    def acquire_read(self) -> None:
+        with self._cond:
+            # los escritores en espera tienen prioridad (sin inanición de add)
+            while self._writer or self._waiting_writers:
+                self._cond.wait()
+            self._readers += 1
+
+    def release_read(self) -> None:
+        with self._cond:
+            self._readers -= 1
+            if self._readers == 0:
+                self._cond.notify_all()
+
+    def acquire_write(self, blocking: bool = True) -> bool:
+        with self._cond:
+            if not blocking:
+                if self._writer or self._readers:
+                    return False
+                self._writer = True
+                return True
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+            return True
+
+    def release_write(self) -> None:
+        with self._cond:
+            self._writer = False
+            self._cond.notify_all()
+
+    @contextmanager
+    def read(self) -> Iterator[None]:
+        self.acquire_read()
+        try:
+            yield
+        finally:
+            self.release_read()
+
+    @contextmanager
+    def write(self) -> Iterator[None]:
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
 
 class FaissHNSWHotIndex:
-    def __init__(self, dim: int, index_dir: str, omp_threads: int = 1) -> None:
+    """
+    Un índice por usuario, persistido en index_dir/<user>.faiss: IndexFlatL2
+    (exacto) mientras tenga <= flat_threshold vectores y HNSW a partir de ahí.
+    El paso a HNSW ocurre en el add que cruza el umbral y siempre igual
+    (vectores previos en un lote + el lote nuevo), también al reaplicar el WAL.
+    Con ef_model, efSearch se elige por consulta según budget_ms.
+
+    Los vectores van en un IndexIDMap2 con id estable turn_vector_id(turn_id)
+    y la tabla id -> turn_id se guarda junto al snapshot (<user>.turns.json),
+    así que search_turns devuelve turn_ids sin pasar por un idxmap y ningún
+    rebuild (p. ej. el paso a HNSW) cambia los ids. Sin turn_id el id es la
+    posición del vector. Los índices antiguos sin ids se migran al cargarlos:
+    legacy_turns(user_key, n) da el turn_id de cada posición (el idxmap de
+    Redis, RedisHotStorage.get_index_map); sin él, o sin turno para una
+    posición, el vector queda con id posicional y search_turns no lo devuelve.
+
+    Con max_bytes, los índices residentes se acotan por tamaño estimado
+    (estimate_index_bytes): al superarlo se expulsan los menos usados
+    recientemente, escribiendo antes a disco los que tengan cambios sin
+    persistir. Un índice expulsado se recarga en su siguiente acceso.
+
+    Durabilidad: add() anexa los vectores a un WAL por usuario (<user>.wal) y
+    marca el usuario como sucio; snapshot()/snapshot_dirty()/persist() (p. ej.
+    desde HotIndexSnapshotter) serializan el índice bajo el lock de lectura y,
+    ya sin él, lo escriben a un temporal, fsync y rename atómico; luego quitan
+    del WAL solo lo que cubre el snapshot. Al cargar se reaplica la cola del
+    WAL posterior al snapshot. wal_fsync=True hace fsync en cada add (sobrevive
+    a una caída del host, no solo del proceso).
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        index_dir: str,
+        omp_threads: int = 1,
+        max_bytes: Optional[int] = None,
+        wal_fsync: bool = False,
+        flat_threshold: int = DEFAULT_FLAT_THRESHOLD,
+        ef_model: Optional[EfCostModel] = None,
+        lock_stripes: int = DEFAULT_LOCK_STRIPES,
+        legacy_turns: Optional[Callable[[str, int], Sequence[Optional[str]]]] = None,
+    ) -> None:
         self.dim = int(dim)
+        self.legacy_turns = legacy_turns
+        self.flat_threshold = int(flat_threshold)
+        self.ef_model = ef_model
         self.index_dir = index_dir
-        self._lock = threading.RLock()
-        self._idx: dict[str, faiss.Index] = {}
+        self.max_bytes = int(max_bytes) if max_bytes else None
+        self.wal_fsync = bool(wal_fsync)
+        # _lock solo protege los dicts (operaciones O(1)); la E/S y FAISS van
+        # bajo el RWLock de la franja del usuario (crc32 % lock_stripes): nº de
+        # locks fijo aunque pasen millones de usuarios, y dos usuarios solo se
+        # bloquean entre sí si comparten franja
+        self._lock = threading.Lock()
+        self._user_locks: List[RWLock] = [
+            RWLock() for _ in range(max(1, int(lock_stripes)))
+        ]
+        # ordena las escrituras de snapshot por franja (serializar y escribir
+        # sin que otro snapshot más viejo pise el fichero); se toma antes que
+        # el RWLock de la franja y nunca bloquea búsquedas ni add
+        self._io_locks: List[threading.Lock] = [
+            threading.Lock() for _ in self._user_locks
+        ]
+        # [lock, nº de hilos que lo usan] por usuario solo mientras se carga:
+        # la lectura de disco y el replay del WAL no toman el lock de la franja
+        self._loading: Dict[str, List[Any]] = {}
+        # orden LRU: el más reciente al final
+        self._idx: "OrderedDict[str, faiss.Index]" = OrderedDict()
+        # id del vector -> turn_id, por usuario (vive y se expulsa con _idx)
+        self._turns: Dict[str, Dict[int, str]] = {}
+        self._bytes: Dict[str, int] = {}
+        self._resident_bytes = 0
+        self._dirty: Set[str] = set()
 
         os.makedirs(self.index_dir, exist_ok=True)
         try:
@@ -25,57 +282,373 @@ class FaissHNSWHotIndex:
         except Exception:
             pass
 
-    def _path(self, user_key: str) -> str:
+    def _path(self, user_key: str, ext: str = "faiss") -> str:
         safe = user_key.replace(":", "_").replace("/", "_")
-        return os.path.join(self.index_dir, f"{safe}.faiss")
+        return os.path.join(self.index_dir, f"{safe}.{ext}")
 
     def _create(self) -> faiss.Index:
-        # HNSW flat L2
-        idx = faiss.IndexHNSWFlat(self.dim, 32)
-        idx.hnsw.efSearch = 64
-        idx.hnsw.efConstruction = 128
+        if self.flat_threshold <= 0:
+            return faiss.IndexIDMap2(create_hnsw(self.dim))
+        return faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim))
+
+    def _with_ids(
+        self, user_key: str, idx: faiss.Index, turns: Dict[int, str]
+    ) -> faiss.Index:
+        """
+        Índice sin ids (formato anterior), mismo tipo: id estable de su turno
+        (legacy_turns) o, si no lo hay, la posición. Rellena turns.
+        """
+        out = faiss.IndexIDMap2(
+            create_hnsw(self.dim) if is_hnsw(idx) else faiss.IndexFlatL2(self.dim)
+        )
+        n = int(idx.ntotal)
+        if not n:
+            return out
+        names = list(self.legacy_turns(user_key, n)) if self.legacy_turns else []
+        ids = np.arange(n, dtype=np.int64)
+        for pos, tid in enumerate(names[:n]):
+            vid = turn_vector_id(str(tid)) if tid is not None else None
+            # un turno repetido en el idxmap se queda con su primer vector
+            if vid is not None and vid not in turns:
+                ids[pos] = vid
+                turns[vid] = str(tid)
+        out.add_with_ids(idx.reconstruct_n(0, n), ids)
+        return out
+
+    def _grow(self, idx: faiss.Index, v: np.ndarray, ids: np.ndarray) -> faiss.Index:
+        """Añade v; si cruza flat_threshold devuelve el índice HNSW que lo sustituye."""
+        if not is_hnsw(idx) and int(idx.ntotal) + v.shape[0] > self.flat_threshold:
+            hnsw = faiss.IndexIDMap2(create_hnsw(self.dim))
+            n = int(idx.ntotal)
+            if n:
+                # reconstruct_n del IDMap2 iría por id: se lee el índice interno
+                hnsw.add_with_ids(
+                    inner_index(idx).reconstruct_n(0, n),
+                    faiss.vector_to_array(idx.id_map),
+                )
+            idx = hnsw
+        idx.add_with_ids(v, ids)
         return idx
 
+    def _stripe(self, user_key: str) -> int:
+        return zlib.crc32(user_key.encode("utf-8")) % len(self._user_locks)
+
+    def _user_lock(self, user_key: str) -> RWLock:
+        return self._user_locks[self._stripe(user_key)]
+
+    def _io_lock(self, user_key: str) -> threading.Lock:
+        return self._io_locks[self._stripe(user_key)]
+
+    def _read_index(self, path: str) -> faiss.Index:
+        return faiss.read_index(path)
+
     def _load_or_create(self, user_key: str) -> faiss.Index:
         with self._lock:
-            if user_key in self._idx:
-                return self._idx[user_key]
+            idx = self._idx.get(user_key)
+            if idx is not None:
+                self._idx.move_to_end(user_key)
+                return idx
+            entry = self._loading.setdefault(user_key, [threading.Lock(), 0])
+            entry[1] += 1
+        # un usuario no residente no tiene add ni snapshot en curso (solo se
+        # publica bajo este mismo lock de carga): se lee fuera de la franja
+        try:
+            with entry[0]:
+                idx = self._idx.get(user_key)
+                if idx is not None:
+                    return idx
+                idx = self._load_from_disk(user_key)
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._loading[user_key]
+        self._enforce_budget(keep=user_key)
+        return idx
 
-            p = self._path(user_key)
-            if os.path.exists(p):
-                idx = faiss.read_index(p)
+    def _load_from_disk(self, user_key: str) -> faiss.Index:
+        # requiere el lock de carga del usuario
+        p = self._path(user_key)
+        turns: Dict[int, str] = {}
+        migrated = False
+        if os.path.exists(p):
+            idx = self._read_index(p)
+            HOT_RELOADS.inc()
+            if not hasattr(idx, "id_map"):
+                idx, migrated = self._with_ids(user_key, idx, turns), True
             else:
-                idx = self._create()
+                turns = self._read_turns(user_key, idx)
+        else:
+            idx = self._create()
+        idx, replayed = self._replay_wal(user_key, idx, turns)
 
+        with self._lock:
             self._idx[user_key] = idx
-            return idx
+            self._turns[user_key] = turns
+            self._account(user_key, idx)
+            if replayed or migrated:
+                self._dirty.add(user_key)
+        return idx
 
-    def persist(self, user_key: str) -> None:
-        with self._lock:
+    @contextmanager
+    def _locked(self, user_key: str, write: bool = False) -> Iterator[faiss.Index]:
+        lk = self._user_lock(user_key)
+        while True:
             idx = self._load_or_create(user_key)
-            faiss.write_index(idx, self._path(user_key))
+            if write:
+                lk.acquire_write()
+            else:
+                lk.acquire_read()
+            # si se expulsó entre la carga y el lock, idx está huérfano: recarga
+            if self._idx.get(user_key) is idx:
+                break
+            if write:
+                lk.release_write()
+            else:
+                lk.release_read()
+        try:
+            yield idx
+        finally:
+            if write:
+                lk.release_write()
+            else:
+                lk.release_read()
+
+    def _account(self, user_key: str, idx: faiss.Index) -> None:
+        # requiere self._lock
+        size = estimate_index_bytes(
+            int(idx.ntotal), self.dim, HNSW_M if is_hnsw(idx) else 0
+        )
+        self._resident_bytes += size - self._bytes.get(user_key, 0)
+        self._bytes[user_key] = size
+        HOT_RESIDENT_BYTES.set(self._resident_bytes)
 
-    def add(self, user_key: str, vec: np.ndarray, persist: bool = False) -> int:
+    def _enforce_budget(self, keep: str) -> None:
+        if self.max_bytes is None:
+            return
         with self._lock:
-            idx = self._load_or_create(user_key)
+            if self._resident_bytes <= self.max_bytes:
+                return
+            victims = [u for u in self._idx if u != keep]
+        for user_key in victims:
+            with self._lock:
+                if self._resident_bytes <= self.max_bytes:
+                    return
+            io, lk = self._io_lock(user_key), self._user_lock(user_key)
+            # en uso (petición o snapshot): no se espera, se prueba con el siguiente
+            if not io.acquire(blocking=False):
+                continue
+            try:
+                if not lk.acquire_write(blocking=False):
+                    continue
+                try:
+                    idx = self._idx.get(user_key)
+                    if idx is None:
+                        continue
+                    if user_key in self._dirty:
+                        # se va de memoria: se escribe aquí, bajo el lock
+                        self._write_snapshot(
+                            user_key,
+                            faiss.serialize_index(idx),
+                            dict(self._turns.get(user_key, {})),
+                        )
+                        trim_wal(self._path(user_key, "wal"), 0, self.wal_fsync)
+                    with self._lock:
+                        del self._idx[user_key]
+                        self._turns.pop(user_key, None)
+                        self._dirty.discard(user_key)
+                        self._resident_bytes -= self._bytes.pop(user_key, 0)
+                        HOT_RESIDENT_BYTES.set(self._resident_bytes)
+                    HOT_EVICTIONS.inc()
+                finally:
+                    lk.release_write()
+            finally:
+                io.release()
+
+    def resident_bytes(self) -> int:
+        return self._resident_bytes
+
+    def resident_users(self) -> List[str]:
+        with self._lock:
+            return list(self._idx)
+
+    def _read_turns(self, user_key: str, idx: faiss.Index) -> Dict[int, str]:
+        # turns.json se escribe antes que el índice: se descartan los ids que
+        # el snapshot no llegó a incluir
+        try:
+            with open(self._path(user_key, "turns.json"), "r", encoding="utf-8") as f:
+                raw = json.load(f)["turns"]
+        except FileNotFoundError:
+            return {}
+        ids = faiss.vector_to_array(idx.id_map).tolist()
+        return {i: str(raw[str(i)]) for i in ids if str(i) in raw}
+
+    def _write_turns(self, user_key: str, turns: Dict[int, str]) -> None:
+        if not turns:
+            return  # solo ids posicionales: no hay tabla que guardar
+        fd, tmp = tempfile.mkstemp(dir=self.index_dir, prefix=".turns-", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {"turns": {str(i): t for i, t in turns.items()}},
+                f,
+                ensure_ascii=False,
+                sort_keys=True,
+            )
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._path(user_key, "turns.json"))
+
+    def _append_wal(
+        self,
+        user_key: str,
+        start: int,
+        v: np.ndarray,
+        ids: np.ndarray,
+        turn_ids: List[Optional[str]],
+    ) -> None:
+        # requiere el lock de escritura del usuario
+        append_wal(
+            self._path(user_key, "wal"),
+            wal_record(start, v, ids, turn_ids),
+            self.wal_fsync,
+        )
+
+    def _replay_wal(
+        self, user_key: str, idx: faiss.Index, turns: Dict[int, str]
+    ) -> Tuple[faiss.Index, int]:
+        """Reaplica los registros del WAL que el snapshot no cubre: (índice, cuántos)."""
+        n = 0
+        for pos, ids, v, tids in read_wal(self._path(user_key, "wal"), self.dim):
+            if pos + len(ids) <= int(idx.ntotal):
+                continue  # ya en el snapshot
+            if pos != int(idx.ntotal):
+                break  # hueco: nada posterior es aplicable
+            # mismo lote que en el add original: mismo grafo HNSW
+            idx = self._grow(idx, v, ids)
+            turns.update((int(i), t) for i, t in zip(ids, tids) if t is not None)
+            n += 1
+        return idx, n
+
+    def _write_snapshot(self, user_key: str, blob: Any, turns: Dict[int, str]) -> None:
+        # requiere el lock de E/S de la franja, no el RWLock
+        try:
+            # primero la tabla: una más nueva que el índice solo sobra
+            self._write_turns(user_key, turns)
+            write_bytes_atomic(blob, self._path(user_key))
+        except BaseException:
+            HOT_SNAPSHOTS.labels(result="error").inc()
+            raise
+        HOT_SNAPSHOTS.labels(result="ok").inc()
+
+    def _snapshot(self, user_key: str, only_dirty: bool) -> bool:
+        with self._io_lock(user_key):
+            # bajo el lock de lectura solo la copia en memoria: los add quedan
+            # fuera unos microsegundos, no durante la escritura y el fsync
+            with self._locked(user_key) as idx:
+                if only_dirty and user_key not in self._dirty:
+                    return False
+                blob = faiss.serialize_index(idx)
+                turns = dict(self._turns.get(user_key, {}))
+                wal_end = wal_size(self._path(user_key, "wal"))
+                with self._lock:
+                    self._dirty.discard(user_key)
+            try:
+                self._write_snapshot(user_key, blob, turns)
+            except BaseException:
+                with self._lock:
+                    self._dirty.add(user_key)
+                raise
+            # el snapshot cubre el WAL hasta wal_end; lo anexado después queda
+            with self._user_lock(user_key).write():
+                trim_wal(self._path(user_key, "wal"), wal_end, self.wal_fsync)
+        return True
+
+    def dirty_users(self) -> List[str]:
+        with self._lock:
+            return sorted(self._dirty)
 
+    def snapshot(self, user_key: str) -> bool:
+        """Escribe el índice del usuario si tiene cambios sin snapshot."""
+        if user_key not in self._dirty:
+            return False
+        return self._snapshot(user_key, only_dirty=True)
+
+    def snapshot_dirty(self) -> int:
+        return sum(1 for u in self.dirty_users() if self.snapshot(u))
+
+    def persist(self, user_key: str) -> None:
+        self._snapshot(user_key, only_dirty=False)
+
+    def add(
+        self,
+        user_key: str,
+        vec: np.ndarray,
+        persist: bool = False,
+        turn_id: Optional[str] = None,
+    ) -> int:
+        """
+        Devuelve el id del (primer) vector: turn_vector_id(turn_id) o, sin
+        turn_id, su posición. Repetir un turn_id ya indexado no añade nada.
+        """
+        with self._locked(user_key, write=True) as idx:
             v = vec.reshape(1, -1) if vec.ndim == 1 else vec
             v = np.asarray(v, dtype=np.float32)
 
             if v.shape[1] != self.dim:
                 raise ValueError(f"dim mismatch: expected {self.dim}, got {v.shape[1]}")
 
+            turns = self._turns[user_key]
             before = int(idx.ntotal)
-            idx.add(v)
+            tids: List[Optional[str]]
+            if turn_id is None:
+                ids = np.arange(before, before + v.shape[0], dtype=np.int64)
+                tids = [None] * v.shape[0]
+            else:
+                if v.shape[0] != 1:
+                    raise ValueError("turn_id requires a single vector")
+                vid = turn_vector_id(turn_id)
+                if vid in turns:
+                    return vid
+                ids = np.array([vid], dtype=np.int64)
+                tids = [turn_id]
 
-            if persist:
-                faiss.write_index(idx, self._path(user_key))
+            grown = self._grow(idx, v, ids)
+            if grown is not idx:
+                # los que esperan el lock verán el cambio en _locked y reintentan
+                with self._lock:
+                    self._idx[user_key] = grown
+                idx = grown
+            turns.update((int(i), t) for i, t in zip(ids, tids) if t is not None)
 
-            return before
+            self._append_wal(user_key, before, v, ids, tids)
+            with self._lock:
+                self._dirty.add(user_key)
+                self._account(user_key, idx)
 
-    def search_candidates(self, user_key: str, q: np.ndarray, k: int) -> List[int]:
-        with self._lock:
-            idx = self._load_or_create(user_key)
+        if persist:
+            # fuera del lock de escritura: el snapshot toma el de E/S primero
+            self.persist(user_key)
+        self._enforce_budget(keep=user_key)
+        return int(ids[0])
+
+    def _search(
+        self, idx: faiss.Index, qv: np.ndarray, kk: int, budget_ms: Optional[float]
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        # requiere el lock de lectura del usuario; efSearch va por consulta
+        # (SearchParametersHNSW), nunca se muta el índice compartido
+        if self.ef_model is None or not is_hnsw(idx):
+            return idx.search(qv, kk)
+        ef = self.ef_model.choose_ef(int(idx.ntotal), budget_ms, kk)
+        return idx.search(qv, kk, params=faiss.SearchParametersHNSW(efSearch=ef))
+
+    def search_candidates(
+        self,
+        user_key: str,
+        q: np.ndarray,
+        k: int,
+        budget_ms: Optional[float] = None,
+    ) -> List[int]:
+        with self._locked(user_key) as idx:
             if int(idx.ntotal) == 0:
                 return []
 
@@ -83,28 +656,88 @@ class FaissHNSWHotIndex:
             qv = np.asarray(qv, dtype=np.float32)
             kk = min(int(k), int(idx.ntotal))
 
-            dist, idxs = idx.search(qv, kk)
+            _, idxs = self._search(idx, qv, kk, budget_ms)
             return [int(x) for x in idxs.reshape(-1).tolist() if int(x) >= 0]
 
+    def _rerank(
+        self,
+        idx: faiss.Index,
+        q: np.ndarray,
+        k_candidates: int,
+        budget_ms: Optional[float],
+    ) -> List[Tuple[int, float]]:
+        # requiere el lock de lectura del usuario
+        if int(idx.ntotal) == 0:
+            return []
+
+        qv = q.reshape(1, -1) if q.ndim == 1 else q
+        qv = np.asarray(qv, dtype=np.float32)
+        kk = min(int(k_candidates), int(idx.ntotal))
+
+        dist, idxs = self._search(idx, qv, kk, budget_ms)
+        pairs = [
+            (int(i), float(d))
+            for i, d in zip(idxs.reshape(-1), dist.reshape(-1))
+            if int(i) >= 0
+        ]
+        # Orden estable por distancia y luego id
+        pairs.sort(key=lambda t: (t[1], t[0]))
+        return pairs
+
     def search_rerank_exact(
-        self, user_key: str, q: np.ndarray, k_candidates: int = 10
+        self,
+        user_key: str,
+        q: np.ndarray,
+        k_candidates: int = 10,
+        budget_ms: Optional[float] = None,
     ) -> List[Tuple[int, float]]:
         # Para mantener determinismo: usa faiss search como ranking base.
-        with self._lock:
-            idx = self._load_or_create(user_key)
-            if int(idx.ntotal) == 0:
-                return []
+        with self._locked(user_key) as idx:
+            return self._rerank(idx, q, k_candidates, budget_ms)
 
-            qv = q.reshape(1, -1) if q.ndim == 1 else q
-            qv = np.asarray(qv, dtype=np.float32)
-            kk = min(int(k_candidates), int(idx.ntotal))
-
-            dist, idxs = idx.search(qv, kk)
-            pairs = [
-                (int(i), float(d))
-                for i, d in zip(idxs.reshape(-1), dist.reshape(-1))
-                if int(i) >= 0
-            ]
-            # Orden estable por distancia y luego id
-            pairs.sort(key=lambda t: (t[1], t[0]))
-            return pairs
+    def search_turns(
+        self,
+        user_key: str,
+        q: np.ndarray,
+        k_candidates: int = 10,
+        budget_ms: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """Como search_rerank_exact, con turn_ids (se omiten vectores sin turno)."""
+        with self._locked(user_key) as idx:
+            turns = self._turns[user_key]
+            pairs = self._rerank(idx, q, k_candidates, budget_ms)
+            return [(turns[i], d) for i, d in pairs if i in turns]
+
+
+def write_bytes_atomic(data: Any, path: str) -> None:
+    """
+    Escribe data (p. ej. faiss.serialize_index, tomado bajo lock) a un
+    temporal del mismo directorio + fsync + os.replace + fsync del directorio.
+    """
+    d = os.path.dirname(path) or "."
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=".snapshot-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(memoryview(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    _fsync_dir(d)
+
+
+def _fsync_dir(path: str) -> None:
+    # hace durable el rename (no disponible en todas las plataformas)
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,402 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from dmr.index.faiss_hot import (
+    RWLock,
+    append_wal,
+    read_wal,
+    trim_wal,
+    wal_record,
+    wal_size,
+    write_bytes_atomic,
+)
+
+try:
+    import faiss  # type: ignore
+except Exception as e:  # pragma: no cover
+    raise RuntimeError("faiss is required for PackedHotIndex") from e
+
+# id FAISS = (slot del usuario en su partición << 32) | seq del vector en el usuario
+SEQ_BITS = 32
+SEQ_MASK = (1 << SEQ_BITS) - 1
+
+
+def pack_id(slot: int, seq: int) -> int:
+    return (int(slot) << SEQ_BITS) | int(seq)
+
+
+def unpack_id(packed: int) -> Tuple[int, int]:
+    return int(packed) >> SEQ_BITS, int(packed) & SEQ_MASK
+
+
+def partition_of(user_key: str, partitions: int) -> int:
+    return zlib.crc32(user_key.encode("utf-8")) % int(partitions)
+
+
+class _Partition:
+    __slots__ = (
+        "index",
+        "flat",
+        "slots",
+        "rows",
+        "turns",
+        "seq_of",
+        "lock",
+        "io_lock",
+        "dirty",
+    )
+
+    def __init__(self, index: faiss.Index, slots: Dict[str, int]) -> None:
+        self.index = index
+        self.flat = faiss.downcast_index(index.index)
+        self.slots = slots
+        # filas internas (orden de inserción = orden de seq) por slot
+        self.rows: Dict[int, List[int]] = {s: [] for s in slots.values()}
+        # turn_id por seq (None si se añadió sin turn_id) y su inverso
+        self.turns: Dict[int, List[Optional[str]]] = {s: [] for s in slots.values()}
+        self.seq_of: Dict[Tuple[int, str], int] = {}
+        self.lock = RWLock()
+        # ordena los snapshots de la partición; se toma antes que lock
+        self.io_lock = threading.Lock()
+        self.dirty = False
+
+
+class PackedHotIndex:
+    """
+    Layout alternativo a FaissHNSWHotIndex para muchos usuarios pequeños: un
+    IndexIDMap2(IndexFlatL2) por partición (crc32(user_key) % partitions) en
+    vez de un índice y un fichero por usuario. La búsqueda de un usuario se
+    restringe a su rango de ids con IDSelectorRange; search_batch resuelve
+    consultas de varios usuarios de una partición en una sola llamada
+    (compute_distance_subset sobre las filas de cada usuario). La búsqueda es
+    exacta, así que single y batch devuelven lo mismo.
+
+    Misma interfaz que FaissHNSWHotIndex (add devuelve la posición del vector
+    dentro del usuario, search_turns devuelve turn_ids): los ids siguen
+    siendo (slot, seq) y el turn_id de cada seq va en users.json.
+    Durabilidad: como en FaissHNSWHotIndex, add() anexa el lote a un WAL por
+    partición (part-NNNNN.wal, mismo formato de registro con [user_key,
+    turn_ids] como JSON) que la carga reaplica; persist()/snapshot_dirty()
+    copian la partición bajo el lock de lectura, escriben y hacen fsync sin
+    él y quitan del WAL lo que cubre el snapshot. Sin presupuesto de residencia: todas las particiones
+    tocadas quedan en memoria.
+    """
+
+    def __init__(
+        self,
+        dim: int,
+        index_dir: str,
+        partitions: int = 64,
+        omp_threads: int = 1,
+        batch_max_rows: int = 4096,
+        wal_fsync: bool = False,
+    ) -> None:
+        self.dim = int(dim)
+        self.wal_fsync = bool(wal_fsync)
+        self.index_dir = index_dir
+        self.partitions = int(partitions)
+        # usuarios con más filas van por IDSelector en search_batch
+        self.batch_max_rows = int(batch_max_rows)
+        self._lock = threading.Lock()
+        self._load_locks: Dict[int, threading.Lock] = {}
+        self._parts: Dict[int, _Partition] = {}
+
+        os.makedirs(self.index_dir, exist_ok=True)
+        try:
+            faiss.omp_set_num_threads(int(omp_threads))
+        except Exception:
+            pass
+
+    def _path(self, pid: int, ext: str) -> str:
+        return os.path.join(self.index_dir, f"part-{pid:05d}.{ext}")
+
+    def _load(self, pid: int) -> _Partition:
+        p = self._path(pid, "faiss")
+        if not os.path.exists(p):
+            part = _Partition(faiss.IndexIDMap2(faiss.IndexFlatL2(self.dim)), {})
+        else:
+            part = self._load_snapshot(pid, p)
+        for pos, ids, v, (user_key, tids) in read_wal(self._path(pid, "wal"), self.dim):
+            if pos + len(ids) <= int(part.index.ntotal):
+                continue  # ya en el snapshot
+            if pos != int(part.index.ntotal):
+                break  # hueco: nada posterior es aplicable
+            slot = part.slots.setdefault(str(user_key), int(ids[0]) >> SEQ_BITS)
+            self._apply(part, slot, v, ids, tids)
+            part.dirty = True
+        return part
+
+    def _load_snapshot(self, pid: int, p: str) -> _Partition:
+        with open(self._path(pid, "users.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        slots = {str(u): int(s) for u, s in meta["slots"].items()}
+        part = _Partition(faiss.read_index(p), slots)
+        ids = faiss.vector_to_array(part.index.id_map)
+        for row, packed in enumerate(ids.tolist()):
+            part.rows[packed >> SEQ_BITS].append(row)
+        # users.json puede ser más nuevo que el índice: se recorta a sus filas
+        saved = meta.get("turns", {})
+        for slot, rows in part.rows.items():
+            turns = list(saved.get(str(slot), []))[: len(rows)]
+            turns += [None] * (len(rows) - len(turns))
+            part.turns[slot] = turns
+            for seq, tid in enumerate(turns):
+                if tid is not None:
+                    part.seq_of[(slot, tid)] = seq
+        return part
+
+    def _partition(self, user_key: str) -> _Partition:
+        pid = partition_of(user_key, self.partitions)
+        part = self._parts.get(pid)
+        if part is not None:
+            return part
+        with self._lock:
+            load_lock = self._load_locks.setdefault(pid, threading.Lock())
+        # la carga de una partición no bloquea a las demás
+        with load_lock:
+            part = self._parts.get(pid)
+            if part is None:
+                part = self._load(pid)
+                with self._lock:
+                    self._parts[pid] = part
+        return part
+
+    def _persist_partition(
+        self, pid: int, part: _Partition, only_dirty: bool = False
+    ) -> bool:
+        with part.io_lock:
+            # bajo el lock de lectura solo la copia en memoria; la escritura y
+            # los fsync van sin él (no frenan add ni búsquedas de la partición)
+            with part.lock.read():
+                if only_dirty and not part.dirty:
+                    return False
+                blob = faiss.serialize_index(part.index)
+                meta = json.dumps(
+                    {"slots": part.slots, "turns": part.turns},
+                    ensure_ascii=False,
+                    sort_keys=True,
+                ).encode("utf-8")
+                wal_end = wal_size(self._path(pid, "wal"))
+                part.dirty = False
+            try:
+                # primero los slots: un users.json más nuevo que el índice solo
+                # tiene slots de sobra (inofensivo)
+                write_bytes_atomic(meta, self._path(pid, "users.json"))
+                write_bytes_atomic(blob, self._path(pid, "faiss"))
+            except BaseException:
+                part.dirty = True
+                raise
+            # el snapshot cubre el WAL hasta wal_end; lo anexado después queda
+            with part.lock.write():
+                trim_wal(self._path(pid, "wal"), wal_end, self.wal_fsync)
+        return True
+
+    def persist(self, user_key: str) -> None:
+        part = self._partition(user_key)
+        self._persist_partition(partition_of(user_key, self.partitions), part)
+
+    def snapshot_dirty(self) -> int:
+        with self._lock:
+            parts = sorted(self._parts.items())
+        return sum(
+            1
+            for pid, part in parts
+            if part.dirty and self._persist_partition(pid, part, only_dirty=True)
+        )
+
+    def add(
+        self,
+        user_key: str,
+        vec: np.ndarray,
+        persist: bool = False,
+        turn_id: Optional[str] = None,
+    ) -> int:
+        v = vec.reshape(1, -1) if vec.ndim == 1 else vec
+        v = np.asarray(v, dtype=np.float32)
+        if v.shape[1] != self.dim:
+            raise ValueError(f"dim mismatch: expected {self.dim}, got {v.shape[1]}")
+        if turn_id is not None and v.shape[0] != 1:
+            raise ValueError("turn_id requires a single vector")
+
+        part = self._partition(user_key)
+        with part.lock.write():
+            slot = part.slots.get(user_key)
+            if slot is None:
+                slot = part.slots[user_key] = len(part.slots)
+                part.rows[slot] = []
+                part.turns[slot] = []
+            if turn_id is not None and (slot, turn_id) in part.seq_of:
+                return part.seq_of[(slot, turn_id)]
+            before = len(part.rows[slot])
+            first_row = int(part.index.ntotal)
+            ids = np.array(
+                [pack_id(slot, before + j) for j in range(v.shape[0])], dtype=np.int64
+            )
+            tids = [turn_id] * v.shape[0]
+            self._apply(part, slot, v, ids, tids)
+            pid = partition_of(user_key, self.partitions)
+            append_wal(
+                self._path(pid, "wal"),
+                wal_record(first_row, v, ids, [user_key, tids]),
+                self.wal_fsync,
+            )
+            part.dirty = True
+        if persist:
+            # fuera del lock de escritura: el snapshot toma io_lock primero
+            self._persist_partition(pid, part)
+        return before
+
+    def _apply(
+        self,
+        part: _Partition,
+        slot: int,
+        v: np.ndarray,
+        ids: np.ndarray,
+        tids: List[Optional[str]],
+    ) -> None:
+        # requiere el lock de escritura de la partición (o la carga)
+        rows = part.rows.setdefault(slot, [])
+        turns = part.turns.setdefault(slot, [])
+        first_row = int(part.index.ntotal)
+        part.index.add_with_ids(v, ids)
+        rows.extend(range(first_row, first_row + v.shape[0]))
+        for i, t in zip(ids.tolist(), tids):
+            if t is not None:
+                part.seq_of[(slot, t)] = i & SEQ_MASK
+        turns.extend(tids)
+
+    def user_size(self, user_key: str) -> int:
+        part = self._partition(user_key)
+        slot = part.slots.get(user_key)
+        return 0 if slot is None else len(part.rows[slot])
+
+    def _search_selector(
+        self, part: _Partition, slot: int, q: np.ndarray, k: int
+    ) -> List[Tuple[int, float]]:
+        # requiere el lock de lectura de la partición
+        kk = min(int(k), len(part.rows[slot]))
+        if kk <= 0:
+            return []
+        sel = faiss.IDSelectorRange(pack_id(slot, 0), pack_id(slot + 1, 0))
+        dist, ids = part.index.search(
+            q.reshape(1, -1), kk, params=faiss.SearchParameters(sel=sel)
+        )
+        pairs = [
+            (int(i) & SEQ_MASK, float(d))
+            for i, d in zip(ids.reshape(-1), dist.reshape(-1))
+            if int(i) >= 0
+        ]
+        # Orden estable por distancia y luego seq
+        pairs.sort(key=lambda t: (t[1], t[0]))
+        return pairs
+
+    def search_rerank_exact(
+        self,
+        user_key: str,
+        q: np.ndarray,
+        k_candidates: int = 10,
+        budget_ms: Optional[float] = None,
+    ) -> List[Tuple[int, float]]:
+        # búsqueda exacta: budget_ms no cambia nada (misma firma que el per-user)
+        part = self._partition(user_key)
+        qv = np.asarray(q, dtype=np.float32).reshape(-1)
+        with part.lock.read():
+            slot = part.slots.get(user_key)
+            if slot is None:
+                return []
+            return self._search_selector(part, slot, qv, k_candidates)
+
+    def search_turns(
+        self,
+        user_key: str,
+        q: np.ndarray,
+        k_candidates: int = 10,
+        budget_ms: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        part = self._partition(user_key)
+        qv = np.asarray(q, dtype=np.float32).reshape(-1)
+        with part.lock.read():
+            slot = part.slots.get(user_key)
+            if slot is None:
+                return []
+            turns = part.turns[slot]
+            pairs = self._search_selector(part, slot, qv, k_candidates)
+            return [(turns[s], d) for s, d in pairs if turns[s] is not None]
+
+    def search_candidates(
+        self,
+        user_key: str,
+        q: np.ndarray,
+        k: int,
+        budget_ms: Optional[float] = None,
+    ) -> List[int]:
+        return [i for i, _ in self.search_rerank_exact(user_key, q, k_candidates=k)]
+
+    def search_batch(
+        self, requests: Sequence[Tuple[str, np.ndarray]], k: int = 10
+    ) -> List[List[Tuple[int, float]]]:
+        """
+        Búsqueda de varias (user_key, query) a la vez; mismo resultado que
+        search_rerank_exact por separado. Una llamada FAISS por partición.
+        """
+        out: List[List[Tuple[int, float]]] = [[] for _ in requests]
+        by_part: Dict[int, List[int]] = {}
+        for i, (user_key, _) in enumerate(requests):
+            by_part.setdefault(partition_of(user_key, self.partitions), []).append(i)
+
+        for pid in sorted(by_part):
+            part = self._partition(requests[by_part[pid][0]][0])
+            with part.lock.read():
+                small: List[Tuple[int, List[int]]] = []
+                for i in by_part[pid]:
+                    user_key, q = requests[i]
+                    slot = part.slots.get(user_key)
+                    if slot is None:
+                        continue
+                    qv = np.asarray(q, dtype=np.float32).reshape(-1)
+                    rows = part.rows[slot]
+                    if len(rows) > self.batch_max_rows:
+                        out[i] = self._search_selector(part, slot, qv, k)
+                    elif rows:
+                        small.append((i, rows))
+                if small:
+                    self._batch_subset(part, requests, small, k, out)
+        return out
+
+    def _batch_subset(
+        self,
+        part: _Partition,
+        requests: Sequence[Tuple[str, np.ndarray]],
+        small: List[Tuple[int, List[int]]],
+        k: int,
+        out: List[List[Tuple[int, float]]],
+    ) -> None:
+        # requiere el lock de lectura de la partición
+        width = max(len(rows) for _, rows in small)
+        labels = np.full((len(small), width), -1, dtype=np.int64)
+        for j, (_, rows) in enumerate(small):
+            labels[j, : len(rows)] = rows
+        qs = np.stack(
+            [np.asarray(requests[i][1], dtype=np.float32).reshape(-1) for i, _ in small]
+        )
+        dist = np.empty(labels.shape, dtype=np.float32)
+        # las filas -1 de relleno salen con distancia inf
+        part.flat.compute_distance_subset(
+            len(small),
+            faiss.swig_ptr(qs),
+            width,
+            faiss.swig_ptr(dist),
+            faiss.swig_ptr(labels),
+        )
+        for j, (i, rows) in enumerate(small):
+            # la columna c de un usuario es su vector seq=c
+            pairs = [(c, float(d)) for c, d in enumerate(dist[j, : len(rows)])]
+            pairs.sort(key=lambda t: (t[1], t[0]))
+            out[i] = pairs[: int(k)]
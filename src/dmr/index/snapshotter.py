@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import threading
+from typing import Optional, Union
+
+from dmr.index.faiss_hot import FaissHNSWHotIndex
+from dmr.index.packed_hot import PackedHotIndex
+
+
+class HotIndexSnapshotter:
+    """
+    Hilo de fondo que cada interval_s escribe los índices hot con cambios
+    (snapshot atómico + vaciado de WAL), fuera del camino de las peticiones.
+    Entre snapshots la durabilidad la da el WAL (por usuario en
+    FaissHNSWHotIndex, por partición en PackedHotIndex).
+    """
+
+    def __init__(
+        self,
+        hot_index: Union[FaissHNSWHotIndex, PackedHotIndex],
+        interval_s: float = 5.0,
+    ) -> None:
+        self.hot_index = hot_index
+        self.interval_s = float(interval_s)
+        self.last_error: Optional[BaseException] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def run_once(self) -> int:
+        return self.hot_index.snapshot_dirty()
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.run_once()
+            except Exception as e:  # el siguiente ciclo reintenta (WAL intacto)
+                self.last_error = e
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._loop, name="dmr-hot-snapshotter", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, flush: bool = True) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if flush:
+            self.run_once()
@@ -1,3 +1,21 @@
-from .prom import REQS, LAT, mark
+from .prom import (
+    REQS,
+    LAT,
+    PRE_CACHE,
+    HOT_EVICTIONS,
+    HOT_RELOADS,
+    HOT_RESIDENT_BYTES,
+    HOT_SNAPSHOTS,
+    mark,
+)
 
-__all__ = ["REQS", "LAT", "mark"]
+__all__ = [
+    "REQS",
+    "LAT",
+    "PRE_CACHE",
+    "HOT_EVICTIONS",
+    "HOT_RELOADS",
+    "HOT_RESIDENT_BYTES",
+    "HOT_SNAPSHOTS",
+    "mark",
+]
@@ -1,8 +1,21 @@
 from __future__ import annotations
-from prometheus_client import Counter, Histogram
+from prometheus_client import Counter, Gauge, Histogram
 
 REQS = Counter("dmr_requests_total", "Total requests", ["endpoint"])
 LAT = Histogram("dmr_latency_ms", "Latency ms", ["endpoint"])
+PRE_CACHE = Counter(
+    "dmr_pre_cache_total", "/pre response cache lookups and Redis errors", ["result"]
+)
+HOT_EVICTIONS = Counter(
+    "dmr_hot_index_evictions_total", "Hot indexes evicted from memory"
+)
+HOT_RELOADS = Counter("dmr_hot_index_reloads_total", "Hot indexes loaded from disk")
+HOT_SNAPSHOTS = Counter(
+    "dmr_hot_index_snapshots_total", "Hot index snapshots written", ["result"]
+)
+HOT_RESIDENT_BYTES = Gauge(
+    "dmr_hot_index_resident_bytes", "Estimated bytes of resident hot indexes"
+)
 
 
 def mark(endpoint: str) -> None:
@@ -1,4 +1,11 @@
 from .redis_hot import RedisHotStorage
-from .cold_sqlite import SQLiteColdStore, ColdRow
+from .redis_hot_async import AsyncRedisHotStorage
+from .cold_sqlite import SQLiteColdStore, ColdRow, ColdDeadlineExceeded
 
-__all__ = ["RedisHotStorage", "SQLiteColdStore", "ColdRow"]
+__all__ = [
+    "RedisHotStorage",
+    "AsyncRedisHotStorage",
+    "SQLiteColdStore",
+    "ColdRow",
+    "ColdDeadlineExceeded",
+]
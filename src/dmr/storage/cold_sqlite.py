@@ -3,7 +3,14 @@ from __future__ import annotations
 import sqlite3
 import time
 from dataclasses import dataclass
-from typing import Iterable, List
+from typing import Iterable, List, Optional
+
+# the deadline is checked every N SQLite VM instructions (progress handler)
+_PROGRESS_STEPS = 1000
+
+
+class ColdDeadlineExceeded(TimeoutError):
+    """search_fts was interrupted inside SQLite because its budget ran out."""
 
 
 @dataclass(frozen=True)
@@ -154,10 +161,22 @@ class SQLiteColdStore:
         query: str,
         limit: int = 20,
         budget_ms: float = 50.0,
+        deadline: Optional[float] = None,
         _retry: bool = True,
     ) -> List[ColdRow]:
-        t0 = time.perf_counter()
+        """
+        deadline: absolute time.perf_counter() (default: now + budget_ms). The
+        query is interrupted inside SQLite once it passes, so the calling
+        thread is released; raises ColdDeadlineExceeded.
+        """
+        if deadline is None:
+            deadline = time.perf_counter() + float(budget_ms) / 1000.0
+        if time.perf_counter() >= deadline:
+            raise ColdDeadlineExceeded("cold budget exhausted before the query")
         with self._connect() as con:
+            con.set_progress_handler(
+                lambda: int(time.perf_counter() >= deadline), _PROGRESS_STEPS
+            )
             try:
                 cur = con.execute(
                     """
@@ -173,8 +192,6 @@ class SQLiteColdStore:
                 )
                 out: List[ColdRow] = []
                 for row in cur.fetchall():
-                    if (time.perf_counter() - t0) * 1000.0 > float(budget_ms):
-                        break
                     out.append(
                         ColdRow(
                             row[0],
@@ -189,6 +206,8 @@ class SQLiteColdStore:
                 return out
             except sqlite3.DatabaseError as e:
                 msg = str(e).lower()
+                if "interrupted" in msg and time.perf_counter() >= deadline:
+                    raise ColdDeadlineExceeded("cold query interrupted") from e
                 if _retry and (
                     "fts5:" in msg or "cold_fts" in msg or "missing row" in msg
                 ):
@@ -198,5 +217,11 @@ class SQLiteColdStore:
 
         self.repair_fts()
         return self.search_fts(
-            tenant_id, user_id, query, limit=limit, budget_ms=budget_ms, _retry=False
+            tenant_id,
+            user_id,
+            query,
+            limit=limit,
+            budget_ms=budget_ms,
+            deadline=deadline,
+            _retry=False,
         )
@@ -2,10 +2,35 @@ from __future__ import annotations
 
 import time
 from dataclasses import dataclass
-from typing import Dict, List, Optional, Sequence
+from typing import Dict, List, Optional, Sequence, Union
 
 import redis
 
+# Un round trip: turn_ids (del índice hot) -> filtro de tombstones -> hash del
+# turno. Devuelve 4 valores planos por turn_id ("" si no hay turno vivo).
+# Todas las claves se declaran: KEYS[1] = tombstones, KEYS[i + 1] = hash del
+# turno ARGV[i] (el script no construye nombres de clave).
+_FETCH_HOT_LUA = """
+local out = {}
+for i = 1, #ARGV do
+    local tid = ARGV[i]
+    if redis.call('SISMEMBER', KEYS[1], tid) == 0 then
+        local h = redis.call('HMGET', KEYS[i + 1], 'text', 'signature', 'ts')
+        if h[1] then
+            table.insert(out, tid)
+            table.insert(out, h[1])
+            table.insert(out, h[2] or '')
+            table.insert(out, h[3] or '0')
+        else
+            for _ = 1, 4 do table.insert(out, '') end
+        end
+    else
+        for _ = 1, 4 do table.insert(out, '') end
+    end
+end
+return out
+"""
+
 
 @dataclass(frozen=True)
 class TurnRecord:
@@ -14,12 +39,25 @@ class TurnRecord:
     ts: float
 
 
-class RedisHotStorage:
-    def __init__(
-        self, url: str = "redis://localhost:6379/0", prefix: str = "dmr"
-    ) -> None:
-        self.r = redis.Redis.from_url(url, decode_responses=True)
-        self.prefix = prefix
+def _parse_fetch_hot(raw: Sequence[str]) -> List[Optional[Dict]]:
+    out: List[Optional[Dict]] = []
+    for j in range(0, len(raw), 4):
+        tid, text, sig, ts = raw[j : j + 4]
+        if not tid:
+            out.append(None)
+            continue
+        try:
+            tsf = float(ts or 0.0)
+        except ValueError:
+            tsf = 0.0
+        out.append({"turn_id": tid, "text": text, "signature": sig, "ts": tsf})
+    return out
+
+
+class HotKeys:
+    """Esquema de claves compartido por el cliente síncrono y el asyncio."""
+
+    prefix: str
 
     def _turn_key(self, user_key: str, turn_id: str) -> str:
         return f"{self.prefix}:turn:{user_key}:{turn_id}"
@@ -27,6 +65,33 @@ class RedisHotStorage:
     def _idxmap_key(self, user_key: str) -> str:
         return f"{self.prefix}:idxmap:{user_key}"
 
+    def _tomb_key(self, user_key: str) -> str:
+        return f"{self.prefix}:tomb:{user_key}"
+
+    def _fetch_hot_keys(self, user_key: str, turn_ids: Sequence[str]) -> List[str]:
+        return [
+            self._tomb_key(user_key),
+            *[self._turn_key(user_key, str(t)) for t in turn_ids],
+        ]
+
+    def _fetch_hot_args(self, turn_ids: Sequence[str]) -> List[str]:
+        return [str(t) for t in turn_ids]
+
+
+class RedisHotStorage(HotKeys):
+    def __init__(
+        self,
+        url: Union[str, redis.Redis] = "redis://localhost:6379/0",
+        prefix: str = "dmr",
+    ) -> None:
+        # acepta URL o un cliente ya construido (decode_responses=True)
+        if isinstance(url, str):
+            self.r = redis.Redis.from_url(url, decode_responses=True)
+        else:
+            self.r = url
+        self.prefix = prefix
+        self._fetch_hot = self.r.register_script(_FETCH_HOT_LUA)
+
     def put_turn(
         self,
         user_key: str,
@@ -78,3 +143,26 @@ class RedisHotStorage:
             pipe.lindex(key, int(i))
         raw = pipe.execute()
         return [x if x is not None else None for x in raw]
+
+    def tombstone(self, user_key: str, turn_id: str) -> bool:
+        """Marca el turno como olvidado; False si no existe."""
+        if not self.r.exists(self._turn_key(user_key, turn_id)):
+            return False
+        self.r.sadd(self._tomb_key(user_key), turn_id)
+        return True
+
+    def tombstoned(self, user_key: str, turn_id: str) -> bool:
+        return bool(self.r.sismember(self._tomb_key(user_key), turn_id))
+
+    def fetch_hot(self, user_key: str, turn_ids: Sequence[str]) -> List[Optional[Dict]]:
+        """
+        Bulk: turn_ids -> turnos vivos, en un solo round trip (Lua).
+        Alineado con `turn_ids`; None si no hay turno o está tombstoned.
+        """
+        if not turn_ids:
+            return []
+        raw = self._fetch_hot(
+            keys=self._fetch_hot_keys(user_key, turn_ids),
+            args=self._fetch_hot_args(turn_ids),
+        )
+        return _parse_fetch_hot(raw)
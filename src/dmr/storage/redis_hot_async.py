@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import time
+from typing import Dict, List, Optional, Sequence, Union
+
+import redis.asyncio as aioredis
+
+from .redis_hot import _FETCH_HOT_LUA, HotKeys, _parse_fetch_hot
+
+
+class AsyncRedisHotStorage(HotKeys):
+    """Variante redis.asyncio de RedisHotStorage (mismas claves, mismo script)."""
+
+    def __init__(
+        self,
+        url: Union[str, aioredis.Redis] = "redis://localhost:6379/0",
+        prefix: str = "dmr",
+    ) -> None:
+        if isinstance(url, str):
+            self.r = aioredis.Redis.from_url(url, decode_responses=True)
+        else:
+            self.r = url
+        self.prefix = prefix
+        self._fetch_hot = self.r.register_script(_FETCH_HOT_LUA)
+
+    async def put_turn(
+        self,
+        user_key: str,
+        turn_id: str,
+        text: str,
+        signature: str,
+        ts: Optional[float] = None,
+    ) -> None:
+        if ts is None:
+            ts = time.time()
+
+        pipe = self.r.pipeline(transaction=True)
+        pipe.hset(
+            self._turn_key(user_key, turn_id),
+            mapping={"text": text, "signature": signature, "ts": str(float(ts))},
+        )
+        await pipe.execute()
+
+    async def get_turn(self, user_key: str, turn_id: str) -> Optional[Dict]:
+        d = await self.r.hgetall(self._turn_key(user_key, turn_id))
+        if not d:
+            return None
+        try:
+            ts = float(d.get("ts", "0") or 0.0)
+        except Exception:
+            ts = 0.0
+        return {
+            "text": d.get("text", ""),
+            "signature": d.get("signature", ""),
+            "ts": ts,
+        }
+
+    async def tombstone(self, user_key: str, turn_id: str) -> bool:
+        if not await self.r.exists(self._turn_key(user_key, turn_id)):
+            return False
+        await self.r.sadd(self._tomb_key(user_key), turn_id)
+        return True
+
+    async def tombstoned(self, user_key: str, turn_id: str) -> bool:
+        return bool(await self.r.sismember(self._tomb_key(user_key), turn_id))
+
+    async def fetch_hot(
+        self, user_key: str, turn_ids: Sequence[str]
+    ) -> List[Optional[Dict]]:
+        if not turn_ids:
+            return []
+        raw = await self._fetch_hot(
+            keys=self._fetch_hot_keys(user_key, turn_ids),
+            args=self._fetch_hot_args(turn_ids),
+        )
+        return _parse_fetch_hot(raw)
+
+    async def aclose(self) -> None:
+        await self.r.aclose()
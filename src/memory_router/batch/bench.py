@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+from .synth import CorpusGenerator
+
+# Benchmark offline de run_offline por tamaño de corpus. Cada tamaño corre en
+# un subproceso propio para que el pico de RSS sea el de ese tamaño.
+
+BENCH_SCHEMA = "batch_bench.v1"
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+_SCHEMAS_DIR = Path(__file__).resolve().parents[1] / "config" / "schemas"
+
+
+def _run_one(corpus: Path, work: Path, workers: int) -> Dict[str, Any]:
+    profile_path = work / "run_profile.json"
+    cmd = [
+        sys.executable,
+        "-m",
+        "memory_router.batch.runner",
+        "--corpus",
+        str(corpus),
+        "--out",
+        str(work / "out"),
+        "--schemas",
+        str(_SCHEMAS_DIR),
+        "--config-version",
+        "bench",
+        "--trace-id",
+        "bench",
+        "--workers",
+        str(workers),
+        "--profile-out",
+        str(profile_path),
+    ]
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True)
+    wall = time.perf_counter() - t0
+    prof = json.loads(profile_path.read_text(encoding="utf-8"))
+    return {"wall_s": wall, "profile": prof}
+
+
+def run_suite(
+    sizes: Sequence[int] = DEFAULT_SIZES,
+    seed: int = 0,
+    workers: int = 1,
+    work_dir: Optional[Path] = None,
+) -> Dict[str, Any]:
+    """Genera un corpus por tamaño, ejecuta el runner y recoge su run_profile.json."""
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory(dir=work_dir) as tmp:
+        for n in sizes:
+            work = Path(tmp) / f"n{n}"
+            corpus = CorpusGenerator(seed=seed).write_jsonl(work / "corpus.jsonl", n)
+            got = _run_one(corpus, work, workers)
+            prof = got["profile"]
+            wall = got["wall_s"]
+            results[str(n)] = {
+                "rows": int(n),
+                "wall_s": round(wall, 6),
+                "rows_per_sec": round(n / wall, 3) if wall > 0 else 0.0,
+                "peak_rss_kb": int(prof.get("process_peak_rss_kb", 0)),
+                "stages": prof.get("stages", {}),
+            }
+    return {
+        "schema": BENCH_SCHEMA,
+        "seed": int(seed),
+        "workers": int(workers),
+        "env": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "sizes": results,
+    }
+
+
+def compare_reports(
+    baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.20
+) -> List[str]:
+    """
+    Regresiones de current frente a baseline (solo tamaños presentes en ambos):
+    throughput (rows/sec y items/sec por etapa) por debajo de (1 - tolerance) o
+    pico de RSS por encima de (1 + tolerance).
+    """
+    out: List[str] = []
+
+    def slower(what: str, base: float, cur: float) -> None:
+        if base > 0 and cur < base * (1.0 - tolerance):
+            out.append(f"{what}: {cur:.1f}/s vs baseline {base:.1f}/s")
+
+    for size in sorted(set(baseline["sizes"]) & set(current["sizes"]), key=int):
+        b, c = baseline["sizes"][size], current["sizes"][size]
+        slower(f"n={size} rows_per_sec", b["rows_per_sec"], c["rows_per_sec"])
+        for stage in sorted(set(b["stages"]) & set(c["stages"])):
+            slower(
+                f"n={size} {stage}.items_per_sec",
+                b["stages"][stage]["items_per_sec"],
+                c["stages"][stage]["items_per_sec"],
+            )
+        if b["peak_rss_kb"] > 0 and c["peak_rss_kb"] > b["peak_rss_kb"] * (
+            1.0 + tolerance
+        ):
+            out.append(
+                f"n={size} peak_rss_kb: {c['peak_rss_kb']} vs baseline {b['peak_rss_kb']}"
+            )
+    return out
+
+
+def _load(path: str) -> Dict[str, Any]:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description="Batch runner benchmark suite")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    run = sub.add_parser("run", help="run the suite and write a JSON report")
+    run.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES))
+    run.add_argument("--seed", type=int, default=0)
+    run.add_argument("--workers", type=int, default=1)
+    run.add_argument("--out", required=True)
+    run.add_argument(
+        "--baseline", default=None, help="compare against this report when done"
+    )
+    run.add_argument("--tolerance", type=float, default=0.20)
+
+    cmp_ = sub.add_parser("compare", help="flag regressions of CURRENT vs BASELINE")
+    cmp_.add_argument("baseline")
+    cmp_.add_argument("current")
+    cmp_.add_argument("--tolerance", type=float, default=0.20)
+
+    args = ap.parse_args(argv)
+    if args.cmd == "run":
+        sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+        report = run_suite(sizes, seed=args.seed, workers=args.workers)
+        Path(args.out).write_text(
+            json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        if args.baseline is None:
+            return 0
+        baseline, current = _load(args.baseline), report
+    else:
+        baseline, current = _load(args.baseline), _load(args.current)
+
+    regressions = compare_reports(baseline, current, args.tolerance)
+    for r in regressions:
+        print(f"[bench] REGRESSION {r}")
+    if not regressions:
+        print(f"[bench] ok (tolerance {args.tolerance:.0%})")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
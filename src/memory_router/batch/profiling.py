@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import cProfile
+import json
+from pathlib import Path
+from time import perf_counter, process_time
+from typing import Any, Dict, Iterable, Iterator, Optional, TypeVar
+
+try:
+    import resource
+except ImportError:  # pragma: no cover (Windows)
+    resource = None  # type: ignore
+
+T = TypeVar("T")
+_END = object()
+
+STAGES = ("load", "classify", "validate", "index", "retrieve", "summarize", "write")
+
+
+def _peak_rss_kb(who: int = 0) -> int:
+    if resource is None:
+        return 0
+    # ru_maxrss: KiB en Linux (bytes en macOS; no se normaliza)
+    return int(resource.getrusage(who).ru_maxrss)
+
+
+class StageProfiler:
+    """
+    Acumula wall/CPU/items por etapa. Las etapas del pipeline en streaming se
+    intercalan fila a fila, así que cada etapa suma muchos intervalos cortos.
+    cprofile=True mantiene además un cProfile por etapa (solo el intervalo
+    más externo; las etapas no se anidan en el runner).
+    """
+
+    def __init__(self, cprofile: bool = False) -> None:
+        self.stats: Dict[str, Dict[str, float]] = {}
+        self.cprofile = cprofile
+        self._profiles: Dict[str, cProfile.Profile] = {}
+        self._active: Optional[str] = None
+        self._spans: Dict[str, _Span] = {}
+
+    def add(self, name: str, wall: float, cpu: float, items: int = 0) -> None:
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = {"wall_s": 0.0, "cpu_s": 0.0, "items": 0}
+        st["wall_s"] += wall
+        st["cpu_s"] += cpu
+        st["items"] += items
+
+    def merge(self, stats: Dict[str, Dict[str, float]]) -> None:
+        """Suma estadísticas crudas de otro proceso (workers del pool)."""
+        for name, st in stats.items():
+            self.add(name, st["wall_s"], st["cpu_s"], int(st["items"]))
+
+    def stage(self, name: str, items: int = 1) -> "_Span":
+        """Context manager reutilizable por etapa (sin generador: es la ruta caliente)."""
+        span = self._spans.get(name)
+        if span is None:
+            span = self._spans[name] = _Span(self, name)
+        span.items = items
+        return span
+
+    def iterate(self, name: str, it: Iterable[T]) -> Iterator[T]:
+        """Envuelve un iterador cronometrando cada next() como la etapa `name`."""
+        src = iter(it)
+        while True:
+            with self.stage(name, items=0):
+                x = next(src, _END)
+            if x is _END:
+                return
+            self.stats[name]["items"] += 1
+            yield x  # type: ignore[misc]
+
+    def hottest(self) -> Optional[str]:
+        if not self.stats:
+            return None
+        return max(sorted(self.stats), key=lambda n: self.stats[n]["wall_s"])
+
+    def report(self, workers: int = 1) -> Dict[str, Any]:
+        stages: Dict[str, Any] = {}
+        for name in [s for s in STAGES if s in self.stats] + sorted(
+            set(self.stats) - set(STAGES)
+        ):
+            st = self.stats[name]
+            wall = st["wall_s"]
+            stages[name] = {
+                "wall_s": round(wall, 6),
+                "cpu_s": round(st["cpu_s"], 6),
+                "items": int(st["items"]),
+                "items_per_sec": round(st["items"] / wall, 3) if wall > 0 else 0.0,
+            }
+        return {
+            "stages": stages,
+            "hottest_stage": self.hottest(),
+            # con workers>1, classify/validate suman el tiempo de todos los procesos
+            "workers": int(workers),
+            # ru_maxrss es el pico de toda la vida del proceso (y del mayor
+            # hijo ya terminado), no de una etapa: no se reparte por etapa
+            "process_peak_rss_kb": _peak_rss_kb(
+                resource.RUSAGE_SELF if resource else 0
+            ),
+            "children_process_peak_rss_kb": _peak_rss_kb(
+                resource.RUSAGE_CHILDREN if resource else 0
+            ),
+        }
+
+    def dump_hottest(self, path: Path) -> Optional[str]:
+        """Vuelca el cProfile de la etapa más cara (entre las perfiladas aquí)."""
+        candidates = [n for n in self._profiles if n in self.stats]
+        if not candidates:
+            return None
+        name = max(sorted(candidates), key=lambda n: self.stats[n]["wall_s"])
+        self._profiles[name].dump_stats(str(path))
+        return name
+
+
+class NullProfiler(StageProfiler):
+    """Perfilado desactivado: misma interfaz, sin cronometrar nada."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._null = _NullSpan()
+
+    def stage(self, name: str, items: int = 1) -> "_NullSpan":  # type: ignore[override]
+        return self._null
+
+    def iterate(self, name: str, it: Iterable[T]) -> Iterator[T]:
+        return iter(it)
+
+    def merge(self, stats: Dict[str, Dict[str, float]]) -> None:
+        pass
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> None:
+        pass
+
+    def __exit__(self, *exc: Any) -> None:
+        pass
+
+
+class _Span:
+    __slots__ = ("owner", "name", "items", "prof", "w0", "c0")
+
+    def __init__(self, owner: StageProfiler, name: str) -> None:
+        self.owner = owner
+        self.name = name
+        self.items = 1
+        self.prof: Optional[cProfile.Profile] = None
+
+    def __enter__(self) -> None:
+        owner = self.owner
+        self.prof = None
+        if owner.cprofile and owner._active is None:
+            prof = owner._profiles.get(self.name)
+            if prof is None:
+                prof = owner._profiles[self.name] = cProfile.Profile()
+            owner._active = self.name
+            self.prof = prof
+            prof.enable()
+        self.w0 = perf_counter()
+        self.c0 = process_time()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.owner.add(
+            self.name, perf_counter() - self.w0, process_time() - self.c0, self.items
+        )
+        if self.prof is not None:
+            self.prof.disable()
+            self.owner._active = None
+
+
+def write_profile(path: Path, report: Dict[str, Any]) -> None:
+    path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -1,28 +1,37 @@
 from __future__ import annotations
 
 import argparse
-import inspect
 import json
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from itertools import islice
+from multiprocessing import get_context
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
 
-from ..core.classifier import classify_block
-from ..core.index_store import IndexStore
+from ..core.classifier import BlockClassifier
 from ..core.mini_summarizer import make_mini_summary
-from ..core.retrieval import retrieve_topk
-from ..utils.hashing import sha256_hex
-from ..utils.schema_validator import SchemaRegistry, validate_payload
-from ..utils.json_canonical import canonical_dumps
-
-
-def _load_corpus_jsonl(path: Path) -> List[Dict[str, Any]]:
-    rows: List[Dict[str, Any]] = []
-    for line in path.read_text(encoding="utf-8").splitlines():
-        line = line.strip()
-        if not line:
-            continue
-        rows.append(json.loads(line))
-    return rows
+from ..core.retrieval import retrieve_topk_stream
+from ..utils.hashing import ListHasher, sha256_hex
+from ..utils.schema_validator import (
+    SchemaRegistry,
+    ValidationPolicy,
+    validate_payload,
+)
+from ..utils.json_canonical import iter_canonical
+from .profiling import NullProfiler, StageProfiler, write_profile
+from .stage_cache import MISS, StageCache, stage_key
+from .streaming import JsonArrayWriter, SpillIndexStore
+
+
+def _iter_corpus_jsonl(path: Path) -> Iterator[Dict[str, Any]]:
+    # lectura en streaming: memoria O(fila), no O(corpus)
+    with path.open("r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line)
 
 
 def _utc_now_iso() -> str:
@@ -51,42 +60,176 @@ def _route_labels(labels: List[Any], thr: float) -> List[Dict[str, Any]]:
     return out
 
 
-def _call_retrieve_topk(
-    items: List[Any], query: str, topk: int, now_unix: int
-) -> List[Any]:
-    """
-    Llama retrieve_topk sin asumir firma exacta.
-    Soporta topk/top_k y now_unix/now.
-    """
-    sig = inspect.signature(retrieve_topk)
-    kwargs: Dict[str, Any] = {}
+# --- Stage A (classify + validate) por fila: puro => paralelizable ---
+_CLASSIFY_SCHEMA = "block_classifier.v1"
+_WORKER_REGISTRY: Optional[SchemaRegistry] = None
+# un clasificador (con caché por hash de texto) por proceso y umbral
+_CLASSIFIERS: Dict[float, BlockClassifier] = {}
+
+
+def _classifier(thr: float) -> BlockClassifier:
+    clf = _CLASSIFIERS.get(thr)
+    if clf is None:
+        clf = _CLASSIFIERS[thr] = BlockClassifier(code_ratio_threshold=thr)
+    return clf
 
-    # Detecta nombres posibles
-    names = [p.lower() for p in sig.parameters.keys()]
 
-    # items + query: preferimos posicionales (más robusto)
-    # topk:
-    if "topk" in names:
-        kwargs["topk"] = int(topk)
-    elif "top_k" in names:
-        kwargs["top_k"] = int(topk)
+def _init_stage_worker(schemas_dir: str, policy: ValidationPolicy) -> None:
+    global _WORKER_REGISTRY
+    _WORKER_REGISTRY = SchemaRegistry(Path(schemas_dir), policy=policy)
 
-    # now_unix:
-    if "now_unix" in names:
-        kwargs["now_unix"] = int(now_unix)
-    elif "now" in names:
-        kwargs["now"] = int(now_unix)
 
-    return retrieve_topk(query, items, **kwargs)
+def _classify_row(
+    i: int,
+    row: Dict[str, Any],
+    registry: SchemaRegistry,
+    cfg: Dict[str, Any],
+    prof: Optional[StageProfiler] = None,
+) -> Optional[Tuple[str, List[Tuple[Dict[str, Any], str, str, List[Dict[str, Any]]]]]]:
+    """
+    Clasifica/valida una fila del corpus.
+    Devuelve (block_id, [(payload, split_kind, split_text, routed), ...]) o None.
+    """
+    prof = prof if prof is not None else NullProfiler()
+    block_id = str(row.get("block_id", f"b{i:03d}"))
+    text_block = str(row.get("text_block", ""))
+    if not text_block.strip():
+        return None
+
+    clf = _classifier(cfg["code_ratio_threshold"])
+    with prof.stage("classify"):
+        res = clf.classify(text_block)
+
+    splits: List[Tuple[str, str]] = []
+    if res.split == "mixed":
+        if res.non_code_lines:
+            splits.append(("non_code", "\n".join(res.non_code_lines)))
+        if res.code_lines:
+            splits.append(("code", "\n".join(res.code_lines)))
+    else:
+        splits.append(("full", text_block))
 
+    out = []
+    for split_kind, split_text in splits:
+        # split "full" es el bloque entero: reutiliza el resultado ya calculado
+        if split_text is text_block:
+            rr = res
+        else:
+            with prof.stage("classify", items=0):
+                rr = clf.classify(split_text)
+        routed = _route_labels(rr.labels, cfg["label_confidence"])
+
+        payload = {
+            "schema_id": _CLASSIFY_SCHEMA,
+            "config_version": cfg["config_version"],
+            "trace_id": cfg["trace_id"],
+            "labels": routed,
+            "notes": f"classifier_v1 split={split_kind} code_ratio={rr.code_ratio:.3f}",
+        }
+        with prof.stage("validate"):
+            validate_payload(payload, _CLASSIFY_SCHEMA, registry)
+        out.append((payload, split_kind, split_text, routed))
+    return block_id, out
+
+
+def _classify_chunk(
+    chunk: List[Tuple[int, Dict[str, Any]]], cfg: Dict[str, Any]
+) -> Tuple[List[Tuple[int, Any]], int, int, Dict[str, Dict[str, float]]]:
+    """Devuelve (resultados, seen, validated, tiempos) del chunk para agregar en el padre."""
+    reg = _WORKER_REGISTRY
+    assert reg is not None
+    seen0, validated0 = reg.seen, reg.validated
+    prof = StageProfiler() if cfg["profile"] else NullProfiler()
+    out = [(i, _classify_row(i, row, reg, cfg, prof)) for i, row in chunk]
+    return out, reg.seen - seen0, reg.validated - validated0, prof.stats
+
+
+def _chunks(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    it = iter(items)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+_CLASSIFY_STAGE = "classify"
+
+
+def _with_cache(
+    rows: Iterable[Dict[str, Any]], cfg: Dict[str, Any], cache: Optional[StageCache]
+) -> Iterator[Tuple[int, Dict[str, Any], Optional[str], Any]]:
+    """(i, row, key, cached|MISS) en orden de fila."""
+    for i, row in enumerate(rows, start=1):
+        if cache is None:
+            yield i, row, None, MISS
+            continue
+        params = dict(cfg["stage_params"])
+        if "block_id" not in row:
+            params["row_index"] = i  # block_id por defecto depende de la posición
+        key = stage_key(_CLASSIFY_STAGE, cfg["config_version"], params, sha256_hex(row))
+        yield i, row, key, cache.get(_CLASSIFY_STAGE, key)
 
-def _filter_by_agent(memory_items: List[Any], agent: str) -> List[Any]:
-    def get_agent(mi: Any) -> Any:
-        if isinstance(mi, dict):
-            return mi.get("agent")
-        return getattr(mi, "agent", None)
 
-    return [mi for mi in memory_items if get_agent(mi) == agent]
+def _classify_all(
+    rows: Iterable[Dict[str, Any]],
+    registry: SchemaRegistry,
+    schemas_dir: Path,
+    cfg: Dict[str, Any],
+    workers: int,
+    chunk_size: int,
+    cache: Optional[StageCache] = None,
+    prof: Optional[StageProfiler] = None,
+) -> Iterator[Tuple[int, Any]]:
+    """
+    Stage A en serie o en un pool de procesos; siempre en orden de fila.
+    Con caché solo se calculan las filas no vistas; el resto se reutiliza.
+    """
+    prof = prof if prof is not None else NullProfiler()
+    items = _with_cache(rows, cfg, cache)
+    if workers <= 1:
+        for i, row, key, cached in items:
+            if cached is MISS:
+                cached = _classify_row(i, row, registry, cfg, prof)
+                if cache is not None:
+                    cache.put(key, cached)
+            yield i, cached
+        return
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=get_context("spawn"),
+        initializer=_init_stage_worker,
+        initargs=(str(schemas_dir), registry.policy),
+    ) as ex:
+        # ventana acotada de chunks en vuelo (memoria constante); se consumen
+        # en orden de envío => merge determinista. Solo viajan los fallos de caché.
+        pending: Deque[Tuple[List[Any], Optional[Future]]] = deque()
+
+        def drain_one() -> Iterator[Tuple[int, Any]]:
+            chunk, fut = pending.popleft()
+            computed: Iterator[Tuple[int, Any]] = iter(())
+            if fut is not None:
+                part, seen, validated, stats = fut.result()
+                registry.seen += seen
+                registry.validated += validated
+                prof.merge(stats)
+                computed = iter(part)
+            for i, _row, key, cached in chunk:
+                if cached is MISS:
+                    _, cached = next(computed)
+                    if cache is not None:
+                        cache.put(key, cached)
+                yield i, cached
+
+        for chunk in _chunks(items, chunk_size):
+            misses = [(i, row) for i, row, _key, cached in chunk if cached is MISS]
+            fut = ex.submit(_classify_chunk, misses, cfg) if misses else None
+            pending.append((chunk, fut))
+            if len(pending) >= 2 * workers:
+                yield from drain_one()
+        while pending:
+            yield from drain_one()
 
 
 def run_offline(
@@ -98,78 +241,135 @@ def run_offline(
     mode: str = "generate",
     label_confidence: float = 0.65,
     code_ratio_threshold: float = 0.30,
+    workers: int = 1,
+    chunk_size: int = 256,
+    validation: Optional[ValidationPolicy] = None,
+    cache_dir: Optional[Path] = None,
+    commit_every: int = 1000,
+    profile: bool = False,
+    profile_path: Optional[Path] = None,
+    cprofile: bool = False,
 ) -> Dict[str, Any]:
+    """
+    cache_dir: caché de Stage A por contenido, solo para re-ejecuciones con
+    caché caliente. No hay reanudación por desplazamiento de fila: una
+    ejecución interrumpida vuelve a empezar desde la primera fila y solo se
+    ahorra Stage A de las filas ya confirmadas.
+    profile=True (o un profile_path) activa el perfil por etapa y escribe
+    run_profile.json en profile_path (por defecto en out_dir); sin él no se
+    cronometra nada. cprofile=True lo activa también y vuelca el cProfile de
+    la etapa más cara junto a él.
+    """
     out_dir.mkdir(parents=True, exist_ok=True)
-    registry = SchemaRegistry(schemas_dir)
-    rows = _load_corpus_jsonl(corpus_path)
-
-    # Stage A: classifier payloads
-    classifier_items: List[Dict[str, Any]] = []
+    registry = SchemaRegistry(schemas_dir, policy=validation)
+    if mode not in ("generate", "check"):
+        raise ValueError("mode must be 'generate' or 'check'")
+    generate = mode == "generate"
+    profile = bool(profile or cprofile or profile_path is not None)
+    if profile and profile_path is None:
+        profile_path = out_dir / "run_profile.json"
+    prof = StageProfiler(cprofile=cprofile) if profile else NullProfiler()
+
+    # Stage A: classifier payloads (escritos + hasheados en streaming)
+    classifier_hash = ListHasher()
+    classifier_out = JsonArrayWriter(
+        out_dir / "classifier_items.json" if generate else None
+    )
 
-    # Stage B: IndexStore por agente (determinista)
-    store = IndexStore()
+    # Stage B: índice por agente volcado a disco (solo df/n_docs en memoria)
+    store = SpillIndexStore()
     now = 1_700_000_000  # fijo para recency determinista
 
-    for i, row in enumerate(rows, start=1):
-        block_id = str(row.get("block_id", f"b{i:03d}"))
-        text_block = str(row.get("text_block", ""))
-        if not text_block.strip():
-            continue
-
-        res = classify_block(text_block, code_ratio_threshold=code_ratio_threshold)
-
-        splits: List[Tuple[str, str]] = []
-        if res.split == "mixed":
-            if res.non_code_lines:
-                splits.append(("non_code", "\n".join(res.non_code_lines)))
-            if res.code_lines:
-                splits.append(("code", "\n".join(res.code_lines)))
-        else:
-            splits.append(("full", text_block))
-
-        for split_kind, split_text in splits:
-            rr = classify_block(split_text, code_ratio_threshold=code_ratio_threshold)
-            routed = _route_labels(rr.labels, label_confidence)
-
-            payload = {
-                "schema_id": "block_classifier.v1",
-                "config_version": config_version,
-                "trace_id": trace_id,
-                "labels": routed,
-                "notes": f"classifier_v1 split={split_kind} code_ratio={rr.code_ratio:.3f}",
-            }
-            validate_payload(payload, "block_classifier.v1", registry)
-            classifier_items.append(payload)
-
-            ts = now - i
-            meta = {"block_id": block_id, "split": split_kind}
-
-            for lab in routed:
-                name = lab["name"]
-                if name in ("preferences", "code", "conversation"):
-                    store.agent(name).add(split_text, ts, meta)
-
-    # Stage C: retrieval determinista (por agente) + merge global simple
-    all_items = (
-        store.agent("preferences").items
-        + store.agent("code").items
-        + store.agent("conversation").items
-    )
+    cfg = {
+        "config_version": config_version,
+        "trace_id": trace_id,
+        "label_confidence": float(label_confidence),
+        "code_ratio_threshold": float(code_ratio_threshold),
+        "profile": profile,
+    }
+    # todo lo que cambia el resultado de Stage A (salvo la fila) entra en la clave
+    cfg["stage_params"] = {
+        "classifier": "heuristic_classifier_v1",
+        "trace_id": trace_id,
+        "label_confidence": cfg["label_confidence"],
+        "code_ratio_threshold": cfg["code_ratio_threshold"],
+        "validation": registry.policy.mode,
+        "validation_sample_every": int(registry.policy.sample_every),
+        "schema_sha256": registry.content_hash(_CLASSIFY_SCHEMA),
+    }
 
-    topk_per_agent = 5
-    topn_global = 8
+    # re-ejecuciones con caché caliente: cada fila se sigue leyendo y
+    # hasheando (las salidas se regeneran enteras), pero Stage A solo se
+    # calcula para las filas sin resultado confirmado
+    cache: Optional[StageCache] = None
+    if cache_dir is not None:
+        cache = StageCache(cache_dir / "stage_cache.sqlite")
+
+    rows = prof.iterate("load", _iter_corpus_jsonl(corpus_path))
+    try:
+        with classifier_out:
+            for i, res in _classify_all(
+                rows,
+                registry,
+                schemas_dir,
+                cfg,
+                int(workers),
+                int(chunk_size),
+                cache,
+                prof,
+            ):
+                if cache is not None and i % max(1, int(commit_every)) == 0:
+                    # lo confirmado sobrevive a una interrupción del proceso
+                    cache.commit()
+                if res is None:
+                    continue
+                block_id, outs = res
+                for payload, split_kind, split_text, routed in outs:
+                    with prof.stage("write"):
+                        classifier_hash.update(payload)
+                        classifier_out.write(payload)
+
+                    ts = now - i
+                    meta = {"block_id": block_id, "split": split_kind}
+
+                    with prof.stage("index"):
+                        for lab in routed:
+                            name = lab["name"]
+                            if name in ("preferences", "code", "conversation"):
+                                store.agent(name).add(split_text, ts, meta)
+
+        # Stage C: retrieval determinista (por agente), top-k en una pasada
+        topk_per_agent = 5
+        topn_global = 8
+
+        per_agent = []
+        for agent in ("preferences", "code", "conversation"):
+            ix = store.agent(agent)
+            with prof.stage("retrieve", items=ix.n_docs):
+                got = retrieve_topk_stream(
+                    "offline_query",
+                    ix.items(),
+                    now_unix=now,
+                    df=ix.df,
+                    n_docs=ix.n_docs,
+                    topk=topk_per_agent,
+                )
+            per_agent.extend(got)
+    finally:
+        store.close()
+        if cache is not None:
+            cache.close()
 
-    per_agent = []
-    for agent in ("preferences", "code", "conversation"):
-        filt = _filter_by_agent(all_items, agent)
-        got = _call_retrieve_topk(filt, "offline_query", topk_per_agent, now)
-        per_agent.extend(got)
+    cache_stats: Dict[str, Any] = {}
+    if cache is not None:
+        cache_stats = {"stages": cache.stats()}
 
     # Merge global determinista: conserva orden de aparición + corta topn_global
     global_ranked = per_agent[:topn_global]
 
     # Stage D: mini_summaries (schema mini_summary.v1.1)
-    mini_summaries: List[Dict[str, Any]] = []
+    mini_hash = ListHasher()
+    mini_out = JsonArrayWriter(out_dir / "mini_summaries.json" if generate else None)
     for idx, it in enumerate(global_ranked, start=1):
         # best-effort para extraer campos
         agent = (
@@ -205,18 +405,23 @@ def run_offline(
                 "score_global": 0.0,
             }
 
-        ms = make_mini_summary(
-            agent=str(agent or "conversation"),
-            stable_id=int(stable_id),
-            source_block_ids=[str(block_id)],
-            key_sentences=key_sentences,
-            scores=scores,
-            config_version=config_version,
-            trace_id=trace_id,
-            registry=registry,
-            max_tokens=40,
-        )
-        mini_summaries.append(ms)
+        with prof.stage("summarize"):
+            ms = make_mini_summary(
+                agent=str(agent or "conversation"),
+                stable_id=int(stable_id),
+                source_block_ids=[str(block_id)],
+                key_sentences=key_sentences,
+                scores=scores,
+                config_version=config_version,
+                trace_id=trace_id,
+                registry=registry,
+                max_tokens=40,
+            )
+        with prof.stage("write"):
+            mini_hash.update(ms)
+            mini_out.write(ms)
+    with prof.stage("write", items=0):
+        mini_out.close()
 
     # Fuser (si no existe o falla, degradamos determinísticamente)
     fused_ok = False
@@ -229,45 +434,51 @@ def run_offline(
         "trace_id": trace_id,
         "timestamp": _utc_now_iso(),
         "counts": {
-            "classifier_items": len(classifier_items),
-            "mini_summaries": len(mini_summaries),
+            "classifier_items": classifier_hash.count,
+            "mini_summaries": mini_hash.count,
             "global_ranked": len(global_ranked),
         },
         "hashes": {
-            "classifier_items": sha256_hex(classifier_items),
-            "mini_summaries": sha256_hex(mini_summaries),
+            "classifier_items": classifier_hash.hexdigest(),
+            "mini_summaries": mini_hash.hexdigest(),
             "global_ranked": sha256_hex(global_ranked),
             "fused_payload": sha256_hex(fused_payload) if fused_ok else "FUSER_FAILED",
         },
         "fuser": {"ok": fused_ok},
+        # metadatos de ejecución: NO forman parte de counts/hashes
+        "execution": {
+            "workers": int(workers),
+            "validation": {
+                "mode": registry.policy.mode,
+                "sample_every": int(registry.policy.sample_every),
+                "seen": registry.seen,
+                "validated": registry.validated,
+            },
+            "cache": cache_stats,
+        },
     }
 
     manifest_path = out_dir / "run_manifest.json"
 
-    if mode == "generate":
-        manifest_path.write_text(
-            json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8"
-        )
-        (out_dir / "classifier_items.json").write_text(
-            json.dumps(classifier_items, indent=2, ensure_ascii=False), encoding="utf-8"
-        )
-        (out_dir / "mini_summaries.json").write_text(
-            json.dumps(mini_summaries, indent=2, ensure_ascii=False), encoding="utf-8"
-        )
-        (out_dir / "global_ranked.json").write_text(
-            canonical_dumps(global_ranked), encoding="utf-8"
-        )
-        if fused_ok:
-            (out_dir / "fuser_output.json").write_text(
-                json.dumps(fused_payload, indent=2, ensure_ascii=False),
-                encoding="utf-8",
-            )
-        else:
-            (out_dir / "fuser_fallback.txt").write_text(
-                fused_text_fallback, encoding="utf-8"
+    if generate:
+        with prof.stage("write", items=2):
+            manifest_path.write_text(
+                json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8"
             )
+            with (out_dir / "global_ranked.json").open("w", encoding="utf-8") as f:
+                for chunk in iter_canonical(global_ranked):
+                    f.write(chunk)
+            if fused_ok:
+                (out_dir / "fuser_output.json").write_text(
+                    json.dumps(fused_payload, indent=2, ensure_ascii=False),
+                    encoding="utf-8",
+                )
+            else:
+                (out_dir / "fuser_fallback.txt").write_text(
+                    fused_text_fallback, encoding="utf-8"
+                )
 
-    elif mode == "check":
+    else:
         expected = json.loads(manifest_path.read_text(encoding="utf-8"))
         for k in ("config_version", "trace_id"):
             if expected.get(k) != manifest.get(k):
@@ -278,8 +489,15 @@ def run_offline(
             if expected.get(k) != manifest.get(k):
                 raise AssertionError(f"Golden mismatch key={k}")
 
-    else:
-        raise ValueError("mode must be 'generate' or 'check'")
+    # perfil de ejecución: fichero aparte, fuera de counts/hashes y de goldens
+    if profile_path is not None:
+        report = prof.report(workers=int(workers))
+        if cprofile:
+            report["cprofile"] = {
+                "stage": prof.dump_hottest(profile_path.with_suffix(".prof")),
+                "path": str(profile_path.with_suffix(".prof")),
+            }
+        write_profile(profile_path, report)
 
     # --- test-compat aliases (legacy keys expected by tests) ---
     manifest["items_count"] = int(manifest.get("counts", {}).get("global_ranked", 0))
@@ -297,6 +515,41 @@ def main() -> int:
     ap.add_argument("--mode", choices=["generate", "check"], default="generate")
     ap.add_argument("--label-confidence", type=float, default=0.65)
     ap.add_argument("--code-ratio-threshold", type=float, default=0.30)
+    ap.add_argument(
+        "--workers", type=int, default=1, help="processes for classify/validate"
+    )
+    ap.add_argument("--chunk-size", type=int, default=256)
+    ap.add_argument(
+        "--validation", choices=["strict", "sampled", "off"], default="strict"
+    )
+    ap.add_argument("--validation-sample-every", type=int, default=100)
+    ap.add_argument(
+        "--cache-dir",
+        default=None,
+        help="content-addressed Stage A cache for warm reruns; an interrupted "
+        "run restarts from the first row (no row-offset resume)",
+    )
+    ap.add_argument(
+        "--cache-commit-every",
+        type=int,
+        default=1000,
+        help="commit cached results every N rows (kept if the run is interrupted)",
+    )
+    ap.add_argument(
+        "--profile",
+        action="store_true",
+        help="time each stage and write run_profile.json (off by default)",
+    )
+    ap.add_argument(
+        "--cprofile",
+        action="store_true",
+        help="also dump a cProfile of the hottest stage next to run_profile.json",
+    )
+    ap.add_argument(
+        "--profile-out",
+        default=None,
+        help="path for run_profile.json (implies --profile)",
+    )
     args = ap.parse_args()
 
     run_offline(
@@ -308,6 +561,19 @@ def main() -> int:
         mode=args.mode,
         label_confidence=args.label_confidence,
         code_ratio_threshold=args.code_ratio_threshold,
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        validation=ValidationPolicy(
+            mode=args.validation,
+            sample_every=args.validation_sample_every
+            if args.validation == "sampled"
+            else 1,
+        ),
+        cache_dir=Path(args.cache_dir) if args.cache_dir else None,
+        commit_every=args.cache_commit_every,
+        profile=args.profile,
+        profile_path=Path(args.profile_out) if args.profile_out else None,
+        cprofile=args.cprofile,
     )
     return 0
 
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Any, Dict
+
+from ..utils.hashing import sha256_hex
+
+MISS = object()
+
+
+def stage_key(
+    stage: str, config_version: str, params: Dict[str, Any], input_hash: str
+) -> str:
+    """Clave content-addressed: (stage, config_version, parámetros, sha256 de la entrada)."""
+    return sha256_hex(
+        {
+            "stage": stage,
+            "config_version": config_version,
+            "params": params,
+            "input": input_hash,
+        }
+    )
+
+
+class StageCache:
+    """
+    Caché de resultados por etapa en SQLite (un fichero, clave -> JSON).
+    Las escrituras se confirman en commit(); lo no confirmado se pierde si el
+    proceso muere. Una re-ejecución (completa o tras una interrupción) recalcula
+    solo las filas que no estén confirmadas: es una caché caliente, no un
+    punto de reanudación.
+    """
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._db = sqlite3.connect(str(path))
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS stage_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self.hits: Dict[str, int] = {}
+        self.misses: Dict[str, int] = {}
+
+    def get(self, stage: str, key: str) -> Any:
+        row = self._db.execute(
+            "SELECT value FROM stage_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses[stage] = self.misses.get(stage, 0) + 1
+            return MISS
+        self.hits[stage] = self.hits.get(stage, 0) + 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Any) -> None:
+        self._db.execute(
+            "INSERT OR REPLACE INTO stage_cache (key, value) VALUES (?, ?)",
+            # conserva el orden de claves: los payloads se reescriben tal cual
+            (key, json.dumps(value, ensure_ascii=False, separators=(",", ":"))),
+        )
+
+    def commit(self) -> None:
+        self._db.commit()
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        out: Dict[str, Dict[str, Any]] = {}
+        for stage in sorted(set(self.hits) | set(self.misses)):
+            h = self.hits.get(stage, 0)
+            m = self.misses.get(stage, 0)
+            out[stage] = {
+                "hits": h,
+                "misses": m,
+                "hit_ratio": round(h / (h + m), 6) if h + m else 0.0,
+            }
+        return out
+
+    def close(self) -> None:
+        self._db.commit()
+        self._db.close()
+
+    def __enter__(self) -> "StageCache":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -0,0 +1,100 @@
+from __future__ import annotations
+
+import json
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, TextIO
+
+from ..core.similarity import tokenize
+from ..models.memory_item import MemoryItem
+
+
+class JsonArrayWriter:
+    """
+    Escribe un array JSON elemento a elemento con los mismos bytes que
+    json.dumps(lista, indent=2, ensure_ascii=False).
+    """
+
+    def __init__(self, path: Optional[Path]) -> None:
+        # path=None => no escribe (modo check), solo cuenta
+        self._fp: Optional[TextIO] = (
+            path.open("w", encoding="utf-8") if path is not None else None
+        )
+        self.count = 0
+        if self._fp is not None:
+            self._fp.write("[")
+
+    def write(self, item: Any) -> None:
+        if self._fp is not None:
+            body = json.dumps(item, indent=2, ensure_ascii=False)
+            self._fp.write(",\n  " if self.count else "\n  ")
+            self._fp.write(body.replace("\n", "\n  "))
+        self.count += 1
+
+    def close(self) -> None:
+        if self._fp is None:
+            return
+        self._fp.write("\n]" if self.count else "]")
+        self._fp.close()
+        self._fp = None
+
+    def __enter__(self) -> "JsonArrayWriter":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+
+class SpillAgentIndex:
+    """
+    Variante de InMemoryAgentIndex con memoria acotada: los items se vuelcan a
+    un fichero temporal JSONL y solo se mantiene df/n_docs (para TF-IDF).
+    stable_id: incremental por agente, igual que InMemoryAgentIndex.
+    """
+
+    def __init__(self, agent: str) -> None:
+        self.agent = agent
+        self._next_id = 1
+        self.n_docs = 0
+        self.df: Dict[str, int] = {}
+        self._fp = tempfile.TemporaryFile(mode="w+", encoding="utf-8")
+
+    def add(self, text: str, ts_unix: int, meta: Dict[str, Any]) -> int:
+        sid = self._next_id
+        rec = {"stable_id": sid, "text": text, "ts_unix": int(ts_unix), "meta": meta}
+        self._fp.write(json.dumps(rec, ensure_ascii=False) + "\n")
+        for t in set(tokenize(text)):
+            self.df[t] = self.df.get(t, 0) + 1
+        self.n_docs += 1
+        self._next_id += 1
+        return sid
+
+    def items(self) -> Iterator[MemoryItem]:
+        self._fp.flush()
+        self._fp.seek(0)
+        for line in self._fp:
+            rec = json.loads(line)
+            yield MemoryItem(
+                agent=self.agent,
+                stable_id=int(rec["stable_id"]),
+                text=rec["text"],
+                ts_unix=int(rec["ts_unix"]),
+                meta=dict(rec["meta"]),
+            )
+
+    def close(self) -> None:
+        self._fp.close()
+
+
+class SpillIndexStore:
+    def __init__(self) -> None:
+        self.by_agent: Dict[str, SpillAgentIndex] = {}
+
+    def agent(self, agent: str) -> SpillAgentIndex:
+        if agent not in self.by_agent:
+            self.by_agent[agent] = SpillAgentIndex(agent)
+        return self.by_agent[agent]
+
+    def close(self) -> None:
+        for a in self.by_agent.values():
+            a.close()
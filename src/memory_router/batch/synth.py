@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import argparse
+import json
+import random
+from pathlib import Path
+from typing import Any, Dict, Iterator, List
+
+# Generador determinista de corpus sintéticos (misma semilla => mismos bytes).
+# Mezcla bloques de código, preferencias (ES/EN), charla y bloques mixtos.
+
+_TOPICS = (
+    "python",
+    "rust",
+    "postgres",
+    "redis",
+    "docker",
+    "vim",
+    "emacs",
+    "linux",
+    "fastapi",
+    "faiss",
+    "pytest",
+    "typescript",
+)
+_NAMES = ("items", "rows", "cache", "user", "query", "index", "batch", "score")
+
+_PREF_TEMPLATES = (
+    "yo prefiero {t} para desarrollo",
+    "me gusta usar {t} en el trabajo",
+    "suelo usar {t} cuando puedo",
+    "a partir de ahora uso {t}",
+    "ya no uso {t}, he cambiado a {u}",
+    "from now on I use {t}",
+    "I prefer {t} over {u}",
+    "my preference is {t} for this project",
+    "I usually use {t} at home",
+)
+_CHAT_TEMPLATES = (
+    "hola, ¿qué tal el día?",
+    "ayer estuve revisando lo de {t} pero no terminé",
+    "mañana hablamos del despliegue",
+    "the meeting about {t} moved to friday",
+    "gracias por la ayuda con {t}",
+    "no sé si {t} es buena idea aquí",
+    "ok, lo miro luego",
+    "did you see the numbers from {t}?",
+)
+_PY_TEMPLATES = (
+    "def {n}_{m}(x):\n    return x",
+    "class {N}{M}:\n    pass",
+    "import {t}\nfrom {t} import {n}",
+    "for {n} in {m}:\n    print({n})",
+    "{n} = [{m} for {m} in range(10)]\nreturn {n}",
+)
+_JS_TEMPLATES = (
+    "const {n} = require('{t}');",
+    "function {n}({m}) {{\n  return {m};\n}}",
+    "let {n} = {m}.map(x => x * 2);",
+    "export const {n} = () => {m};",
+)
+_KINDS = ("code", "preferences", "chatter", "mixed")
+_DEFAULT_WEIGHTS = (0.3, 0.2, 0.35, 0.15)
+
+
+class CorpusGenerator:
+    """Filas {"block_id", "text_block"} reproducibles a partir de una semilla."""
+
+    def __init__(self, seed: int = 0, weights=_DEFAULT_WEIGHTS) -> None:
+        self.seed = int(seed)
+        self.weights = tuple(float(w) for w in weights)
+        if len(self.weights) != len(_KINDS):
+            raise ValueError(f"weights must have {len(_KINDS)} entries")
+
+    def _fill(self, rng: random.Random, tpl: str) -> str:
+        t, u = rng.sample(_TOPICS, 2)
+        n, m = rng.sample(_NAMES, 2)
+        return tpl.format(t=t, u=u, n=n, m=m, N=n.title(), M=m.title())
+
+    def _code(self, rng: random.Random) -> List[str]:
+        pool = _PY_TEMPLATES if rng.random() < 0.6 else _JS_TEMPLATES
+        return [self._fill(rng, rng.choice(pool)) for _ in range(rng.randint(1, 4))]
+
+    def _lines(
+        self, rng: random.Random, templates: tuple, lo: int, hi: int
+    ) -> List[str]:
+        return [
+            self._fill(rng, rng.choice(templates)) for _ in range(rng.randint(lo, hi))
+        ]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        # una RNG por fila: la fila i no depende de cuántas se generen antes
+        rng = random.Random(f"{self.seed}:{i}")
+        kind = rng.choices(_KINDS, weights=self.weights)[0]
+        if kind == "code":
+            lines = self._code(rng)
+        elif kind == "preferences":
+            lines = self._lines(rng, _PREF_TEMPLATES, 1, 2)
+            lines += self._lines(rng, _CHAT_TEMPLATES, 0, 1)
+        elif kind == "chatter":
+            lines = self._lines(rng, _CHAT_TEMPLATES, 1, 3)
+        else:
+            lines = self._lines(rng, _CHAT_TEMPLATES + _PREF_TEMPLATES, 1, 2)
+            lines += self._code(rng)
+        return {"block_id": f"s{i:07d}", "text_block": "\n".join(lines)}
+
+    def rows(self, n: int) -> Iterator[Dict[str, Any]]:
+        for i in range(1, int(n) + 1):
+            yield self.row(i)
+
+    def write_jsonl(self, path: Path, n: int) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("w", encoding="utf-8") as f:
+            for r in self.rows(n):
+                f.write(json.dumps(r, ensure_ascii=False))
+                f.write("\n")
+        return path
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Deterministic synthetic corpus")
+    ap.add_argument("--rows", type=int, required=True)
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", required=True)
+    args = ap.parse_args()
+    CorpusGenerator(seed=args.seed).write_jsonl(Path(args.out), args.rows)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,15 +1,120 @@
 import argparse
 import json
+import sys
 import time
+from contextlib import nullcontext
 from pathlib import Path
+from typing import Any, ContextManager, Dict, Iterable, Iterator, List, TextIO
 
+from memory_router.core.embed_pool import DEFAULT_ENCODE_BATCH_SIZE
 from memory_router.core.multi_agent import MultiAgentMemorySystem
 
 
+def _iter_jsonl(fp: TextIO) -> Iterator[Dict[str, Any]]:
+    for line in fp:
+        line = line.strip()
+        if not line:
+            continue
+        yield json.loads(line)
+
+
+def _batched(rows: Iterable[Dict[str, Any]], n: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= n:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _open_input(path: str) -> ContextManager[TextIO]:
+    if path == "-":
+        return nullcontext(sys.stdin)
+    return open(path, "r", encoding="utf-8")
+
+
+def _emit(obj: Dict[str, Any]) -> None:
+    sys.stdout.write(json.dumps(obj, ensure_ascii=False) + "\n")
+    sys.stdout.flush()
+
+
+def _progress(verb: str, unit: str, n: int, t0: float) -> None:
+    dt = max(time.perf_counter() - t0, 1e-9)
+    print(
+        f"[mem5] {verb} {n} {unit} in {dt:.2f}s ({n / dt:.1f} {unit}/sec)",
+        file=sys.stderr,
+        flush=True,
+    )
+
+
+def _run_index_jsonl(system: MultiAgentMemorySystem, args: argparse.Namespace) -> int:
+    now = int(time.time())
+    done = 0
+    last_persist = 0
+    last_report = 0
+    t0 = time.perf_counter()
+
+    with _open_input(args.input) as fp:
+        for batch in _batched(_iter_jsonl(fp), int(args.batch_size)):
+            turns = []
+            for rec in batch:
+                turn_index = int(rec["turn_index"])
+                turns.append(
+                    {
+                        "stable_id": int(rec["stable_id"]),
+                        "turn_index_1based": turn_index,
+                        "text": str(rec["text"]),
+                        "ts_unix": int(rec.get("ts_unix", now)),
+                        "meta": rec.get("meta") or {"turn_end": turn_index},
+                    }
+                )
+            for ch in system.index_turns(turns):
+                _emit({"stable_id": ch.stable_id, "agent": ch.agent, "status": "ok"})
+            done += len(turns)
+
+            if args.persist_every > 0 and done - last_persist >= args.persist_every:
+                system.persist()
+                last_persist = done
+            if args.progress_every > 0 and done - last_report >= args.progress_every:
+                _progress("indexed", "turns", done, t0)
+                last_report = done
+
+    system.persist()
+    _progress("indexed", "turns", done, t0)
+    return 0
+
+
+def _run_query_jsonl(system: MultiAgentMemorySystem, args: argparse.Namespace) -> int:
+    now = int(time.time())
+    done = 0
+    last_report = 0
+    t0 = time.perf_counter()
+
+    with _open_input(args.input) as fp:
+        for batch in _batched(_iter_jsonl(fp), int(args.batch_size)):
+            texts = [str(rec["query"]) for rec in batch]
+            for out in system.query_many(texts, now_unix=now):
+                _emit(out)
+            done += len(texts)
+
+            if args.progress_every > 0 and done - last_report >= args.progress_every:
+                _progress("answered", "queries", done, t0)
+                last_report = done
+
+    _progress("answered", "queries", done, t0)
+    return 0
+
+
 def main() -> int:
     ap = argparse.ArgumentParser()
     ap.add_argument("--store", required=True)
-    ap.add_argument("--mode", choices=["index", "query"], required=True)
+    ap.add_argument(
+        "--mode",
+        choices=["index", "query", "index-jsonl", "query-jsonl"],
+        required=True,
+    )
 
     ap.add_argument("--text")
     ap.add_argument("--turn-index", type=int)
@@ -17,12 +122,51 @@ def main() -> int:
 
     ap.add_argument("--query-text")
 
+    # modos *-jsonl: un registro por línea, un resultado JSON por línea en stdout
+    ap.add_argument("--input", default="-", help="JSONL path, or '-' for stdin")
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument(
+        "--persist-every",
+        type=int,
+        default=0,
+        help="persist every N indexed records (0 = only at the end)",
+    )
+    ap.add_argument("--progress-every", type=int, default=1000)
+    ap.add_argument(
+        "--encode-workers",
+        type=int,
+        default=0,
+        help="index-jsonl: encoder processes (0 = encode in-process)",
+    )
+    ap.add_argument("--encode-batch-size", type=int, default=DEFAULT_ENCODE_BATCH_SIZE)
+
     args = ap.parse_args()
 
     store = Path(args.store)
 
+    if args.mode == "index-jsonl":
+        system = MultiAgentMemorySystem(
+            store_dir=store,
+            encode_workers=args.encode_workers,
+            encode_batch_size=args.encode_batch_size,
+        )
+        try:
+            return _run_index_jsonl(system, args)
+        finally:
+            if system.encode_pool is not None:
+                for w in system.encode_pool.worker_throughput():
+                    print(
+                        f"[mem5] worker {w['worker']}: {w['items']} turns "
+                        f"({w['items_per_sec']:.1f} turns/sec)",
+                        file=sys.stderr,
+                    )
+            system.close()
+
     system = MultiAgentMemorySystem(store_dir=store)
 
+    if args.mode == "query-jsonl":
+        return _run_query_jsonl(system, args)
+
     if args.mode == "index":
         if args.text is None or args.turn_index is None or args.stable_id is None:
             raise ValueError("index mode requires --text --turn-index --stable-id")
@@ -1,11 +1,12 @@
 from .budgets import Budgets, Thresholds
-from .faiss_store import MemoryChunk, Retrieved, FaissShard
+from .faiss_store import MemoryChunk, MemoryFilter, Retrieved, FaissShard
 from .multi_agent import MultiAgentMemorySystem, DeterministicFusion
 
 __all__ = [
     "Budgets",
     "Thresholds",
     "MemoryChunk",
+    "MemoryFilter",
     "Retrieved",
     "FaissShard",
     "MultiAgentMemorySystem",
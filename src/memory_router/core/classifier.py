@@ -1,8 +1,10 @@
 from __future__ import annotations
 
+import hashlib
 import re
+from collections import OrderedDict
 from dataclasses import dataclass
-from typing import List, Dict
+from typing import Dict, Iterable, Iterator, List
 
 CODE_TOKENS = (
     "def ",
@@ -48,16 +50,20 @@ class ClassifierResult:
     notes: str
 
 
+# Compilados una vez: un solo matcher multi-patrón para CODE_TOKENS y una sola
+# regex (alternancia) para PREF_PATTERNS.
+_CODE_PREFIXES = ("```", "#", "//")
+_CODE_TOKENS_RE = re.compile("|".join(re.escape(t) for t in CODE_TOKENS))
+_PREF_RE = re.compile("|".join(f"(?:{p})" for p in PREF_PATTERNS), re.IGNORECASE)
+
+
 def _is_code_line(line: str) -> bool:
     s = line.strip()
     if not s:
         return False
-    if s.startswith("```") or s.startswith("#") or s.startswith("//"):
+    if s.startswith(_CODE_PREFIXES):
         return True
-    for tok in CODE_TOKENS:
-        if tok in s:
-            return True
-    return False
+    return _CODE_TOKENS_RE.search(s) is not None
 
 
 def _code_ratio(lines: List[str]) -> float:
@@ -71,10 +77,13 @@ def classify_block(
     text_block: str, code_ratio_threshold: float = 0.30
 ) -> ClassifierResult:
     lines = text_block.splitlines()
-    cr = _code_ratio(lines)
 
-    code_lines = [ln for ln in lines if _is_code_line(ln)]
-    non_code_lines = [ln for ln in lines if not _is_code_line(ln)]
+    # una sola pasada por línea: ratio + partición code/non-code
+    code_lines: List[str] = []
+    non_code_lines: List[str] = []
+    for ln in lines:
+        (code_lines if _is_code_line(ln) else non_code_lines).append(ln)
+    cr = len(code_lines) / max(1, len(lines)) if lines else 0.0
 
     split = "none"
     if cr >= code_ratio_threshold and non_code_lines:
@@ -89,7 +98,7 @@ def classify_block(
         labels.append(Label("code", min(1.0, 0.6 + cr * 0.4)))
 
     # Heurística: preferences
-    pref_hit = any(re.search(p, text_block, re.IGNORECASE) for p in PREF_PATTERNS)
+    pref_hit = _PREF_RE.search(text_block) is not None
     if pref_hit:
         labels.append(Label("preferences", 0.85))
 
@@ -122,3 +131,43 @@ def classify_block(
         non_code_lines=non_code_lines,
         notes=notes,
     )
+
+
+class BlockClassifier:
+    """
+    classify_block con caché LRU acotada por hash del texto (blake2b) y umbral.
+    Los resultados cacheados se comparten: tratarlos como solo-lectura.
+    """
+
+    def __init__(self, code_ratio_threshold: float = 0.30, cache_size: int = 4096):
+        self.code_ratio_threshold = float(code_ratio_threshold)
+        self.cache_size = int(cache_size)
+        self._cache: "OrderedDict[bytes, ClassifierResult]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def classify(self, text_block: str) -> ClassifierResult:
+        key = hashlib.blake2b(text_block.encode("utf-8"), digest_size=16).digest()
+        res = self._cache.get(key)
+        if res is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return res
+        self.misses += 1
+        res = classify_block(text_block, self.code_ratio_threshold)
+        if self.cache_size > 0:
+            self._cache[key] = res
+            if len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return res
+
+    def classify_many(self, text_blocks: Iterable[str]) -> Iterator[ClassifierResult]:
+        for t in text_blocks:
+            yield self.classify(t)
+
+
+def classify_blocks(
+    text_blocks: Iterable[str], code_ratio_threshold: float = 0.30
+) -> List[ClassifierResult]:
+    """Batch API: mismos resultados que classify_block, textos repetidos se cachean."""
+    return list(BlockClassifier(code_ratio_threshold).classify_many(text_blocks))
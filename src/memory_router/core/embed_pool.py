@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from multiprocessing.shared_memory import SharedMemory
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Tamaño de trozo por defecto (pool, MultiAgentMemorySystem y CLI mem5)
+DEFAULT_ENCODE_BATCH_SIZE = 64
+
+# Estado por worker (proceso): el modelo se carga una sola vez en el initializer.
+_MODEL: Any = None
+
+
+def _init_worker(
+    model_name: str,
+    threads_per_worker: int,
+    model_factory: Optional[Callable[[str], Any]] = None,
+) -> None:
+    global _MODEL
+    try:
+        import torch  # type: ignore
+
+        torch.set_num_threads(max(1, int(threads_per_worker)))
+    except Exception:  # pragma: no cover
+        pass
+    if model_factory is None:
+        from sentence_transformers import SentenceTransformer  # type: ignore
+
+        model_factory = SentenceTransformer
+    _MODEL = model_factory(model_name)
+
+
+def _model_dim() -> int:
+    return int(_MODEL.get_sentence_embedding_dimension())
+
+
+def _encode_into(
+    shm_name: str, shape: Tuple[int, int], offset: int, texts: List[str]
+) -> Tuple[int, int, float]:
+    """Codifica `texts` y escribe las filas en [offset, offset+len) del buffer compartido."""
+    t0 = time.perf_counter()
+    emb = _MODEL.encode(texts, convert_to_numpy=True, normalize_embeddings=True).astype(
+        np.float32
+    )
+    shm = SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[offset : offset + len(texts)] = emb
+        del out
+    finally:
+        shm.close()
+    return os.getpid(), len(texts), time.perf_counter() - t0
+
+
+class EmbeddingPool:
+    """
+    Encoder multi-proceso (SentenceTransformer por worker) para backfills grandes.
+    - el lote de entrada se parte en trozos de `batch_size` repartidos entre workers
+    - los vectores vuelven por memoria compartida (sin pickle de arrays)
+    - cada trozo escribe en su offset => salida en el orden de entrada (determinista)
+    - model_factory (picklable, por defecto SentenceTransformer) crea el modelo
+      en cada worker
+    - dim=None la pregunta a un worker: el proceso padre no carga el modelo
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        dim: Optional[int] = None,
+        workers: int = 2,
+        batch_size: int = DEFAULT_ENCODE_BATCH_SIZE,
+        threads_per_worker: int = 1,
+        model_factory: Optional[Callable[[str], Any]] = None,
+    ) -> None:
+        if int(workers) < 1:
+            raise ValueError("workers must be >= 1")
+        if int(batch_size) < 1:
+            raise ValueError("batch_size must be >= 1")
+        self.model_name = model_name
+        self.workers = int(workers)
+        self.batch_size = int(batch_size)
+        self._stats: Dict[int, List[float]] = {}
+        self._ex: Optional[ProcessPoolExecutor] = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model_name, int(threads_per_worker), model_factory),
+        )
+        if dim is None:
+            dim = self._ex.submit(_model_dim).result()
+        self.dim = int(dim)
+
+    def encode(self, texts: Sequence[str]) -> np.ndarray:
+        if self._ex is None:
+            raise RuntimeError("EmbeddingPool is closed")
+        n = len(texts)
+        if n == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        shape = (n, self.dim)
+        shm = SharedMemory(create=True, size=n * self.dim * 4)
+        try:
+            futs = [
+                self._ex.submit(
+                    _encode_into,
+                    shm.name,
+                    shape,
+                    off,
+                    list(texts[off : off + self.batch_size]),
+                )
+                for off in range(0, n, self.batch_size)
+            ]
+            for f in futs:
+                pid, rows, secs = f.result()
+                acc = self._stats.setdefault(pid, [0.0, 0.0])
+                acc[0] += rows
+                acc[1] += secs
+            view = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+            out = view.copy()
+            del view
+            return out
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def worker_throughput(self) -> List[Dict[str, float]]:
+        """Throughput acumulado por worker (pid), ordenado por pid."""
+        out: List[Dict[str, float]] = []
+        for pid in sorted(self._stats):
+            rows, secs = self._stats[pid]
+            out.append(
+                {
+                    "worker": pid,
+                    "items": int(rows),
+                    "seconds": float(secs),
+                    "items_per_sec": float(rows / secs) if secs > 0 else 0.0,
+                }
+            )
+        return out
+
+    def close(self) -> None:
+        if self._ex is not None:
+            self._ex.shutdown(wait=True)
+            self._ex = None
+
+    def __enter__(self) -> "EmbeddingPool":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
@@ -2,13 +2,15 @@ from __future__ import annotations
 
 from dataclasses import dataclass, asdict
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Mapping, Optional, Tuple
 
 import json
 import numpy as np
 
 import faiss  # type: ignore
 
+from ..utils.hashing import MerkleLog, item_digest
+
 
 @dataclass(frozen=True)
 class MemoryChunk:
@@ -31,11 +33,95 @@ class Retrieved:
     meta: Dict[str, Any]
 
 
+@dataclass(frozen=True)
+class MemoryFilter:
+    """
+    Filtro de metadatos aplicado dentro del scan de FAISS (IDSelector).
+    - ts_min/ts_max: rango inclusivo sobre ts_unix
+    - turn_min/turn_max: solape inclusivo con la ventana [turn_start, turn_end]
+    - tags: meta[k] == v para cada k; v list/tuple/set => cualquiera de esos valores
+    """
+
+    ts_min: Optional[int] = None
+    ts_max: Optional[int] = None
+    turn_min: Optional[int] = None
+    turn_max: Optional[int] = None
+    tags: Optional[Mapping[str, Any]] = None
+
+
+def _tag_key(k: str, v: Any) -> Tuple[str, str]:
+    return (str(k), json.dumps(v, sort_keys=True, ensure_ascii=False))
+
+
+class ShardAttributes:
+    """
+    Índice compacto de atributos por posición FAISS: ts_unix, ventana de turnos
+    y posting lists por (meta_key, valor). Se mantiene en add(); las vistas numpy
+    se materializan perezosamente y se invalidan al añadir.
+    """
+
+    def __init__(self) -> None:
+        self._ts: List[int] = []
+        self._turn_start: List[int] = []
+        self._turn_end: List[int] = []
+        self._tags: Dict[Tuple[str, str], List[int]] = {}
+        self._np: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None
+
+    def add(self, chunk: MemoryChunk) -> None:
+        pos = len(self._ts)
+        self._ts.append(int(chunk.ts_unix))
+        self._turn_start.append(int(chunk.turn_start))
+        self._turn_end.append(int(chunk.turn_end))
+        for k, v in (chunk.meta or {}).items():
+            if isinstance(v, (dict, list)):
+                continue
+            self._tags.setdefault(_tag_key(k, v), []).append(pos)
+        self._np = None
+
+    def _arrays(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        if self._np is None:
+            self._np = (
+                np.asarray(self._ts, dtype=np.int64),
+                np.asarray(self._turn_start, dtype=np.int64),
+                np.asarray(self._turn_end, dtype=np.int64),
+            )
+        return self._np
+
+    def mask(self, flt: MemoryFilter) -> np.ndarray:
+        n = len(self._ts)
+        m = np.ones(n, dtype=bool)
+        ts, t_start, t_end = self._arrays()
+        if flt.ts_min is not None:
+            m &= ts >= int(flt.ts_min)
+        if flt.ts_max is not None:
+            m &= ts <= int(flt.ts_max)
+        if flt.turn_min is not None:
+            m &= t_end >= int(flt.turn_min)
+        if flt.turn_max is not None:
+            m &= t_start <= int(flt.turn_max)
+        for k, want in (flt.tags or {}).items():
+            values = (
+                sorted(want, key=repr)
+                if isinstance(want, (list, tuple, set, frozenset))
+                else [want]
+            )
+            hit = np.zeros(n, dtype=bool)
+            for v in values:
+                hit[self._tags.get(_tag_key(k, v), [])] = True
+            m &= hit
+        return m
+
+
+def _chunk_digest(chunk: MemoryChunk, vec: np.ndarray) -> bytes:
+    return item_digest(chunk, np.ascontiguousarray(vec, dtype=np.float32).tobytes())
+
+
 class FaissShard:
     """
     A single agent's FAISS store (IndexFlatIP).
     - vectors: L2-normalized; inner product ~= cosine similarity.
     - metadata: JSONL aligned by insertion order (deterministic).
+    - merkle: all MerkleLog levels, saved alongside so load() does not rehash.
     """
 
     def __init__(self, root: Path, agent: str, dim: int):
@@ -44,12 +130,17 @@ class FaissShard:
         self.dim = dim
         self.index_path = root / f"{agent}.faiss"
         self.meta_path = root / f"{agent}.jsonl"
+        self.merkle_path = root / f"{agent}.merkle"
         self.index = faiss.IndexFlatIP(dim)
         self._chunks: List[MemoryChunk] = []
+        self.attrs = ShardAttributes()
+        self.merkle = MerkleLog()
 
     def load(self) -> None:
         self.root.mkdir(parents=True, exist_ok=True)
         self._chunks = []
+        self.attrs = ShardAttributes()
+        self.merkle = MerkleLog()
         if self.index_path.exists():
             self.index = faiss.read_index(str(self.index_path))
         else:
@@ -61,7 +152,30 @@ class FaissShard:
                     if not line.strip():
                         continue
                     obj = json.loads(line)
-                    self._chunks.append(MemoryChunk(**obj))
+                    ch = MemoryChunk(**obj)
+                    self._chunks.append(ch)
+                    self.attrs.add(ch)
+
+        if self.index.ntotal != len(self._chunks):
+            raise RuntimeError(
+                f"shard {self.agent!r}: {self.index_path.name} has "
+                f"{self.index.ntotal} vectors but {self.meta_path.name} has "
+                f"{len(self._chunks)} chunks"
+            )
+        if self.merkle_path.exists():
+            try:
+                merkle = MerkleLog.from_bytes(self.merkle_path.read_bytes())
+            except ValueError:
+                merkle = MerkleLog()  # truncado: se recalcula
+            if len(merkle) == len(self._chunks):
+                self.merkle = merkle
+                return
+        # sin fichero (store anterior), truncado o desfasado: hojas Merkle =
+        # metadata canónica + bytes del vector (mismo valor que en add)
+        if self._chunks:
+            vecs = self.index.reconstruct_n(0, self.index.ntotal)
+            for ch, v in zip(self._chunks, vecs):
+                self.merkle.append(_chunk_digest(ch, v))
 
     def save(self) -> None:
         self.root.mkdir(parents=True, exist_ok=True)
@@ -69,6 +183,7 @@ class FaissShard:
         with self.meta_path.open("w", encoding="utf-8") as f:
             for ch in self._chunks:
                 f.write(json.dumps(asdict(ch), ensure_ascii=False) + "\n")
+        self.merkle_path.write_bytes(self.merkle.to_bytes())
 
     @property
     def count(self) -> int:
@@ -80,13 +195,31 @@ class FaissShard:
             emb = emb.astype(np.float32)
         self.index.add(emb)
         self._chunks.append(chunk)
+        self.attrs.add(chunk)
+        self.merkle.append(_chunk_digest(chunk, emb[0]))
 
-    def search(self, q: np.ndarray, topk: int) -> List[Retrieved]:
+    def root_hex(self) -> str:
+        return self.merkle.root_hex()
+
+    def search(
+        self, q: np.ndarray, topk: int, flt: Optional[MemoryFilter] = None
+    ) -> List[Retrieved]:
         if self.count == 0:
             return []
         if q.dtype != np.float32:
             q = q.astype(np.float32)
-        scores, idxs = self.index.search(q, int(topk))
+        if flt is None:
+            scores, idxs = self.index.search(q, int(topk))
+        else:
+            mask = self.attrs.mask(flt)
+            hits = int(mask.sum())
+            if hits == 0:
+                return []
+            # bitmap little-endian por posición; el scan salta las filas no válidas
+            bitmap = np.packbits(mask.astype(np.uint8), bitorder="little")
+            sel = faiss.IDSelectorBitmap(self.count, faiss.swig_ptr(bitmap))
+            params = faiss.SearchParameters(sel=sel)
+            scores, idxs = self.index.search(q, min(int(topk), hits), params=params)
         out: List[Retrieved] = []
         for j, ix in enumerate(idxs[0].tolist()):
             if ix < 0 or ix >= self.count:
@@ -1,16 +1,23 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional
 from ..models.memory_item import MemoryItem
+from ..utils.hashing import MerkleLog, item_digest
+from .similarity import CorpusStats, tokenize
 
 
 @dataclass
 class InMemoryAgentIndex:
     agent: str
     _next_id: int = 1
+    stats: Optional[CorpusStats] = None
 
     def __post_init__(self):
         self.items: List[MemoryItem] = []
+        if self.stats is None:
+            self.stats = CorpusStats()
+        # hojas = hash canónico de cada item, en orden de inserción
+        self.merkle = MerkleLog()
 
     def add(
         self, text: str, ts_unix: int, meta: Dict[str, Any] | None = None
@@ -25,15 +32,26 @@ class InMemoryAgentIndex:
             meta=dict(meta),
         )
         self.items.append(item)
+        # BM25: estadísticas incrementales (doc_key = (agent, stable_id))
+        self.stats.add((item.agent, item.stable_id), tokenize(item.text))
+        self.merkle.append(item_digest(item))
         self._next_id += 1
         return item
 
+    def root_hex(self) -> str:
+        return self.merkle.root_hex()
+
 
 class IndexStore:
     def __init__(self):
         self.by_agent: Dict[str, InMemoryAgentIndex] = {}
+        # compartidas por todos los agentes: df/avg_len a nivel de store
+        self.stats = CorpusStats()
 
     def agent(self, agent: str) -> InMemoryAgentIndex:
         if agent not in self.by_agent:
-            self.by_agent[agent] = InMemoryAgentIndex(agent=agent)
+            self.by_agent[agent] = InMemoryAgentIndex(agent=agent, stats=self.stats)
         return self.by_agent[agent]
+
+    def merkle_roots(self) -> Dict[str, str]:
+        return {a: ix.root_hex() for a, ix in sorted(self.by_agent.items())}
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from dataclasses import asdict
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
 import numpy as np
 
@@ -11,8 +11,9 @@ try:
 except Exception:  # pragma: no cover
     SentenceTransformer = None  # type: ignore
 from .budgets import Budgets, Thresholds
-from .faiss_store import FaissShard, MemoryChunk, Retrieved
-from .tokens import _clip_to_tokens, _simple_token_count
+from .embed_pool import DEFAULT_ENCODE_BATCH_SIZE, EmbeddingPool
+from .faiss_store import FaissShard, MemoryChunk, MemoryFilter, Retrieved
+from .tokens import TokenBudget
 
 
 class DeterministicFusion:
@@ -52,6 +53,32 @@ class DeterministicFusion:
 
         return "\n".join(lines_out).strip()
 
+    def fuse_budgeted(
+        self,
+        per_agent_summaries: List[Tuple[str, float, int, TokenBudget]],
+        max_tokens: int,
+    ) -> TokenBudget:
+        """
+        Igual que fuse() + _clip_to_tokens(max_tokens), construido de forma
+        incremental: reutiliza los tokens de cada resumen y para al agotarse.
+        """
+        out = TokenBudget(max_tokens)
+        ordered = sorted(
+            per_agent_summaries,
+            key=lambda t: (t[2], t[1], t[0]),
+            reverse=True,
+        )
+        seen = set()
+        for agent, sim, turn_end, summary in ordered:
+            for ln, toks in summary.lines():
+                key = ln.lower()
+                if key in seen:
+                    continue
+                seen.add(key)
+                if not out.feed_line(ln, toks):
+                    return out
+        return out
+
 
 class MultiAgentMemorySystem:
     """
@@ -71,6 +98,8 @@ class MultiAgentMemorySystem:
         turns_per_agent: int = 10,
         budgets: Budgets = Budgets(),
         thresholds: Thresholds = Thresholds(),
+        encode_workers: int = 0,
+        encode_batch_size: int = DEFAULT_ENCODE_BATCH_SIZE,
     ):
         self.store_dir = store_dir
         self.model_name = model_name
@@ -79,18 +108,26 @@ class MultiAgentMemorySystem:
         self.budgets = budgets
         self.thresholds = thresholds
 
-        self.model = (
-            (
-                lambda: (_ for _ in ()).throw(
-                    RuntimeError(
-                        "Embeddings requieren 'sentence-transformers'. Instala: pip install -e '.[embeddings]'"
-                    )
-                )
-            )()
-            if SentenceTransformer is None
-            else SentenceTransformer
-        )(model_name)
-        dim = int(self.model.get_sentence_embedding_dimension())
+        if SentenceTransformer is None:
+            raise RuntimeError(
+                "Embeddings requieren 'sentence-transformers'. Instala: pip install -e '.[embeddings]'"
+            )
+        self._model: Any = None
+
+        # Opcional: pool multi-proceso para ingest por lotes (index_turns). Con
+        # pool el modelo solo vive en los workers (dim la da uno de ellos)
+        self.encode_pool: Optional[EmbeddingPool] = None
+        if int(encode_workers) > 0:
+            self.encode_pool = EmbeddingPool(
+                model_name,
+                None,
+                workers=int(encode_workers),
+                batch_size=int(encode_batch_size),
+                model_factory=SentenceTransformer,
+            )
+            dim = self.encode_pool.dim
+        else:
+            dim = int(self.model.get_sentence_embedding_dimension())
 
         self.shards: Dict[str, FaissShard] = {
             a: FaissShard(store_dir, a, dim) for a in self.agents
@@ -100,35 +137,45 @@ class MultiAgentMemorySystem:
 
         self.fuser = DeterministicFusion()
 
+    @property
+    def model(self) -> Any:
+        # en proceso solo se carga si hace falta (sin pool, o tras close())
+        if self._model is None:
+            self._model = SentenceTransformer(self.model_name)
+        return self._model
+
     def _agent_for_turn(self, turn_index_1based: int) -> str:
         block = (turn_index_1based - 1) // self.turns_per_agent
         agent_ix = block % len(self.agents)
         return self.agents[agent_ix]
 
-    def index_turn(
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        if self.encode_pool is not None:
+            return self.encode_pool.encode(texts)
+        return self.model.encode(
+            texts, convert_to_numpy=True, normalize_embeddings=True
+        ).astype(np.float32)
+
+    def _chunk_for_turn(
         self,
         stable_id: int,
         turn_index_1based: int,
         text: str,
         ts_unix: int,
         meta: Optional[Dict[str, Any]] = None,
-    ) -> None:
+    ) -> MemoryChunk:
         agent = self._agent_for_turn(turn_index_1based)
         turn_start = (
             (turn_index_1based - 1) // self.turns_per_agent
         ) * self.turns_per_agent + 1
         turn_end = turn_start + self.turns_per_agent - 1
 
-        emb = self.model.encode(
-            [text], convert_to_numpy=True, normalize_embeddings=True
-        ).astype(np.float32)
-
         m = dict(meta or {})
         # IMPORTANT: include turn_end for "newest wins" at query-time
         m.setdefault("turn_end", int(turn_end))
         m.setdefault("turn_start", int(turn_start))
 
-        ch = MemoryChunk(
+        return MemoryChunk(
             stable_id=int(stable_id),
             agent=str(agent),
             turn_start=int(turn_start),
@@ -137,33 +184,92 @@ class MultiAgentMemorySystem:
             ts_unix=int(ts_unix),
             meta=m,
         )
-        self.shards[agent].add(emb, ch)
+
+    def index_turn(
+        self,
+        stable_id: int,
+        turn_index_1based: int,
+        text: str,
+        ts_unix: int,
+        meta: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        ch = self._chunk_for_turn(stable_id, turn_index_1based, text, ts_unix, meta)
+        self.shards[ch.agent].add(self._encode([ch.text]), ch)
+
+    def index_turns(self, turns: Sequence[Dict[str, Any]]) -> List[MemoryChunk]:
+        """
+        Indexa un lote de turnos con un solo encode.
+        Cada turno: {stable_id, turn_index_1based, text, ts_unix, meta?}.
+        Inserción en orden de entrada => shards/stable_ids deterministas.
+        """
+        chunks = [self._chunk_for_turn(**t) for t in turns]
+        if not chunks:
+            return []
+        embs = self._encode([ch.text for ch in chunks])
+        for i, ch in enumerate(chunks):
+            self.shards[ch.agent].add(embs[i : i + 1], ch)
+        return chunks
 
     def persist(self) -> None:
         for s in self.shards.values():
             s.save()
 
-    def _summarize_agent(self, retrieved: List[Retrieved]) -> str:
-        if not retrieved:
-            return ""
+    def merkle_roots(self) -> Dict[str, str]:
+        """Raíz Merkle por shard: comparar réplicas/reinicios sin volcar nada."""
+        return {a: s.root_hex() for a, s in sorted(self.shards.items())}
+
+    def close(self) -> None:
+        if self.encode_pool is not None:
+            self.encode_pool.close()
+            self.encode_pool = None
+
+    def _summarize_agent(self, retrieved: List[Retrieved]) -> TokenBudget:
+        budget = TokenBudget(self.budgets.max_agent_summary_tokens)
         retrieved = sorted(
             retrieved, key=lambda r: (r.score, r.ts_unix, -r.stable_id), reverse=True
         )
-        joined = "\n".join(
-            [r.text.strip() for r in retrieved if (r.text or "").strip()]
-        )
-        return _clip_to_tokens(joined, self.budgets.max_agent_summary_tokens)
+        for r in retrieved:
+            t = (r.text or "").strip()
+            if t and not budget.feed(t):
+                break
+        return budget
 
-    def query(self, text: str, now_unix: int) -> Dict[str, Any]:
-        q = self.model.encode(
-            [text], convert_to_numpy=True, normalize_embeddings=True
-        ).astype(np.float32)
+    def query(
+        self, text: str, now_unix: int, filters: Optional[MemoryFilter] = None
+    ) -> Dict[str, Any]:
+        """
+        `filters` restringe la búsqueda de cada shard (ts/turnos/meta) dentro
+        del propio scan de FAISS, sin sobre-recuperar y filtrar después.
+        """
+        return self._query_vec(text, self._encode([text]), now_unix, filters)
 
+    def query_many(
+        self,
+        texts: Sequence[str],
+        now_unix: int,
+        filters: Optional[MemoryFilter] = None,
+    ) -> List[Dict[str, Any]]:
+        """Igual que query() para cada texto, con un solo encode por lote."""
+        if not texts:
+            return []
+        qs = self._encode(list(texts))
+        return [
+            self._query_vec(t, qs[i : i + 1], now_unix, filters)
+            for i, t in enumerate(texts)
+        ]
+
+    def _query_vec(
+        self,
+        text: str,
+        q: np.ndarray,
+        now_unix: int,
+        filters: Optional[MemoryFilter] = None,
+    ) -> Dict[str, Any]:
         per_agent: List[Dict[str, Any]] = []
-        summaries_for_fuse: List[Tuple[str, float, int, str]] = []
+        summaries_for_fuse: List[Tuple[str, float, int, TokenBudget]] = []
 
         for agent in self.agents:
-            got = self.shards[agent].search(q, self.budgets.topk_per_agent)
+            got = self.shards[agent].search(q, self.budgets.topk_per_agent, filters)
             best = max([g.score for g in got], default=0.0)
 
             newest_turn_end = 0
@@ -173,9 +279,10 @@ class MultiAgentMemorySystem:
             summary = ""
             passed = bool(best >= float(self.thresholds.similarity_gate))
             if passed:
-                summary = self._summarize_agent(got)
+                budget = self._summarize_agent(got)
+                summary = budget.text()
                 summaries_for_fuse.append(
-                    (agent, float(best), int(newest_turn_end), summary)
+                    (agent, float(best), int(newest_turn_end), budget)
                 )
 
             per_agent.append(
@@ -187,8 +294,10 @@ class MultiAgentMemorySystem:
                 }
             )
 
-        fused = self.fuser.fuse(summaries_for_fuse)
-        fused = _clip_to_tokens(fused, int(self.budgets.max_recall_tokens))
+        recall = self.fuser.fuse_budgeted(
+            summaries_for_fuse, int(self.budgets.max_recall_tokens)
+        )
+        fused = recall.text()
 
         return {
             "query": str(text),
@@ -197,5 +306,5 @@ class MultiAgentMemorySystem:
             "budgets": asdict(self.budgets),
             "per_agent": per_agent,
             "fused_context": fused,
-            "fused_tokens": _simple_token_count(fused),
+            "fused_tokens": recall.count,
         }
@@ -1,9 +1,10 @@
 from __future__ import annotations
 from dataclasses import dataclass
+import heapq
 from typing import Dict, List, Iterable, Optional
 from ..models.memory_item import MemoryItem
 from ..models.retrieval import RetrievedItem
-from .similarity import tokenize, idf, tfidf_vec, cos_sim
+from .similarity import CorpusStats, tokenize, idf, idf_from_df, tfidf_vec, cos_sim
 
 AGENT_PRIORITY = {
     "preferences": 1.0,
@@ -17,6 +18,11 @@ class ScoreWeights:
     alpha: float = 0.55  # match
     beta: float = 0.30  # recency
     gamma: float = 0.15  # priority
+    # match scorer: "tfidf" (coseno, por defecto) | "bm25" | "bm25+"
+    scorer: str = "tfidf"
+    k1: float = 1.2
+    b: float = 0.75
+    delta: float = 1.0  # solo bm25+
 
 
 def _norm_recency(
@@ -28,6 +34,40 @@ def _norm_recency(
     return float(1.0 - (dt / float(horizon_sec)))
 
 
+def _tfidf_matches(query: str, items: List[MemoryItem]) -> List[float]:
+    docs_tokens = [tokenize(it.text) for it in items] + [tokenize(query)]
+    idf_map = idf(docs_tokens)
+    qv = tfidf_vec(tokenize(query), idf_map)
+    return [cos_sim(qv, tfidf_vec(tokenize(it.text), idf_map)) for it in items]
+
+
+def _bm25_matches(
+    query: str,
+    items: List[MemoryItem],
+    weights: ScoreWeights,
+    stats: Optional[CorpusStats],
+) -> List[float]:
+    keys = [(it.agent, it.stable_id) for it in items]
+    if stats is None:
+        # sin estadísticas de ingest: se construyen sobre `items` (O(N))
+        stats = CorpusStats()
+        for k, it in zip(keys, items):
+            stats.add(k, tokenize(it.text))
+    delta = float(weights.delta) if weights.scorer == "bm25+" else 0.0
+    raw = stats.bm25_scores(
+        tokenize(query),
+        k1=float(weights.k1),
+        b=float(weights.b),
+        delta=delta,
+        allowed=set(keys),
+    )
+    # BM25 no está acotado: normaliza por el máximo de la query => match en [0, 1]
+    top = max(raw.values(), default=0.0)
+    if top <= 0.0:
+        return [0.0 for _ in keys]
+    return [raw.get(k, 0.0) / top for k in keys]
+
+
 def retrieve_topk(
     query: str,
     items: List[MemoryItem],
@@ -35,35 +75,87 @@ def retrieve_topk(
     topk: int = 5,
     weights: ScoreWeights = ScoreWeights(),
     agent_priority: Dict[str, float] = AGENT_PRIORITY,
+    stats: Optional[CorpusStats] = None,
 ) -> List[RetrievedItem]:
-    docs_tokens = [tokenize(it.text) for it in items] + [tokenize(query)]
-    idf_map = idf(docs_tokens)
-    qv = tfidf_vec(tokenize(query), idf_map)
+    """
+    Ranking determinista: alpha*match + beta*recency + gamma*priority.
+    - weights.scorer="tfidf": coseno TF-IDF (idf suavizado, query incluida).
+    - weights.scorer="bm25"|"bm25+": usa `stats` (p.ej. IndexStore.stats,
+      mantenidas en ingest) y solo recorre los postings de la query.
+    Tie-break idéntico en todos los modos.
+    """
+    if weights.scorer == "tfidf":
+        matches = _tfidf_matches(query, items)
+    elif weights.scorer in ("bm25", "bm25+"):
+        matches = _bm25_matches(query, items, weights, stats)
+    else:
+        raise ValueError(f"unknown scorer: {weights.scorer!r}")
+
+    scored = [
+        _score_item(it, match, now_unix, weights, agent_priority)
+        for it, match in zip(items, matches)
+    ]
+    scored.sort(key=_rank_key)
+    return scored[: max(0, int(topk))]
 
-    scored: List[RetrievedItem] = []
-    for it in items:
-        iv = tfidf_vec(tokenize(it.text), idf_map)
-        match = cos_sim(qv, iv)
-        rec = _norm_recency(it.ts_unix, now_unix)
-        pri = float(agent_priority.get(it.agent, 0.5))
-        sg = float(weights.alpha * match + weights.beta * rec + weights.gamma * pri)
-
-        scored.append(
-            RetrievedItem(
-                agent=it.agent,
-                stable_id=it.stable_id,
-                text=it.text,
-                ts_unix=it.ts_unix,
-                match_query=float(match),
-                recency=float(rec),
-                priority=float(pri),
-                score_global=float(sg),
-                meta=dict(it.meta),
-            )
-        )
 
-    scored.sort(key=lambda r: (-r.score_global, -r.recency, -r.priority, r.stable_id))
-    return scored[: max(0, int(topk))]
+def _score_item(
+    it: MemoryItem,
+    match: float,
+    now_unix: int,
+    weights: ScoreWeights,
+    agent_priority: Dict[str, float],
+) -> RetrievedItem:
+    rec = _norm_recency(it.ts_unix, now_unix)
+    pri = float(agent_priority.get(it.agent, 0.5))
+    sg = float(weights.alpha * match + weights.beta * rec + weights.gamma * pri)
+    return RetrievedItem(
+        agent=it.agent,
+        stable_id=it.stable_id,
+        text=it.text,
+        ts_unix=it.ts_unix,
+        match_query=float(match),
+        recency=float(rec),
+        priority=float(pri),
+        score_global=float(sg),
+        meta=dict(it.meta),
+    )
+
+
+def _rank_key(r: RetrievedItem):
+    return (-r.score_global, -r.recency, -r.priority, r.stable_id)
+
+
+def retrieve_topk_stream(
+    query: str,
+    items: Iterable[MemoryItem],
+    now_unix: int,
+    df: Dict[str, int],
+    n_docs: int,
+    topk: int = 5,
+    weights: ScoreWeights = ScoreWeights(),
+    agent_priority: Dict[str, float] = AGENT_PRIORITY,
+) -> List[RetrievedItem]:
+    """
+    Equivalente exacto a retrieve_topk(scorer="tfidf") recorriendo `items` una
+    sola vez con memoria O(topk + vocabulario).
+    `df`/`n_docs`: document frequency y nº de documentos de esos mismos items,
+    acumulados en ingest (sin la query; aquí se añade igual que en idf()).
+    """
+    q_toks = tokenize(query)
+    df_q = dict(df)
+    for t in set(q_toks):
+        df_q[t] = df_q.get(t, 0) + 1
+    idf_map = idf_from_df(df_q, int(n_docs) + 1)
+    qv = tfidf_vec(q_toks, idf_map)
+
+    def scored():
+        for it in items:
+            match = cos_sim(qv, tfidf_vec(tokenize(it.text), idf_map))
+            yield _score_item(it, match, now_unix, weights, agent_priority)
+
+    # nsmallest(k, key) == sorted(key)[:k]; stable_id hace la clave total
+    return heapq.nsmallest(max(0, int(topk)), scored(), key=_rank_key)
 
 
 # =========================
@@ -1,7 +1,7 @@
 from __future__ import annotations
 import math
 import re
-from typing import Dict, List
+from typing import Dict, Hashable, List, Optional, Set
 
 _WORD = re.compile(r"[A-Za-zÁÉÍÓÚÜÑáéíóúüñ0-9_]+")
 
@@ -29,6 +29,10 @@ def idf(docs: List[List[str]]) -> Dict[str, float]:
         seen = set(toks)
         for t in seen:
             df[t] = df.get(t, 0) + 1
+    return idf_from_df(df, n)
+
+
+def idf_from_df(df: Dict[str, int], n: int) -> Dict[str, float]:
     out: Dict[str, float] = {}
     for t, c in df.items():
         # smooth idf: log((n+1)/(c+1)) + 1
@@ -61,3 +65,77 @@ def cos_sim(a: Dict[str, float], b: Dict[str, float]) -> float:
     if na == 0.0 or nb == 0.0:
         return 0.0
     return float(dot / (na * nb))
+
+
+class CorpusStats:
+    """
+    Estadísticas de corpus para BM25 mantenidas incrementalmente en ingest.
+    - doc_len / total_len / df / postings se actualizan en add(); nunca por query.
+    - doc_key: clave estable del documento (p.ej. (agent, stable_id)).
+    - postings conserva orden de inserción => iteración determinista.
+    """
+
+    def __init__(self) -> None:
+        self.doc_len: Dict[Hashable, int] = {}
+        self.total_len: int = 0
+        self.df: Dict[str, int] = {}
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.doc_len)
+
+    @property
+    def avg_len(self) -> float:
+        if not self.doc_len:
+            return 0.0
+        return float(self.total_len) / float(len(self.doc_len))
+
+    def add(self, doc_key: Hashable, tokens: List[str]) -> None:
+        if doc_key in self.doc_len:
+            raise ValueError(f"duplicate doc_key in CorpusStats: {doc_key!r}")
+        self.doc_len[doc_key] = len(tokens)
+        self.total_len += len(tokens)
+        counts: Dict[str, int] = {}
+        for t in tokens:
+            counts[t] = counts.get(t, 0) + 1
+        for t, c in counts.items():
+            self.df[t] = self.df.get(t, 0) + 1
+            self.postings.setdefault(t, {})[doc_key] = c
+
+    def bm25_idf(self, term: str) -> float:
+        # idf no negativo (variante Lucene): log(1 + (N - df + 0.5) / (df + 0.5))
+        n = float(self.n_docs)
+        c = float(self.df.get(term, 0))
+        return math.log(1.0 + (n - c + 0.5) / (c + 0.5))
+
+    def bm25_scores(
+        self,
+        query_tokens: List[str],
+        k1: float = 1.2,
+        b: float = 0.75,
+        delta: float = 0.0,
+        allowed: Optional[Set[Hashable]] = None,
+    ) -> Dict[Hashable, float]:
+        """
+        BM25 (delta=0) o BM25+ (delta>0) sobre los postings tocados por la query.
+        Coste proporcional a los postings de los términos de la query, no al corpus.
+        `allowed` restringe el resultado a un subconjunto de doc_keys.
+        """
+        out: Dict[Hashable, float] = {}
+        avg = self.avg_len
+        if avg <= 0.0:
+            return out
+        # términos únicos en orden fijo => suma en coma flotante determinista
+        for term in sorted(set(query_tokens)):
+            plist = self.postings.get(term)
+            if not plist:
+                continue
+            w = self.bm25_idf(term)
+            for key, freq in plist.items():
+                if allowed is not None and key not in allowed:
+                    continue
+                norm = k1 * (1.0 - b + b * (self.doc_len[key] / avg))
+                s = w * ((freq * (k1 + 1.0)) / (freq + norm) + delta)
+                out[key] = out.get(key, 0.0) + s
+        return out
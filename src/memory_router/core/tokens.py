@@ -1,8 +1,10 @@
 from __future__ import annotations
 
 import re
+from typing import List, Optional, Tuple
 
 _ws = re.compile(r"\s+")
+_tok = re.compile(r"\S+")
 
 
 def _simple_token_count(text: str) -> int:
@@ -20,3 +22,78 @@ def _clip_to_tokens(text: str, max_tokens: int) -> str:
     if len(toks) <= max_tokens:
         return text.strip()
     return " ".join(toks[:max_tokens]).strip()
+
+
+class TokenBudget:
+    """
+    Contador de tokens de una sola pasada, con la semántica exacta de
+    _clip_to_tokens sobre el texto unido con "\\n":
+    - si el total cabe en max_tokens -> texto unido (strip), líneas intactas
+    - si no -> primeros max_tokens tokens unidos por espacio (una sola línea)
+    Cada línea se tokeniza una vez; al agotarse el presupuesto deja de consumir.
+    """
+
+    def __init__(self, max_tokens: int) -> None:
+        self.max_tokens = int(max_tokens)
+        self.tokens: List[str] = []
+        self.exhausted = False
+        self._raw: List[str] = []
+        self._lines: List[Tuple[str, List[str]]] = []
+
+    @property
+    def count(self) -> int:
+        return len(self.tokens)
+
+    def _take(self, line: str, toks: Optional[List[str]] = None) -> bool:
+        room = max(0, self.max_tokens - len(self.tokens))
+        if toks is None:
+            got: List[str] = []
+            for m in _tok.finditer(line):
+                if len(got) >= room:
+                    self.tokens.extend(got)
+                    self.exhausted = True
+                    return False
+                got.append(m.group())
+            toks = got
+        elif len(toks) > room:
+            self.tokens.extend(toks[:room])
+            self.exhausted = True
+            return False
+        self.tokens.extend(toks)
+        self._lines.append((line, toks))
+        return True
+
+    def feed(self, text: str) -> bool:
+        """Consume un bloque de texto (puede contener "\\n"). False si se agotó."""
+        if self.exhausted:
+            return False
+        for piece in (text or "").split("\n"):
+            ln = piece.strip()
+            if ln and not self._take(ln):
+                return False
+        self._raw.append(text or "")
+        return True
+
+    def feed_line(self, line: str, toks: Optional[List[str]] = None) -> bool:
+        """Consume una línea ya normalizada (strip, sin "\\n"); reutiliza `toks`."""
+        if self.exhausted:
+            return False
+        if not self._take(line, toks):
+            return False
+        self._raw.append(line)
+        return True
+
+    def lines(self) -> List[Tuple[str, List[str]]]:
+        """Líneas no vacías de text() con sus tokens (sin volver a tokenizar)."""
+        if self.max_tokens <= 0:
+            return []
+        if self.exhausted:
+            return [(" ".join(self.tokens), list(self.tokens))] if self.tokens else []
+        return list(self._lines)
+
+    def text(self) -> str:
+        if self.max_tokens <= 0:
+            return ""
+        if self.exhausted:
+            return " ".join(self.tokens)
+        return "\n".join(self._raw).strip()
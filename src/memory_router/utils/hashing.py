@@ -1,7 +1,161 @@
 import hashlib
-from typing import Any
-from .json_canonical import canonical_json
+from typing import Any, Iterable, List
+from .json_canonical import iter_canonical
+
+_FLUSH_CHARS = 1 << 16
+
+
+def _update_chunked(h: Any, chunks: Iterable[str]) -> None:
+    # agrupa trozos pequeños antes de codificar: menos llamadas a update()
+    buf = []
+    size = 0
+    for c in chunks:
+        buf.append(c)
+        size += len(c)
+        if size >= _FLUSH_CHARS:
+            h.update("".join(buf).encode("utf-8"))
+            buf = []
+            size = 0
+    if buf:
+        h.update("".join(buf).encode("utf-8"))
 
 
 def sha256_hex(obj: Any) -> str:
-    return hashlib.sha256(canonical_json(obj).encode("utf-8")).hexdigest()
+    # == sha256(canonical_json(obj)) sin materializar el JSON completo
+    h = hashlib.sha256()
+    _update_chunked(h, iter_canonical(obj))
+    return h.hexdigest()
+
+
+class ListHasher:
+    """
+    sha256_hex(lista) construido elemento a elemento, sin materializar la lista:
+    canonical_json([a, b]) == "[" + canonical_json(a) + "," + canonical_json(b) + "]".
+    """
+
+    def __init__(self) -> None:
+        self._h = hashlib.sha256(b"[")
+        self.count = 0
+
+    def update(self, item: Any) -> None:
+        if self.count:
+            self._h.update(b",")
+        _update_chunked(self._h, iter_canonical(item))
+        self.count += 1
+
+    def hexdigest(self) -> str:
+        h = self._h.copy()
+        h.update(b"]")
+        return h.hexdigest()
+
+
+def item_digest(obj: Any, extra: bytes = b"") -> bytes:
+    """Hash canónico de un item (hoja Merkle); `extra` añade bytes crudos (p.ej. el vector)."""
+    h = hashlib.sha256()
+    _update_chunked(h, iter_canonical(obj))
+    if extra:
+        h.update(extra)
+    return h.digest()
+
+
+def _leaf(d: bytes) -> bytes:
+    # separación de dominio hoja/nodo (RFC 6962)
+    return hashlib.sha256(b"\x00" + d).digest()
+
+
+def _node(a: bytes, b: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + a + b).digest()
+
+
+_EMPTY_ROOT = hashlib.sha256(b"").digest()
+_HASH_SIZE = len(_EMPTY_ROOT)
+
+
+class MerkleLog:
+    """
+    Árbol Merkle append-only con la forma de RFC 6962 (MTH). Guarda todos los
+    niveles de subárboles perfectos: append O(1) amortizado + O(log n) para
+    refrescar la raíz cacheada; root_hex O(1); diff O(log n) por hoja distinta.
+    """
+
+    def __init__(self) -> None:
+        self._levels: List[List[bytes]] = [[]]
+        self._root = _EMPTY_ROOT
+
+    def __len__(self) -> int:
+        return len(self._levels[0])
+
+    def append(self, digest: bytes) -> None:
+        levels = self._levels
+        levels[0].append(_leaf(digest))
+        lvl = 0
+        # como un contador binario: cerrar cada subárbol perfecto completado
+        while len(levels[lvl]) % 2 == 0:
+            nodes = levels[lvl]
+            if lvl + 1 == len(levels):
+                levels.append([])
+            levels[lvl + 1].append(_node(nodes[-2], nodes[-1]))
+            lvl += 1
+        self._root = self._range(0, len(self))
+
+    def _range(self, lo: int, size: int) -> bytes:
+        """MTH de las hojas [lo, lo+size)."""
+        if size == 0:
+            return _EMPTY_ROOT
+        if size & (size - 1) == 0 and lo % size == 0:
+            return self._levels[size.bit_length() - 1][lo // size]
+        k = 1 << ((size - 1).bit_length() - 1)  # mayor potencia de 2 < size
+        return _node(self._range(lo, k), self._range(lo + k, size - k))
+
+    @property
+    def root(self) -> bytes:
+        return self._root
+
+    def root_hex(self) -> str:
+        return self._root.hex()
+
+    def to_bytes(self) -> bytes:
+        """nº de hojas (u64 LE) + todos los niveles: recargar no rehashea nada."""
+        return len(self).to_bytes(8, "little") + b"".join(
+            b"".join(nodes) for nodes in self._levels
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "MerkleLog":
+        n = int.from_bytes(data[:8], "little")
+        sizes = [n >> lvl for lvl in range(max(1, n.bit_length()))]
+        if len(data) != 8 + _HASH_SIZE * sum(sizes):
+            raise ValueError(f"corrupt MerkleLog: {len(data)} bytes for {n} leaves")
+        out = cls()
+        out._levels = []
+        off = 8
+        for size in sizes:
+            out._levels.append(
+                [
+                    data[off + i * _HASH_SIZE : off + (i + 1) * _HASH_SIZE]
+                    for i in range(size)
+                ]
+            )
+            off += size * _HASH_SIZE
+        out._root = out._range(0, n)
+        return out
+
+    def diff(self, other: "MerkleLog") -> List[int]:
+        """Índices de hoja que difieren (incluye las sobrantes del más largo)."""
+        n = min(len(self), len(other))
+        out: List[int] = []
+
+        def rec(lo: int, size: int) -> None:
+            if self._range(lo, size) == other._range(lo, size):
+                return
+            if size == 1:
+                out.append(lo)
+                return
+            k = 1 << ((size - 1).bit_length() - 1)
+            rec(lo, k)
+            rec(lo + k, size - k)
+
+        if n:
+            rec(0, n)
+        out.extend(range(n, max(len(self), len(other))))
+        return out
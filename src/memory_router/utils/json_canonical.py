@@ -1,54 +1,119 @@
 from __future__ import annotations
 
 import json
-from dataclasses import is_dataclass, asdict
+from dataclasses import is_dataclass, fields
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable, Dict, Iterator, List
 
 
-def _to_jsonable(x: Any) -> Any:
-    """
-    Convierte objetos a estructuras JSON-serializables de forma determinista.
-    - dataclasses -> asdict (recursivo)
-    - Path -> str
-    - objetos con __dict__ -> dict (sin privados)
-    - dict/list/tuple/set -> recursivo (set -> lista ordenada)
-    """
-    if x is None or isinstance(x, (bool, int, float, str)):
-        return x
+try:
+    import orjson  # type: ignore
+except Exception:  # pragma: no cover
+    orjson = None  # type: ignore
 
-    if isinstance(x, Path):
-        return str(x)
+_SEPARATORS = (",", ":")
 
-    if is_dataclass(x):
-        return _to_jsonable(asdict(x))
+# floats que json y orjson formatean igual (repr sin exponente): 0 o 1e-4 <= |x| < 1e16
+_FLOAT_SAFE_MIN = 1e-4
+_FLOAT_SAFE_MAX = 1e16
 
-    if isinstance(x, dict):
-        # claves a str para estabilidad
-        return {str(k): _to_jsonable(v) for k, v in x.items()}
 
-    if isinstance(x, (list, tuple)):
-        return [_to_jsonable(v) for v in x]
-
-    if isinstance(x, set):
-        # orden determinista
-        return sorted(
-            [_to_jsonable(v) for v in x],
-            key=lambda z: json.dumps(
-                z, sort_keys=True, separators=(",", ":"), ensure_ascii=False
-            ),
-        )
-
-    # objetos "simples" con atributos
+# --- conversión a JSON-friendly con tabla de despacho por tipo (cacheada) ---
+# Cada conversor recibe (x, st); st[0] = True si el fast path nativo no es seguro.
+_Converter = Callable[[Any, List[bool]], Any]
+_DISPATCH: Dict[type, _Converter] = {}
+
+
+def _conv(x: Any, st: List[bool]) -> Any:
+    fn = _DISPATCH.get(type(x))
+    if fn is None:
+        fn = _resolve(type(x))
+        _DISPATCH[type(x)] = fn
+    return fn(x, st)
+
+
+def _c_ident(x: Any, st: List[bool]) -> Any:
+    return x
+
+
+def _c_float(x: float, st: List[bool]) -> Any:
+    ax = abs(x)
+    if ax != 0.0 and not (_FLOAT_SAFE_MIN <= ax < _FLOAT_SAFE_MAX):
+        st[0] = True  # exponente / nan / inf: json y orjson difieren
+    return x
+
+
+def _c_path(x: Path, st: List[bool]) -> Any:
+    return str(x)
+
+
+def _c_dict(x: dict, st: List[bool]) -> Any:
+    # claves a str para estabilidad
+    return {str(k): _conv(v, st) for k, v in x.items()}
+
+
+def _c_seq(x: Any, st: List[bool]) -> Any:
+    return [_conv(v, st) for v in x]
+
+
+def _c_set(x: set, st: List[bool]) -> Any:
+    # orden determinista: por el JSON canónico de cada elemento
+    return sorted(
+        [_conv(v, st) for v in x],
+        key=lambda z: json.dumps(
+            z, sort_keys=True, separators=_SEPARATORS, ensure_ascii=False
+        ),
+    )
+
+
+def _c_object(x: Any, st: List[bool]) -> Any:
+    # objetos "simples" con atributos; último recurso: str (determinista)
     d = getattr(x, "__dict__", None)
     if isinstance(d, dict):
-        clean = {k: v for k, v in d.items() if not str(k).startswith("_")}
-        return _to_jsonable(clean)
-
-    # último recurso: string (determinista)
+        return _conv({k: v for k, v in d.items() if not str(k).startswith("_")}, st)
     return str(x)
 
 
+def _dataclass_converter(tp: type) -> _Converter:
+    # campo a campo (nombres cacheados): sin la copia profunda de asdict()
+    names = tuple(f.name for f in fields(tp))
+
+    def conv(x: Any, st: List[bool]) -> Any:
+        return {n: _conv(getattr(x, n), st) for n in names}
+
+    return conv
+
+
+def _resolve(tp: type) -> _Converter:
+    # mismo orden de prioridad que la conversión isinstance original
+    if tp is type(None) or issubclass(tp, (bool, int, str)):
+        return _c_ident
+    if issubclass(tp, float):
+        return _c_float
+    if issubclass(tp, Path):
+        return _c_path
+    if is_dataclass(tp):
+        return _dataclass_converter(tp)
+    if issubclass(tp, dict):
+        return _c_dict
+    if issubclass(tp, (list, tuple)):
+        return _c_seq
+    if issubclass(tp, set):
+        return _c_set
+    return _c_object
+
+
+def _to_jsonable(x: Any) -> Any:
+    """
+    Convierte objetos a estructuras JSON-serializables de forma determinista.
+    - dataclasses -> dict por campos (recursivo)
+    - Path -> str
+    - objetos con __dict__ -> dict (sin privados)
+    - dict/list/tuple/set -> recursivo (set -> lista ordenada)
+    """
+    return _conv(x, [False])
+
+
 def canonical_dumps(obj: Any) -> str:
     """
     JSON canónico determinista:
@@ -56,9 +121,17 @@ def canonical_dumps(obj: Any) -> str:
       - sort_keys=True
       - separators sin espacios
       - ensure_ascii=False (UTF-8 estable)
+    Usa orjson si está instalado y la salida es byte-idéntica; si no, json.
     """
-    j = _to_jsonable(obj)
-    return json.dumps(j, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    st = [False]
+    j = _conv(obj, st)
+    if orjson is not None and not st[0]:
+        # fast path nativo: mismos bytes (claves str, floats sin exponente)
+        try:
+            return orjson.dumps(j, option=orjson.OPT_SORT_KEYS).decode("utf-8")
+        except TypeError:
+            pass  # ints > 64 bits, surrogates, subclases no soportadas...
+    return json.dumps(j, sort_keys=True, ensure_ascii=False, separators=_SEPARATORS)
 
 
 def canonical_json(obj: Any) -> str:
@@ -68,3 +141,46 @@ def canonical_json(obj: Any) -> str:
 
 def canonical_bytes(obj: Any) -> bytes:
     return canonical_dumps(obj).encode("utf-8")
+
+
+def iter_canonical(obj: Any, depth: int = 1) -> Iterator[str]:
+    """
+    Mismos bytes que canonical_dumps(obj), emitidos en trozos.
+    Los `depth` niveles exteriores de contenedores se recorren en streaming;
+    por debajo, cada elemento se codifica de una vez (encoder C de json).
+    Con depth=1 la memoria es O(mayor elemento) en vez de O(objeto completo).
+    """
+    x = obj
+    if depth <= 0:
+        yield canonical_dumps(x)
+        return
+
+    if is_dataclass(x) and not isinstance(x, type):
+        yield from _iter_mapping({f.name: getattr(x, f.name) for f in fields(x)}, depth)
+        return
+
+    if isinstance(x, dict):
+        yield from _iter_mapping(x, depth)
+        return
+
+    if isinstance(x, (list, tuple)):
+        yield "["
+        for i, v in enumerate(x):
+            if i:
+                yield ","
+            yield from iter_canonical(v, depth - 1)
+        yield "]"
+        return
+
+    # escalares, Path, set, objetos: sin estructura que trocear
+    yield canonical_dumps(x)
+
+
+def _iter_mapping(m: Any, depth: int) -> Iterator[str]:
+    # claves a str (la última gana, como en _to_jsonable) y orden sort_keys
+    keyed = {str(k): v for k, v in m.items()}
+    yield "{"
+    for i, k in enumerate(sorted(keyed)):
+        yield ("," if i else "") + json.dumps(k, ensure_ascii=False) + ":"
+        yield from iter_canonical(keyed[k], depth - 1)
+    yield "}"
@@ -1,16 +1,65 @@
+import hashlib
 import json
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 from jsonschema import Draft202012Validator
 
 
+@dataclass(frozen=True)
+class ValidationPolicy:
+    """
+    strict: valida todo | sampled: 1 de cada `sample_every` | off: no valida.
+    El chequeo de schema_id se hace siempre (coste nulo).
+    """
+
+    mode: str = "strict"
+    sample_every: int = 1
+
+    def __post_init__(self) -> None:
+        if self.mode not in ("strict", "sampled", "off"):
+            raise ValueError(f"unknown validation mode: {self.mode!r}")
+        if int(self.sample_every) < 1:
+            raise ValueError("sample_every must be >= 1")
+
+    def should_validate(self, seen: int) -> bool:
+        if self.mode == "strict":
+            return True
+        if self.mode == "off":
+            return False
+        # determinista: el 1º de cada bloque de sample_every
+        return seen % int(self.sample_every) == 0
+
+
 class SchemaRegistry:
-    def __init__(self, schemas_dir: Path):
+    def __init__(self, schemas_dir: Path, policy: Optional[ValidationPolicy] = None):
         reg = json.loads((schemas_dir / "registry.json").read_text(encoding="utf-8"))
         self._map = {s["schema_id"]: (schemas_dir / s["path"]) for s in reg["schemas"]}
+        self._schemas: Dict[str, Dict[str, Any]] = {}
+        self._validators: Dict[str, Draft202012Validator] = {}
+        self.policy = policy or ValidationPolicy()
+        # contadores de validate_payload (seen = payloads vistos)
+        self.seen = 0
+        self.validated = 0
 
     def load_schema(self, schema_id: str) -> Dict[str, Any]:
-        return json.loads(self._map[schema_id].read_text(encoding="utf-8"))
+        schema = self._schemas.get(schema_id)
+        if schema is None:
+            schema = json.loads(self._map[schema_id].read_text(encoding="utf-8"))
+            self._schemas[schema_id] = schema
+        return schema
+
+    def content_hash(self, schema_id: str) -> str:
+        # sha256 de los bytes del fichero: cualquier edición cambia la clave
+        return hashlib.sha256(self._map[schema_id].read_bytes()).hexdigest()
+
+    def validator(self, schema_id: str) -> Draft202012Validator:
+        # compilado una vez por schema_id y reutilizado
+        v = self._validators.get(schema_id)
+        if v is None:
+            v = Draft202012Validator(self.load_schema(schema_id))
+            self._validators[schema_id] = v
+        return v
 
 
 def validate_payload(
@@ -18,5 +67,9 @@ def validate_payload(
 ) -> None:
     if payload.get("schema_id") != schema_id:
         raise ValueError("schema_id mismatch")
-    schema = registry.load_schema(schema_id)
-    Draft202012Validator(schema).validate(payload)
+    seen = registry.seen
+    registry.seen += 1
+    if not registry.policy.should_validate(seen):
+        return
+    registry.validator(schema_id).validate(payload)
+    registry.validated += 1
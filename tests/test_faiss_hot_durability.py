@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from dmr.index import FaissHNSWHotIndex, HotIndexSnapshotter, PackedHotIndex
+from dmr.index import faiss_hot, packed_hot
+
+
+def _vecs(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+
+def test_wal_replay_recovers_unsnapshotted_adds(tmp_path: Path) -> None:
+    dim, user = 16, "T:U"
+    vs = _vecs(12, dim)
+    q = vs[3]
+
+    idx1 = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    for v in vs[:5]:
+        idx1.add(user, v)
+    idx1.persist(user)
+    for v in vs[5:]:
+        idx1.add(user, v)  # solo en el WAL
+    assert idx1.dirty_users() == [user]
+    want = idx1.search_rerank_exact(user, q, k_candidates=12)
+
+    # "caída": otra instancia sobre el mismo directorio, sin snapshot final
+    idx2 = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    assert idx2.search_rerank_exact(user, q, k_candidates=12) == want
+    assert idx2.dirty_users() == [user]
+
+    # el snapshot vacía el WAL y la siguiente carga no reaplica nada
+    assert idx2.snapshot_dirty() == 1
+    assert os.path.getsize(tmp_path / "T_U.wal") == 0
+    idx3 = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    assert idx3.search_rerank_exact(user, q, k_candidates=12) == want
+    assert idx3.dirty_users() == []
+
+
+def test_wal_skips_covered_records_and_torn_tail(tmp_path: Path) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(4, dim, seed=1)
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    for v in vs[:3]:
+        idx.add(user, v)
+    wal = tmp_path / "T_U.wal"
+    kept = wal.read_bytes()
+    # caída entre el rename del snapshot y el vaciado del WAL
+    idx.persist(user)
+    wal.write_bytes(kept)
+    idx.add(user, vs[3])
+    # y un registro a medio escribir al final
+    with open(wal, "ab") as f:
+        f.write(wal.read_bytes()[-20:])
+
+    again = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    assert again.search_candidates(user, vs[3], 4)[0] == 3
+    assert again._idx[user].ntotal == 4
+
+
+def test_snapshotter_flushes_dirty_on_stop(tmp_path: Path) -> None:
+    dim = 8
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    snap = HotIndexSnapshotter(idx, interval_s=3600)
+    snap.start()
+    for u in ("T:a", "T:b"):
+        idx.add(u, _vecs(1, dim)[0])
+    snap.stop()
+    assert idx.dirty_users() == []
+    assert sorted(p.name for p in tmp_path.glob("*.faiss")) == [
+        "T_a.faiss",
+        "T_b.faiss",
+    ]
+    assert not list(tmp_path.glob(".snapshot-*"))
+
+    # sin WAL, el snapshot basta para reconstruir
+    for p in tmp_path.glob("*.wal"):
+        p.unlink()
+    shutil.copytree(tmp_path, tmp_path / "copy")
+    again = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path / "copy"))
+    assert again.search_candidates("T:a", _vecs(1, dim)[0], 1) == [0]
+
+
+@pytest.mark.parametrize(
+    "cls, module", [(FaissHNSWHotIndex, faiss_hot), (PackedHotIndex, packed_hot)]
+)
+def test_snapshot_io_runs_outside_index_lock(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, cls, module
+) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(3, dim, seed=2)
+    idx = cls(dim=dim, index_dir=str(tmp_path))
+    idx.add(user, vs[0])
+    idx.add(user, vs[1])
+
+    write = module.write_bytes_atomic
+    added = []
+
+    def slow_write(data, path):
+        # un add durante la escritura del snapshot no espera al fsync
+        if not added:
+            t = threading.Thread(target=lambda: added.append(idx.add(user, vs[2])))
+            t.start()
+            t.join(timeout=5)
+            assert added == [2]
+        write(data, path)
+
+    monkeypatch.setattr(module, "write_bytes_atomic", slow_write)
+    idx.persist(user)
+    monkeypatch.setattr(module, "write_bytes_atomic", write)
+
+    # el snapshot no cubre el add concurrente: su registro sigue en el WAL
+    again = cls(dim=dim, index_dir=str(tmp_path))
+    assert sorted(again.search_candidates(user, vs[2], 3)) == [0, 1, 2]
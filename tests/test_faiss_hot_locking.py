@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from dmr.index.faiss_hot import FaissHNSWHotIndex, RWLock
+
+
+def _vec(dim: int, x: float) -> np.ndarray:
+    v = np.zeros((dim,), dtype=np.float32)
+    v[0] = x
+    return v
+
+
+# lock_stripes=1: todos los usuarios en la misma franja que el que se carga
+@pytest.mark.parametrize("stripes", [256, 1])
+def test_slow_load_does_not_block_other_users(tmp_path: Path, stripes: int) -> None:
+    dim = 8
+    seed = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    seed.add("T:slow", _vec(dim, 1.0), persist=True)
+
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), lock_stripes=stripes)
+    idx.add("T:fast", _vec(dim, 1.0))
+
+    entered, release = threading.Event(), threading.Event()
+    real_read = idx._read_index
+
+    def slow_read(path: str):
+        entered.set()
+        release.wait(5.0)
+        return real_read(path)
+
+    idx._read_index = slow_read  # type: ignore[method-assign]
+    loader = threading.Thread(
+        target=idx.search_candidates, args=("T:slow", _vec(dim, 1.0), 1)
+    )
+    loader.start()
+    try:
+        assert entered.wait(5.0)
+        # con la carga de T:slow en curso, T:fast sigue buscando y escribiendo
+        assert idx.search_candidates("T:fast", _vec(dim, 1.0), 1) == [0]
+        assert idx.add("T:fast", _vec(dim, 2.0)) == 1
+        assert idx.add("T:new", _vec(dim, 3.0)) == 0
+    finally:
+        release.set()
+        loader.join(5.0)
+    assert idx.search_candidates("T:slow", _vec(dim, 1.0), 1) == [0]
+    assert idx._loading == {}
+
+
+def test_rwlock_readers_share_writer_excludes() -> None:
+    lk = RWLock()
+    both_in = threading.Barrier(2, timeout=5.0)
+
+    def reader() -> None:
+        with lk.read():
+            both_in.wait()  # solo pasa si los dos lectores están dentro a la vez
+
+    ts = [threading.Thread(target=reader) for _ in range(2)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join(5.0)
+    assert not both_in.broken
+
+    order = []
+
+    def writer() -> None:
+        with lk.write():
+            order.append("w")
+
+    with lk.read():
+        w = threading.Thread(target=writer)
+        w.start()
+        w.join(0.2)
+        order.append("r")
+    w.join(5.0)
+    assert order == ["r", "w"]
+
+
+def test_concurrent_adds_keep_every_vector(tmp_path: Path) -> None:
+    dim = 8
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+
+    def work(u: int) -> None:
+        for j in range(25):
+            idx.add(f"T:{u % 3}", _vec(dim, float(j)))
+            idx.search_candidates(f"T:{u % 3}", _vec(dim, 1.0), 3)
+
+    ts = [threading.Thread(target=work, args=(u,)) for u in range(6)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join(30.0)
+    assert [idx._idx[f"T:{u}"].ntotal for u in range(3)] == [50, 50, 50]
+
+
+def test_lru_budget_evicts_with_writeback_and_reloads(tmp_path: Path) -> None:
+    from dmr.index.faiss_hot import estimate_index_bytes
+    from dmr.metrics import HOT_EVICTIONS, HOT_RELOADS
+
+    dim = 8
+    one = estimate_index_bytes(2, dim, m=0)  # por debajo del umbral: flat
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), max_bytes=2 * one)
+    ev0, rl0 = HOT_EVICTIONS._value.get(), HOT_RELOADS._value.get()
+
+    for u in ("T:a", "T:b"):
+        idx.add(u, _vec(dim, 1.0))
+        idx.add(u, _vec(dim, 2.0))
+    assert idx.resident_users() == ["T:a", "T:b"]
+    assert idx.resident_bytes() == 2 * one
+
+    idx.search_candidates("T:a", _vec(dim, 1.0), 1)  # T:b pasa a ser el LRU
+    idx.add("T:c", _vec(dim, 1.0))
+    assert idx.resident_users() == ["T:a", "T:c"]
+    assert HOT_EVICTIONS._value.get() - ev0 == 1
+
+    # T:b nunca se persistió: la expulsión lo escribe y la recarga lo recupera
+    assert idx.search_candidates("T:b", _vec(dim, 2.0), 2) == [1, 0]
+    assert HOT_RELOADS._value.get() - rl0 == 1
+    assert idx.resident_bytes() <= 2 * one
+
+
+def test_user_locks_are_striped_and_bounded(tmp_path: Path) -> None:
+    dim = 8
+    # 80 usuarios, expulsados casi en cada add, sobre 4 locks compartidos
+    idx = FaissHNSWHotIndex(
+        dim=dim, index_dir=str(tmp_path), max_bytes=1, lock_stripes=4
+    )
+
+    def work(u: int) -> None:
+        for j in range(10):
+            idx.add(f"T:{u}-{j}", _vec(dim, float(j)))
+            idx.search_candidates(f"T:{(u + 1) % 8}-{j}", _vec(dim, 1.0), 1)
+
+    ts = [threading.Thread(target=work, args=(u,)) for u in range(8)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join(30.0)
+    assert len(idx._user_locks) == 4
+    idx.add("T:last", _vec(dim, 1.0))
+    assert idx.resident_users() == ["T:last"]
+    assert all(
+        idx.search_candidates(f"T:{u}-{j}", _vec(dim, float(j)), 1) == [0]
+        for u in range(8)
+        for j in range(10)
+    )
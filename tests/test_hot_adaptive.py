@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from dmr.cli.calibrate_hot import calibrate, suggest_flat_threshold
+from dmr.index.ef_model import EfCostModel
+from dmr.index.faiss_hot import FaissHNSWHotIndex, is_hnsw
+
+
+def _vecs(n: int, dim: int) -> np.ndarray:
+    return np.random.default_rng(3).random((n, dim), dtype=np.float32)
+
+
+def test_flat_below_threshold_then_hnsw(tmp_path: Path) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(12, dim)
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), flat_threshold=8)
+    for j, v in enumerate(vs[:8]):
+        assert idx.add(user, v) == j
+    assert not is_hnsw(idx._idx[user])
+    assert idx.add(user, vs[8]) == 8
+    assert is_hnsw(idx._idx[user])
+    for v in vs[9:]:
+        idx.add(user, v)
+    # las posiciones no cambian con el paso a HNSW
+    assert [idx.search_candidates(user, v, 1)[0] for v in vs] == list(range(12))
+
+
+@pytest.mark.parametrize("persist_at", [None, 5, 10])
+def test_upgrade_is_deterministic_across_restart(tmp_path: Path, persist_at) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(40, dim)
+    q = vs[7] + 0.01
+    live = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path / "a"), flat_threshold=16)
+    crash = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path / "b"), flat_threshold=16)
+    for j, v in enumerate(vs):
+        live.add(user, v)
+        crash.add(user, v, persist=(j + 1 == persist_at))
+    want = live.search_rerank_exact(user, q, k_candidates=10)
+
+    # snapshot (flat o ninguno) + WAL reaplicado cruzando el umbral
+    again = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path / "b"), flat_threshold=16)
+    assert again.search_rerank_exact(user, q, k_candidates=10) == want
+    assert is_hnsw(again._idx[user])
+
+
+_TABLE = [
+    {"ntotal": 1000, "ef": 16, "ms_p99": 0.05, "recall": 0.90},
+    {"ntotal": 1000, "ef": 32, "ms_p99": 0.08, "recall": 0.99},
+    {"ntotal": 1000, "ef": 64, "ms_p99": 0.15, "recall": 1.0},
+    {"ntotal": 10000, "ef": 16, "ms_p99": 0.10, "recall": 0.80},
+    {"ntotal": 10000, "ef": 64, "ms_p99": 0.30, "recall": 0.95},
+    {"ntotal": 10000, "ef": 128, "ms_p99": 0.60, "recall": 0.995},
+]
+
+
+def test_ef_model_picks_from_budget() -> None:
+    m = EfCostModel(_TABLE, recall_target=0.99, default_ef=64)
+    assert m.choose_ef(5000, None, k=10) == 64
+    # menor ef que alcanza el recall dentro del presupuesto
+    assert m.choose_ef(5000, 1.0, k=10) == 32
+    # nada alcanza el recall: el mayor ef que cabe
+    assert m.choose_ef(20000, 0.4, k=10) == 64
+    # ni el menor cabe: el menor ef (nunca por debajo de k)
+    assert m.choose_ef(20000, 0.01, k=10) == 16
+    assert m.choose_ef(20000, 0.01, k=20) == 20
+    # tamaños por debajo del menor calibrado usan esa fila
+    assert m.choose_ef(10, 0.06, k=5) == 16
+
+
+def test_calibration_table_feeds_model(tmp_path: Path) -> None:
+    table = calibrate(sizes=(50, 300), efs=(16, 64), dim=8, queries=10, k=5)
+    assert [r["ntotal"] for r in table["flat"]] == [50, 300]
+    assert len(table["hnsw"]) == 4
+    assert all(0.0 <= r["recall"] <= 1.0 for r in table["hnsw"])
+    model = EfCostModel.from_table(table)
+
+    idx = FaissHNSWHotIndex(
+        dim=8, index_dir=str(tmp_path), flat_threshold=16, ef_model=model
+    )
+    vs = _vecs(64, 8)
+    for v in vs:
+        idx.add("T:U", v)
+    assert len(idx.search_rerank_exact("T:U", vs[0], 5, budget_ms=0.001)) == 5
+    assert idx.search_candidates("T:U", vs[0], 5, budget_ms=100.0)[0] == 0
+
+
+def test_calibration_sample_without_replacement() -> None:
+    sample = _vecs(60, 8)
+    table = calibrate(
+        sizes=(20, 50, 100), efs=(16,), dim=8, queries=10, k=5, vectors=sample
+    )
+    # 100 no cabe en las 50 filas que quedan tras apartar las consultas
+    assert [r["ntotal"] for r in table["flat"]] == [20, 50]
+    # base completa y consultas disjuntas: HNSW con ef alto es exacto
+    assert all(r["recall"] == 1.0 for r in table["hnsw"] if r["ntotal"] == 20)
+    with pytest.raises(ValueError):
+        calibrate(sizes=(5,), efs=(16,), queries=10, vectors=sample[:10])
+
+
+def test_suggested_flat_threshold_is_first_crossover() -> None:
+    flat = [
+        {"ntotal": 100, "ms_p99": 0.01},
+        {"ntotal": 1000, "ms_p99": 0.10},
+        {"ntotal": 10000, "ms_p99": 0.05},  # ruido: no salta el cruce anterior
+    ]
+    hnsw = [
+        {"ntotal": 100, "ef": 16, "ms_p99": 0.02, "recall": 1.0},
+        {"ntotal": 1000, "ef": 16, "ms_p99": 0.05, "recall": 1.0},
+        {"ntotal": 10000, "ef": 16, "ms_p99": 0.08, "recall": 1.0},
+    ]
+    assert suggest_flat_threshold(flat, hnsw, 0.99) == 100
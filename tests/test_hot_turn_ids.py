@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import faiss
+import numpy as np
+
+from dmr.index import FaissHNSWHotIndex, PackedHotIndex
+from dmr.index.faiss_hot import is_hnsw, turn_vector_id
+
+
+def _vecs(n: int, dim: int) -> np.ndarray:
+    return np.random.default_rng(5).random((n, dim), dtype=np.float32)
+
+
+def test_turn_ids_survive_restart_wal_and_upgrade(tmp_path: Path) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(30, dim)
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), flat_threshold=16)
+    for j, v in enumerate(vs):
+        # snapshot en flat; el resto (cruce a HNSW incluido) solo en el WAL
+        vid = idx.add(user, v, persist=(j == 9), turn_id=f"turn-{j}")
+        assert vid == turn_vector_id(f"turn-{j}")
+    # reintento del mismo turno: no duplica el vector
+    assert idx.add(user, vs[3], turn_id="turn-3") == turn_vector_id("turn-3")
+    assert int(idx._idx[user].ntotal) == 30
+
+    want = [idx.search_turns(user, v, k_candidates=3) for v in vs]
+    assert [w[0][0] for w in want] == [f"turn-{j}" for j in range(30)]
+
+    again = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), flat_threshold=16)
+    assert [again.search_turns(user, v, k_candidates=3) for v in vs] == want
+    assert is_hnsw(again._idx[user])
+    again.snapshot_dirty()
+    third = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), flat_threshold=16)
+    assert [third.search_turns(user, v, k_candidates=3) for v in vs] == want
+
+
+def test_index_without_ids_loads_positional(tmp_path: Path) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(5, dim)
+    old = faiss.IndexFlatL2(dim)
+    old.add(vs)
+    faiss.write_index(old, str(tmp_path / "T_U.faiss"))
+
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    assert [idx.search_candidates(user, v, 1)[0] for v in vs] == list(range(5))
+    # sin turn_id conocido no hay turnos que devolver
+    assert idx.search_turns(user, vs[0]) == []
+    idx.add(user, vs[0] + 1.0, turn_id="new")
+    assert idx.search_turns(user, vs[0] + 1.0, k_candidates=1) == [("new", 0.0)]
+
+
+def test_index_without_ids_migrates_turns_from_idxmap(tmp_path: Path) -> None:
+    dim, user = 8, "T:U"
+    vs = _vecs(5, dim)
+    old = faiss.IndexFlatL2(dim)
+    old.add(vs)
+    faiss.write_index(old, str(tmp_path / "T_U.faiss"))
+    # idxmap de Redis: posición -> turn_id (la 4 nunca se registró)
+    idxmap = {user: ["a", "b", "c", "a"]}
+    calls = []
+
+    def legacy_turns(user_key: str, n: int):
+        calls.append((user_key, n))
+        return (idxmap[user_key] + [None] * n)[:n]
+
+    idx = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path), legacy_turns=legacy_turns)
+    got = [idx.search_turns(user, v, k_candidates=1) for v in vs]
+    assert [g[0][0] if g else None for g in got] == ["a", "b", "c", None, None]
+    assert calls == [(user, 5)]
+    assert idx.dirty_users() == [user]
+
+    # migrado y persistido: ya no hace falta el idxmap
+    idx.snapshot_dirty()
+    again = FaissHNSWHotIndex(dim=dim, index_dir=str(tmp_path))
+    assert [again.search_turns(user, v, k_candidates=1) for v in vs] == got
+
+
+def test_packed_search_turns_persists(tmp_path: Path) -> None:
+    dim = 8
+    vs = _vecs(6, dim)
+    idx = PackedHotIndex(dim=dim, index_dir=str(tmp_path), partitions=2)
+    for j, v in enumerate(vs):
+        assert idx.add(f"T:u{j % 2}", v, turn_id=f"t{j}") == j // 2
+    assert idx.add("T:u0", vs[0], turn_id="t0") == 0
+    assert idx.user_size("T:u0") == 3
+    want = [
+        idx.search_turns(f"T:u{j % 2}", v, k_candidates=2) for j, v in enumerate(vs)
+    ]
+    assert [w[0] for w in want] == [(f"t{j}", 0.0) for j in range(6)]
+    for j, w in enumerate(want):
+        # solo turnos del propio usuario
+        assert {t for t, _ in w} <= {f"t{i}" for i in range(j % 2, 6, 2)}
+
+    idx.snapshot_dirty()
+    again = PackedHotIndex(dim=dim, index_dir=str(tmp_path), partitions=2)
+    assert [
+        again.search_turns(f"T:u{j % 2}", v, k_candidates=2) for j, v in enumerate(vs)
+    ] == want
+
+
+def test_packed_wal_replays_unsnapshotted_adds(tmp_path: Path) -> None:
+    dim = 8
+    vs = _vecs(8, dim)
+    idx = PackedHotIndex(dim=dim, index_dir=str(tmp_path), partitions=2)
+    # snapshot con la mitad; el resto (usuario nuevo incluido) solo en el WAL
+    for j in range(4):
+        idx.add(f"T:u{j % 2}", vs[j], persist=(j == 3), turn_id=f"t{j}")
+    for j in range(4, 8):
+        idx.add(f"T:u{j % 3}", vs[j], turn_id=f"t{j}")
+    users = [f"T:u{j % 2}" for j in range(4)] + [f"T:u{j % 3}" for j in range(4, 8)]
+    want = [idx.search_turns(u, v, k_candidates=3) for u, v in zip(users, vs)]
+    assert [w[0][0] for w in want] == [f"t{j}" for j in range(8)]
+
+    again = PackedHotIndex(dim=dim, index_dir=str(tmp_path), partitions=2)
+    assert [again.search_turns(u, v, k_candidates=3) for u, v in zip(users, vs)] == want
+    assert again.add("T:u2", vs[5], turn_id="t5") == 0  # sin duplicar
+    assert again.snapshot_dirty() >= 1
+    third = PackedHotIndex(dim=dim, index_dir=str(tmp_path), partitions=2)
+    assert [third.search_turns(u, v, k_candidates=3) for u, v in zip(users, vs)] == want
@@ -41,7 +41,7 @@ def test_no_saturation_contract(tmp_path):
     for i in range(500):
         text = f"Human: key_{i}=value_{i}\nAI: ok"
         v = vectorizer.text_to_vector(text).astype(np.float32)
-        hot_index.add(user_key, v, persist=False)
+        hot_index.add(user_key, v, persist=False, turn_id=f"h{i}")
         hot_storage.put_turn(user_key, f"h{i}", text, f"sig{i:04d}", now + i)
 
     hot_index.persist(user_key)
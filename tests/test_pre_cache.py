@@ -0,0 +1,177 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+import json
+import os
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from dmr.core.pre_cache import PreResponseCache, pre_cache_key
+from dmr.core.retrieval import RetrievalResult
+from dmr.metrics import PRE_CACHE
+
+POLICY = {"threshold": 0.6, "k_final": 5}
+
+
+def _count(result: str) -> float:
+    return PRE_CACHE.labels(result=result)._value.get()
+
+
+async def _exercise(cache: PreResponseCache) -> None:
+    key = pre_cache_key("alpha", POLICY)
+    assert key != pre_cache_key("alpha", {**POLICY, "k_final": 6})
+
+    epoch, got = await cache.get("t:u", key)
+    assert got is None
+    await cache.put("t:u", epoch, key, {"pack_signature": "s1"})
+    assert (await cache.get("t:u", key))[1] == {"pack_signature": "s1"}
+    # otro usuario no comparte entradas
+    assert (await cache.get("t:v", key))[1] is None
+
+    # una /pre lenta que leyó la época antes de un /post no contamina la nueva
+    stale_epoch = await cache.epoch("t:u")
+    await cache.bump("t:u")
+    await cache.put("t:u", stale_epoch, key, {"pack_signature": "stale"})
+    assert (await cache.get("t:u", key))[1] is None
+
+
+def test_pre_cache_local_epochs_and_metrics():
+    hits, misses = _count("hit"), _count("miss")
+    asyncio.run(_exercise(PreResponseCache(max_entries=8)))
+    assert _count("hit") - hits == 1
+    assert _count("miss") - misses == 3
+
+
+def test_pre_cache_local_is_bounded():
+    cache = PreResponseCache(max_entries=2)
+
+    async def run():
+        for q in ("a", "b", "c"):
+            await cache.put("t:u", 0, pre_cache_key(q, POLICY), {"q": q})
+        return [(await cache.get("t:u", pre_cache_key(q, POLICY)))[1] for q in "abc"]
+
+    assert asyncio.run(run()) == [None, {"q": "b"}, {"q": "c"}]
+
+
+def test_pre_cache_local_ttl_and_bounded_epochs(monkeypatch):
+    cache = PreResponseCache(max_entries=2, ttl_s=10)
+    key = pre_cache_key("a", POLICY)
+    now = [1000.0]
+    monkeypatch.setattr("dmr.core.pre_cache.time.monotonic", lambda: now[0])
+
+    async def run():
+        epoch, _ = await cache.get("t:u", key)
+        await cache.put("t:u", epoch, key, {"q": "a"})
+        assert (await cache.get("t:u", key))[1] == {"q": "a"}
+        now[0] += 11
+        assert (await cache.get("t:u", key))[1] is None
+
+        # una época expulsada nunca vuelve a una anterior a su último bump
+        e = await cache.bump("t:u")
+        await cache.put("t:u", e, key, {"q": "fresh"})
+        stale = await cache.epoch("t:u")
+        await cache.bump("t:u")
+        await cache.put("t:u", stale, key, {"q": "stale"})
+        await cache.bump("t:v")
+        await cache.bump("t:w")
+        assert "t:u" not in cache._epochs and len(cache._epochs) == 2
+        assert await cache.epoch("t:u") > stale
+        assert (await cache.get("t:u", key))[1] is None
+
+    asyncio.run(run())
+
+
+def test_pre_cache_shared_via_redis():
+    url = os.environ.get("DMR_TEST_REDIS_URL", "").strip()
+    if not url:
+        return
+
+    import redis.asyncio as aioredis
+
+    async def run():
+        r = aioredis.Redis.from_url(url, decode_responses=True)
+        try:
+            await r.ping()
+        except Exception:
+            return
+        async for k in r.scan_iter("dmr_test_pre:*"):
+            await r.delete(k)
+        await _exercise(PreResponseCache(redis=r, prefix="dmr_test_pre"))
+        # otra réplica ve la misma época y las mismas entradas
+        other = PreResponseCache(redis=r, prefix="dmr_test_pre")
+        key = pre_cache_key("alpha", POLICY)
+        epoch, _ = await other.get("t:u", key)
+        await other.put("t:u", epoch, key, {"pack_signature": "s2"})
+        mine = PreResponseCache(redis=r, prefix="dmr_test_pre")
+        assert (await mine.get("t:u", key))[1] == {"pack_signature": "s2"}
+        await r.aclose()
+
+    asyncio.run(run())
+
+
+class _DownRedis:
+    async def get(self, *a, **k):
+        raise RedisConnectionError("redis down")
+
+    async def set(self, *a, **k):
+        raise RedisConnectionError("redis down")
+
+
+class _Retriever:
+    async def retrieve_with_status(self, tenant_id, user_id, query):
+        return RetrievalResult(evidence=[], degraded=())
+
+
+async def _asgi_post(app, path: str, body: dict):
+    sent = []
+    raw = json.dumps(body).encode("utf-8")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "client": ("test", 0),
+        "server": ("test", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": raw, "more_body": False}
+
+    async def send(msg):
+        sent.append(msg)
+
+    await app(scope, receive, send)
+    status = next(m["status"] for m in sent if m["type"] == "http.response.start")
+    data = b"".join(
+        m.get("body", b"") for m in sent if m["type"] == "http.response.body"
+    )
+    return status, json.loads(data)
+
+
+def test_pre_survives_redis_outage(tmp_path, monkeypatch):
+    monkeypatch.setenv("DMR_COLD_SQLITE", str(tmp_path / "cold.sqlite3"))
+    monkeypatch.setenv("DMR_FAISS_DIR", str(tmp_path / "hot"))
+    A = importlib.import_module("dmr.api.app")
+    monkeypatch.setattr(A, "retriever", _Retriever())
+    monkeypatch.setattr(A, "pre_cache", PreResponseCache(redis=_DownRedis()))
+
+    errors = _count("get_error")
+    body = {"tenant_id": "t", "user_id": "u", "query": "alpha"}
+    for _ in range(2):
+        status, out = asyncio.run(_asgi_post(A.app, "/pre", body))
+        assert status == 200
+        assert out["evidence"] == [] and out["degraded"] == []
+    # get fallido = miss; sin época conocida no se intenta guardar
+    assert _count("get_error") - errors == 2
+
+    puts = _count("put_error")
+    cache = PreResponseCache(redis=_DownRedis())
+    asyncio.run(cache.put("t:u", 3, "k", {"q": "a"}))
+    assert _count("put_error") - puts == 1
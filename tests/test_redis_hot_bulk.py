@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import os
+
+import redis
+
+from dmr.storage.redis_hot import RedisHotStorage
+
+
+def test_fetch_hot_declares_every_key():
+    hot = RedisHotStorage(redis.Redis(), prefix="p")
+    assert hot._fetch_hot_keys("t:u", ["a", "b"]) == [
+        "p:tomb:t:u",
+        "p:turn:t:u:a",
+        "p:turn:t:u:b",
+    ]
+    assert hot._fetch_hot_args(["a", "b"]) == ["a", "b"]
+
+
+def test_fetch_hot_single_round_trip_filters_tombstones():
+    url = os.environ.get("DMR_TEST_REDIS_URL", "").strip()
+    if not url:
+        return
+
+    r = redis.Redis.from_url(url, decode_responses=True)
+    try:
+        r.ping()
+    except Exception:
+        return
+
+    for k in r.scan_iter("dmr_test_bulk:*"):
+        r.delete(k)
+
+    hot = RedisHotStorage(r, prefix="dmr_test_bulk")
+    user_key = "t:u"
+    for i in range(5):
+        hot.put_turn(user_key, f"h{i}", f"text {i}", f"s{i}", 10.0 + i)
+    assert hot.tombstone(user_key, "h2") is True
+    assert hot.tombstone(user_key, "missing") is False
+
+    got = hot.fetch_hot(user_key, ["h4", "h2", "h0", "missing"])
+    assert got[1] is None and got[3] is None
+    assert got[0] == {"turn_id": "h4", "text": "text 4", "signature": "s4", "ts": 14.0}
+    # mismo resultado que el camino de varias llamadas
+    assert got[2] == {"turn_id": "h0", **hot.get_turn(user_key, "h0")}
+    assert hot.tombstoned(user_key, "h2")
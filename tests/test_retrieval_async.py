@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import List, Optional
+
+import numpy as np
+
+from dmr.core.retrieval import (
+    AsyncDeterministicRetriever,
+    DeterministicRetriever,
+    RetrievalPolicy,
+)
+from dmr.storage.cold_sqlite import ColdRow, SQLiteColdStore
+
+
+class _Vectorizer:
+    def text_to_vector(self, text: str) -> np.ndarray:
+        return np.zeros(4, dtype=np.float32)
+
+
+class _HotIndex:
+    def __init__(self, delay_s: float = 0.0) -> None:
+        self.delay_s = delay_s
+
+    def search_turns(
+        self, user_key: str, q: np.ndarray, k_candidates: int, budget_ms=None
+    ):
+        time.sleep(self.delay_s)
+        return [("h2", 0.5), ("h0", 0.25), ("h1", 0.0)]
+
+
+def _recs(turn_ids) -> List[Optional[dict]]:
+    # h1 "tombstoned"
+    return [
+        None
+        if t == "h1"
+        else {"turn_id": t, "signature": f"s{t[1:]}", "text": f"hot alpha {t[1:]}"}
+        for t in turn_ids
+    ]
+
+
+class _SyncHot:
+    def fetch_hot(self, user_key, turn_ids):
+        return _recs(turn_ids)
+
+
+class _AsyncHot:
+    async def fetch_hot(self, user_key, turn_ids):
+        await asyncio.sleep(0)
+        return _recs(turn_ids)
+
+
+def _cold(tmp_path) -> SQLiteColdStore:
+    db = SQLiteColdStore(path=str(tmp_path / "cold.sqlite3"))
+    db.put_many(
+        [
+            ColdRow("t", "u", f"c{i}", f"cs{i}", float(i), f"Human: alpha {i}\nAI: ok")
+            for i in range(3)
+        ]
+    )
+    return db
+
+
+def test_async_retriever_matches_sync(tmp_path):
+    policy = RetrievalPolicy(threshold=0.1, k_final=4, budget_ms_hot=500.0)
+    cold = _cold(tmp_path)
+    sync = DeterministicRetriever(_Vectorizer(), _HotIndex(), _SyncHot(), cold, policy)
+    aio = AsyncDeterministicRetriever(
+        _Vectorizer(), _HotIndex(), _AsyncHot(), cold, policy, max_workers=2
+    )
+    a = sync.retrieve_with_status("t", "u", "alpha")
+    b = asyncio.run(aio.retrieve_with_status("t", "u", "alpha"))
+    assert a == b
+    assert b.degraded == ()
+    assert "h1" not in [e.turn_id for e in b.evidence]
+    sync.close()
+    aio.close()
+
+
+def test_async_retriever_drops_late_tier(tmp_path):
+    policy = RetrievalPolicy(threshold=0.1, budget_ms_hot=30.0, budget_ms_cold=500.0)
+    aio = AsyncDeterministicRetriever(
+        _Vectorizer(), _HotIndex(delay_s=0.3), _AsyncHot(), _cold(tmp_path), policy
+    )
+
+    async def run():
+        t0 = time.perf_counter()
+        res = await aio.retrieve_with_status("t", "u", "alpha")
+        return res, time.perf_counter() - t0
+
+    res, took = asyncio.run(run())
+    assert took < 0.25
+    assert res.degraded == ("hot",)
+    assert {e.source for e in res.evidence} == {"cold"}
+    aio.close()
@@ -0,0 +1,232 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import time
+from typing import List, Optional
+
+import numpy as np
+import pytest
+
+from dmr.core.retrieval import (
+    AsyncDeterministicRetriever,
+    DeterministicRetriever,
+    RetrievalPolicy,
+)
+from dmr.core.signatures import pack_signature
+from dmr.storage.cold_sqlite import ColdDeadlineExceeded, ColdRow, SQLiteColdStore
+
+
+class _Vectorizer:
+    def text_to_vector(self, text: str) -> np.ndarray:
+        return np.zeros(4, dtype=np.float32)
+
+
+class _SlowHotIndex:
+    def __init__(self, delay_s: float) -> None:
+        self.delay_s = delay_s
+
+    def search_turns(
+        self, user_key: str, q: np.ndarray, k_candidates: int, budget_ms=None
+    ):
+        time.sleep(self.delay_s)
+        return [("h0", 0.0)]
+
+
+class _HotStorage:
+    def fetch_hot(self, user_key: str, turn_ids) -> List[Optional[dict]]:
+        return [
+            {"turn_id": t, "signature": "hs", "text": "hot alpha", "ts": 0.0}
+            for t in turn_ids
+        ]
+
+
+class _SlowCold:
+    def __init__(self, delay_s: float) -> None:
+        self.delay_s = delay_s
+
+    def search_fts(
+        self, tenant_id, user_id, query, limit=20, budget_ms=50.0, deadline=None
+    ):
+        time.sleep(self.delay_s)
+        return [ColdRow(tenant_id, user_id, "c0", "cs", 0.0, "cold alpha")]
+
+
+def _retriever(
+    hot_delay: float,
+    cold_delay: float,
+    budget_ms_hot: float = 50.0,
+    max_workers: int = 4,
+) -> DeterministicRetriever:
+    policy = RetrievalPolicy(
+        threshold=0.1, budget_ms_hot=budget_ms_hot, budget_ms_cold=500.0
+    )
+    return DeterministicRetriever(
+        _Vectorizer(),
+        _SlowHotIndex(hot_delay),
+        _HotStorage(),
+        _SlowCold(cold_delay),
+        policy,
+        max_workers,
+    )
+
+
+def _sig(res, policy: RetrievalPolicy) -> str:
+    return pack_signature(
+        "t",
+        "u",
+        "alpha",
+        policy.__dict__,
+        [(e.turn_id, e.signature, e.score, e.source) for e in res.evidence],
+        degraded=res.degraded,
+    )
+
+
+def test_tiers_run_concurrently_within_budget():
+    r = _retriever(hot_delay=0.1, cold_delay=0.1, budget_ms_hot=500.0)
+    t0 = time.perf_counter()
+    res = r.retrieve_with_status("t", "u", "alpha")
+    assert time.perf_counter() - t0 < 0.18  # en serie serían >= 200ms
+    assert res.degraded == ()
+    assert [(e.source, e.turn_id) for e in res.evidence] == [
+        ("hot", "h0"),
+        ("cold", "c0"),
+    ]
+    r.close()
+
+
+def test_timed_out_tier_is_dropped_and_signed():
+    full = _retriever(hot_delay=0.0, cold_delay=0.0)
+    slow = _retriever(hot_delay=0.2, cold_delay=0.0)
+    a = full.retrieve_with_status("t", "u", "alpha")
+    t0 = time.perf_counter()
+    b = slow.retrieve_with_status("t", "u", "alpha")
+    assert time.perf_counter() - t0 < 0.15  # no espera al tier hot
+    assert b.degraded == ("hot",)
+    assert [e.source for e in b.evidence] == ["cold"]
+    # misma evidencia cold, firma distinta por el tier degradado
+    cold_only = type(a)([e for e in a.evidence if e.source == "cold"])
+    assert _sig(b, slow.policy) != _sig(cold_only, full.policy)
+    assert _sig(a, full.policy) == _sig(
+        full.retrieve_with_status("t", "u", "alpha"), full.policy
+    )
+    full.close()
+    slow.close()
+
+
+class _CountingHotStorage(_HotStorage):
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def fetch_hot(self, user_key: str, turn_ids) -> List[Optional[dict]]:
+        self.calls += 1
+        return super().fetch_hot(user_key, turn_ids)
+
+
+def test_expired_hot_tier_does_not_reach_redis():
+    storage = _CountingHotStorage()
+    r = DeterministicRetriever(
+        _Vectorizer(),
+        _SlowHotIndex(0.1),
+        storage,
+        _SlowCold(0.0),
+        RetrievalPolicy(threshold=0.1, budget_ms_hot=30.0, budget_ms_cold=500.0),
+    )
+    assert r.retrieve_with_status("t", "u", "alpha").degraded == ("hot",)
+    time.sleep(0.15)  # el hilo acaba la búsqueda y no sigue hasta Redis
+    assert storage.calls == 0
+    r.close()
+
+
+def test_queue_wait_does_not_count_against_tier_budget():
+    # pool de 2 hilos ocupado 150ms: cada tier arranca dentro de su presupuesto
+    # (200ms) y tarda 100ms desde que arranca => no se degrada
+    r = _retriever(hot_delay=0.1, cold_delay=0.1, budget_ms_hot=200.0, max_workers=2)
+    for _ in range(2):
+        r._pool.submit(time.sleep, 0.15)
+    res = r.retrieve_with_status("t", "u", "alpha")
+    assert res.degraded == ()
+    assert [e.source for e in res.evidence] == ["hot", "cold"]
+
+    # si la cola supera el presupuesto, el tier no llega a ejecutarse
+    calls = []
+    r.hot_index.search_turns = lambda *a, **k: calls.append(1) or []
+    for _ in range(2):
+        r._pool.submit(time.sleep, 0.6)
+    assert r.retrieve_with_status("t", "u", "alpha").degraded == ("hot", "cold")
+    time.sleep(0.7)
+    assert calls == []
+    r.close()
+
+
+class _AsyncHotStorage:
+    async def fetch_hot(self, user_key: str, turn_ids) -> List[Optional[dict]]:
+        return _HotStorage().fetch_hot(user_key, turn_ids)
+
+
+def _big_cold(tmp_path, n: int = 30_000) -> SQLiteColdStore:
+    db = SQLiteColdStore(path=str(tmp_path / "big.sqlite3"))
+    con = sqlite3.connect(db.path)
+    con.executemany(
+        "INSERT INTO cold_fts(tenant_id,user_id,turn_id,signature,ts,text) "
+        "VALUES(?,?,?,?,?,?)",
+        [
+            ("t", "u", f"c{i}", f"cs{i}", float(i), f"alpha {i} " + "delta " * 10)
+            for i in range(n)
+        ],
+    )
+    con.commit()
+    con.close()
+    return db
+
+
+def test_cold_deadline_interrupts_sqlite_and_frees_worker(tmp_path):
+    cold = _big_cold(tmp_path)
+    t0 = time.perf_counter()
+    assert len(cold.search_fts("t", "u", "alpha", budget_ms=60_000.0)) == 20
+    full_s = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    with pytest.raises(ColdDeadlineExceeded):
+        cold.search_fts("t", "u", "alpha", budget_ms=5.0)
+    assert time.perf_counter() - t0 < full_s / 2
+
+    # un solo hilo en el executor: si la consulta cold siguiera corriendo tras
+    # su deadline, el siguiente trabajo esperaría a que terminase
+    policy = RetrievalPolicy(threshold=0.1, budget_ms_hot=500.0, budget_ms_cold=5.0)
+    aio = AsyncDeterministicRetriever(
+        _Vectorizer(), _SlowHotIndex(0.0), _AsyncHotStorage(), cold, policy, 1
+    )
+
+    async def run():
+        res = await aio.retrieve_with_status("t", "u", "alpha")
+        t0 = time.perf_counter()
+        await aio.run_blocking(time.perf_counter)
+        return res, time.perf_counter() - t0
+
+    res, wait_s = asyncio.run(run())
+    assert res.degraded == ("cold",)
+    assert [e.source for e in res.evidence] == ["hot"]
+    assert wait_s < full_s / 2
+    aio.close()
+
+
+def test_async_queue_wait_does_not_count_against_tier_budget():
+    policy = RetrievalPolicy(threshold=0.1, budget_ms_hot=200.0, budget_ms_cold=200.0)
+    aio = AsyncDeterministicRetriever(
+        _Vectorizer(), _SlowHotIndex(0.1), _AsyncHotStorage(), _SlowCold(0.1), policy, 2
+    )
+
+    async def run():
+        busy = [
+            asyncio.ensure_future(aio.run_blocking(time.sleep, 0.15)) for _ in range(2)
+        ]
+        await asyncio.sleep(0.01)
+        res = await aio.retrieve_with_status("t", "u", "alpha")
+        await asyncio.gather(*busy)
+        return res
+
+    res = asyncio.run(run())
+    assert res.degraded == ()
+    assert [e.source for e in res.evidence] == ["hot", "cold"]
+    aio.close()
@@ -1,3 +1,4 @@
+import json
 from pathlib import Path
 from memory_router.batch.runner import run_offline
 
@@ -17,3 +18,157 @@ def test_offline_runner_generate_deterministic(tmp_path: Path):
 
     assert m1["items_count"] == m2["items_count"]
     assert m1["items_hash"] == m2["items_hash"]
+
+
+def test_offline_runner_parallel_matches_serial(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    corpus = repo_root / "tests" / "fixtures" / "corpus.jsonl"
+    schemas = repo_root / "src" / "memory_router" / "config" / "schemas"
+
+    serial = run_offline(
+        corpus, tmp_path / "s", schemas, "router_v1.0.0", "trace_offline_0001"
+    )
+    parallel = run_offline(
+        corpus,
+        tmp_path / "p",
+        schemas,
+        "router_v1.0.0",
+        "trace_offline_0001",
+        workers=2,
+        chunk_size=2,
+    )
+
+    assert serial["hashes"] == parallel["hashes"]
+    assert serial["counts"] == parallel["counts"]
+    assert parallel["execution"]["workers"] == 2
+    assert parallel["execution"]["validation"] == serial["execution"]["validation"]
+    for name in ("classifier_items.json", "mini_summaries.json", "global_ranked.json"):
+        assert (tmp_path / "s" / name).read_bytes() == (
+            tmp_path / "p" / name
+        ).read_bytes()
+
+
+def test_offline_runner_stage_cache_matches_cold_run(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    corpus = repo_root / "tests" / "fixtures" / "corpus.jsonl"
+    schemas = repo_root / "src" / "memory_router" / "config" / "schemas"
+    cache = tmp_path / "cache"
+    args = (schemas, "router_v1.0.0", "trace_offline_0001")
+
+    cold = run_offline(corpus, tmp_path / "cold", *args)
+    first = run_offline(corpus, tmp_path / "c1", *args, cache_dir=cache)
+    # corpus con una fila nueva: solo esa fila falla en caché
+    grown = tmp_path / "grown.jsonl"
+    grown.write_text(
+        corpus.read_text(encoding="utf-8").rstrip("\n")
+        + '\n{"block_id": "extra", "text_block": "yo prefiero tabs"}\n',
+        encoding="utf-8",
+    )
+    warm = run_offline(corpus, tmp_path / "c2", *args, cache_dir=cache, workers=2)
+    more = run_offline(grown, tmp_path / "c3", *args, cache_dir=cache)
+
+    n = sum(1 for ln in corpus.read_text(encoding="utf-8").splitlines() if ln.strip())
+    assert first["execution"]["cache"]["stages"]["classify"]["hits"] == 0
+    assert warm["execution"]["cache"]["stages"]["classify"] == {
+        "hits": n,
+        "misses": 0,
+        "hit_ratio": 1.0,
+    }
+    assert more["execution"]["cache"]["stages"]["classify"]["misses"] == 1
+    for m in (first, warm):
+        assert m["hashes"] == cold["hashes"] and m["counts"] == cold["counts"]
+    assert (tmp_path / "cold" / "classifier_items.json").read_bytes() == (
+        tmp_path / "c2" / "classifier_items.json"
+    ).read_bytes()
+
+
+def test_offline_runner_rerun_reuses_rows_committed_before_interrupt(
+    tmp_path: Path,
+):
+    import memory_router.batch.runner as runner
+
+    repo_root = Path(__file__).resolve().parents[2]
+    corpus = repo_root / "tests" / "fixtures" / "corpus.jsonl"
+    schemas = repo_root / "src" / "memory_router" / "config" / "schemas"
+    cache = tmp_path / "cache"
+    args = (schemas, "router_v1.0.0", "trace_offline_0001")
+
+    real = runner._classify_row
+
+    def dies_at_row_3(i, *a):
+        if i == 3:
+            raise KeyboardInterrupt
+        return real(i, *a)
+
+    runner._classify_row = dies_at_row_3
+    try:
+        run_offline(corpus, tmp_path / "k", *args, cache_dir=cache, commit_every=1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        runner._classify_row = real
+
+    rerun = run_offline(corpus, tmp_path / "r", *args, cache_dir=cache)
+    cold = run_offline(corpus, tmp_path / "cold", *args)
+    # las 2 filas confirmadas antes de morir no se recalculan
+    assert rerun["execution"]["cache"]["stages"]["classify"]["hits"] == 2
+    assert rerun["hashes"] == cold["hashes"]
+
+
+def test_offline_runner_schema_edit_invalidates_stage_cache(tmp_path: Path):
+    import shutil
+
+    repo_root = Path(__file__).resolve().parents[2]
+    corpus = repo_root / "tests" / "fixtures" / "corpus.jsonl"
+    schemas = tmp_path / "schemas"
+    shutil.copytree(repo_root / "src" / "memory_router" / "config" / "schemas", schemas)
+    cache = tmp_path / "cache"
+    args = (schemas, "router_v1.0.0", "trace_offline_0001")
+
+    run_offline(corpus, tmp_path / "a", *args, cache_dir=cache)
+    # mismo config_version, schema distinto: nada del cache vale
+    reg = json.loads((schemas / "registry.json").read_text(encoding="utf-8"))
+    path = next(
+        schemas / s["path"]
+        for s in reg["schemas"]
+        if s["schema_id"] == "block_classifier.v1"
+    )
+    path.write_text(path.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    edited = run_offline(corpus, tmp_path / "b", *args, cache_dir=cache)
+
+    assert edited["execution"]["cache"]["stages"]["classify"]["hits"] == 0
+
+
+def test_offline_runner_writes_stage_profile(tmp_path: Path):
+    repo_root = Path(__file__).resolve().parents[2]
+    corpus = repo_root / "tests" / "fixtures" / "corpus.jsonl"
+    schemas = repo_root / "src" / "memory_router" / "config" / "schemas"
+    args = (schemas, "router_v1.0.0", "trace_offline_0001")
+
+    plain = run_offline(corpus, tmp_path / "a", *args)
+    profiled = run_offline(corpus, tmp_path / "b", *args, cprofile=True)
+    assert plain["hashes"] == profiled["hashes"]
+    assert "profile" not in json.dumps(profiled["execution"])
+    # sin --profile no se perfila ni se escribe nada
+    assert not (tmp_path / "a" / "run_profile.json").exists()
+
+    report = json.loads((tmp_path / "b" / "run_profile.json").read_text("utf-8"))
+    stages = report["stages"]
+    for name in (
+        "load",
+        "classify",
+        "validate",
+        "index",
+        "retrieve",
+        "summarize",
+        "write",
+    ):
+        assert stages[name]["wall_s"] >= 0.0
+        assert set(stages[name]) == {"wall_s", "cpu_s", "items", "items_per_sec"}
+    rows = [ln for ln in corpus.read_text("utf-8").splitlines() if ln.strip()]
+    assert stages["load"]["items"] == len(rows)
+    assert stages["summarize"]["items"] == plain["counts"]["mini_summaries"]
+    assert report["hottest_stage"] in stages
+    assert "process_peak_rss_kb" in report
+    assert report["cprofile"]["stage"] in stages
+    assert (tmp_path / "b" / "run_profile.prof").exists()
@@ -0,0 +1,51 @@
+from memory_router.batch.bench import compare_reports
+from memory_router.batch.synth import CorpusGenerator
+from memory_router.core.classifier import classify_block
+
+
+def test_synthetic_corpus_is_seeded_and_mixed(tmp_path):
+    a = CorpusGenerator(seed=3).write_jsonl(tmp_path / "a.jsonl", 300)
+    b = CorpusGenerator(seed=3).write_jsonl(tmp_path / "b.jsonl", 300)
+    c = CorpusGenerator(seed=4).write_jsonl(tmp_path / "c.jsonl", 300)
+    assert a.read_bytes() == b.read_bytes()
+    assert a.read_bytes() != c.read_bytes()
+
+    # la fila i no depende del tamaño pedido
+    assert (
+        list(CorpusGenerator(seed=3).rows(10))
+        == list(CorpusGenerator(seed=3).rows(300))[:10]
+    )
+
+    labels = set()
+    splits = set()
+    for row in CorpusGenerator(seed=3).rows(300):
+        r = classify_block(row["text_block"])
+        labels.update(lab.name for lab in r.labels)
+        splits.add(r.split)
+    assert {"code", "preferences", "conversation"} <= labels
+    assert "mixed" in splits
+
+
+def _report(rows_per_sec, classify_ips, rss):
+    return {
+        "sizes": {
+            "1000": {
+                "rows_per_sec": rows_per_sec,
+                "peak_rss_kb": rss,
+                "stages": {"classify": {"items_per_sec": classify_ips}},
+            }
+        }
+    }
+
+
+def test_compare_reports_flags_regressions_beyond_tolerance():
+    base = _report(1000.0, 5000.0, 50_000)
+    assert compare_reports(base, _report(900.0, 4500.0, 55_000), 0.2) == []
+
+    got = compare_reports(base, _report(700.0, 5000.0, 70_000), 0.2)
+    assert len(got) == 2
+    assert got[0].startswith("n=1000 rows_per_sec")
+    assert got[1].startswith("n=1000 peak_rss_kb")
+
+    got = compare_reports(base, _report(1000.0, 1000.0, 50_000), 0.2)
+    assert got == ["n=1000 classify.items_per_sec: 1000.0/s vs baseline 5000.0/s"]
@@ -23,3 +23,63 @@ def test_classifier_mixed_split():
         "yo prefiero Linux\n\ndef x():\n  return 1\n", code_ratio_threshold=0.2
     )
     assert r.split in ("mixed", "code-heavy")
+
+
+def _reference_classify(text_block, thr=0.30):
+    # implementación original (3 pasadas por línea, regex sin compilar)
+    import re
+
+    from memory_router.core.classifier import CODE_TOKENS, PREF_PATTERNS
+
+    def is_code(line):
+        s = line.strip()
+        if not s:
+            return False
+        if s.startswith("```") or s.startswith("#") or s.startswith("//"):
+            return True
+        return any(tok in s for tok in CODE_TOKENS)
+
+    lines = text_block.splitlines()
+    cr = sum(1 for ln in lines if is_code(ln)) / max(1, len(lines)) if lines else 0.0
+    code = [ln for ln in lines if is_code(ln)]
+    non_code = [ln for ln in lines if not is_code(ln)]
+    pref = any(re.search(p, text_block, re.IGNORECASE) for p in PREF_PATTERNS)
+    return cr, code, non_code, pref
+
+
+def test_classifier_matches_reference_implementation():
+    import random
+
+    from memory_router.core.classifier import classify_blocks
+
+    rng = random.Random(7)
+    parts = [
+        "def f(x):",
+        "  return x",
+        "# titulo",
+        "// c",
+        "```",
+        "let a = 1;",
+        "x => y",
+        "hola que tal",
+        "Yo PREFIERO vim",
+        "from now on I use tabs",
+        "ya no uso emacs",
+        "",
+        "   ",
+        "import os",
+        "texto normal",
+        "class A:",
+    ]
+    texts = [
+        "\n".join(rng.choice(parts) for _ in range(rng.randint(0, 8)))
+        for _ in range(500)
+    ]
+    got = classify_blocks(texts + texts)  # repetidos => caché
+    assert len(got) == 1000
+    for t, r, r2 in zip(texts, got, got[500:]):
+        assert r == r2 == classify_block(t)
+        cr, code, non_code, pref = _reference_classify(t)
+        assert r.code_ratio == cr
+        assert r.code_lines == code and r.non_code_lines == non_code
+        assert any(lab.name == "preferences" for lab in r.labels) == pref
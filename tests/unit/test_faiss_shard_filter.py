@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+import memory_router.core.faiss_store as faiss_store
+
+from memory_router.core import FaissShard, MemoryChunk, MemoryFilter
+
+
+def _shard(tmp_path: Path) -> FaissShard:
+    rng = np.random.RandomState(0)
+    sh = FaissShard(tmp_path, "agent1", 8)
+    sh.load()
+    for i in range(20):
+        v = rng.rand(1, 8).astype(np.float32)
+        v /= np.linalg.norm(v)
+        sh.add(
+            v,
+            MemoryChunk(
+                stable_id=i + 1,
+                agent="agent1",
+                turn_start=(i // 10) * 10 + 1,
+                turn_end=(i // 10) * 10 + 10,
+                text=f"t{i}",
+                ts_unix=1_000 + i,
+                meta={"block_id": f"b{i % 4}", "split": "code" if i % 2 else "full"},
+            ),
+        )
+    return sh
+
+
+def _brute(sh: FaissShard, q: np.ndarray, keep) -> list[int]:
+    got = sh.search(q, sh.count)
+    return [r.stable_id for r in got if keep(r)]
+
+
+def test_filtered_search_matches_overfetch_then_filter(tmp_path: Path):
+    sh = _shard(tmp_path)
+    q = np.ones((1, 8), dtype=np.float32) / np.sqrt(8.0)
+
+    flt = MemoryFilter(ts_min=1_004, ts_max=1_015, tags={"split": "code"})
+    got = [r.stable_id for r in sh.search(q, 3, flt)]
+    exp = _brute(
+        sh, q, lambda r: 1_004 <= r.ts_unix <= 1_015 and r.meta["split"] == "code"
+    )
+    assert got == exp[:3]
+
+    flt = MemoryFilter(turn_min=11, tags={"block_id": ("b0", "b1")})
+    got = [r.stable_id for r in sh.search(q, 50, flt)]
+    exp = _brute(
+        sh, q, lambda r: r.stable_id > 10 and r.meta["block_id"] in ("b0", "b1")
+    )
+    assert got == exp
+
+    assert sh.search(q, 5, MemoryFilter(tags={"split": "nope"})) == []
+
+
+def test_filter_index_survives_reload(tmp_path: Path):
+    sh = _shard(tmp_path)
+    sh.save()
+    sh2 = FaissShard(tmp_path, "agent1", 8)
+    sh2.load()
+    q = np.ones((1, 8), dtype=np.float32) / np.sqrt(8.0)
+    flt = MemoryFilter(ts_max=1_009, tags={"block_id": "b2"})
+    assert sh.search(q, 5, flt) == sh2.search(q, 5, flt)
+
+
+def test_shard_merkle_root_survives_restart(tmp_path: Path):
+    sh = _shard(tmp_path)
+    sh.save()
+    again = FaissShard(tmp_path, "agent1", 8)
+    again.load()
+    assert again.count == sh.count
+    assert again.root_hex() == sh.root_hex()
+    assert again.merkle.diff(sh.merkle) == []
+
+
+def test_shard_merkle_loads_without_rehash(tmp_path: Path, monkeypatch):
+    sh = _shard(tmp_path)
+    sh.save()
+
+    def no_rehash(*a, **k):
+        raise AssertionError("load() rehashed the leaves")
+
+    monkeypatch.setattr(faiss_store, "_chunk_digest", no_rehash)
+    again = FaissShard(tmp_path, "agent1", 8)
+    again.load()
+    assert again.root_hex() == sh.root_hex()
+    monkeypatch.undo()
+
+    # store anterior sin .merkle: se rehashea una vez y da la misma raíz
+    sh.merkle_path.unlink()
+    old = FaissShard(tmp_path, "agent1", 8)
+    old.load()
+    assert old.root_hex() == sh.root_hex()
+
+
+def test_shard_load_rejects_count_mismatch(tmp_path: Path):
+    sh = _shard(tmp_path)
+    sh.save()
+    lines = sh.meta_path.read_text(encoding="utf-8").splitlines(keepends=True)
+    sh.meta_path.write_text("".join(lines[:-1]), encoding="utf-8")
+    with pytest.raises(RuntimeError, match="20 vectors but agent1.jsonl has 19"):
+        FaissShard(tmp_path, "agent1", 8).load()
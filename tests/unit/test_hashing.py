@@ -1,5 +1,117 @@
-from memory_router.utils.hashing import sha256_hex
+import hashlib
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import pytest
+
+from memory_router.batch.streaming import JsonArrayWriter
+from memory_router.utils.hashing import ListHasher, sha256_hex
+from memory_router.utils.json_canonical import canonical_json, iter_canonical
 
 
 def test_sha256_hex_stable():
     assert sha256_hex({"a": 1, "b": 2}) == sha256_hex({"b": 2, "a": 1})
+
+
+def test_list_hasher_matches_sha256_hex():
+    items = [{"b": 1, "a": "ñ"}, [1, 2.5, None], "x"]
+    h = ListHasher()
+    for it in items:
+        h.update(it)
+    assert h.count == 3
+    assert h.hexdigest() == sha256_hex(items)
+    assert ListHasher().hexdigest() == sha256_hex([])
+
+
+def test_json_array_writer_matches_json_dumps(tmp_path):
+    items = [{"a": [1, {"b": "x\ny"}], "c": {}}, {"d": []}]
+    for n in (0, 1, 2):
+        p = tmp_path / f"out{n}.json"
+        with JsonArrayWriter(p) as w:
+            for it in items[:n]:
+                w.write(it)
+        assert p.read_text(encoding="utf-8") == json.dumps(
+            items[:n], indent=2, ensure_ascii=False
+        )
+
+
+@dataclass(frozen=True)
+class _Inner:
+    x: float
+    tags: tuple
+
+
+@dataclass(frozen=True)
+class _Outer:
+    name: str
+    inner: _Inner
+    meta: dict
+
+
+def test_streaming_canonical_matches_canonical_json():
+    objs = [
+        [],
+        {},
+        "ñ",
+        [_Outer("a", _Inner(0.1, ("t", 2)), {1: "x", "b": {3, 1}})] * 3,
+        {"z": [Path("a/b"), None, True], 2: {"k": _Inner(1e-7, ())}},
+        {"s": {"b", "a"}, "f": frozenset({1})},
+    ]
+    for obj in objs:
+        ref = canonical_json(obj)
+        for depth in (0, 1, 3):
+            assert "".join(iter_canonical(obj, depth)) == ref
+        assert sha256_hex(obj) == hashlib.sha256(ref.encode("utf-8")).hexdigest()
+
+
+def _mth(leaves):
+    # referencia RFC 6962 recalculando todo
+    if not leaves:
+        return hashlib.sha256(b"").digest()
+    if len(leaves) == 1:
+        return hashlib.sha256(b"\x00" + leaves[0]).digest()
+    k = 1 << ((len(leaves) - 1).bit_length() - 1)
+    return hashlib.sha256(b"\x01" + _mth(leaves[:k]) + _mth(leaves[k:])).digest()
+
+
+def test_merkle_log_root_and_diff():
+    from memory_router.utils.hashing import MerkleLog, item_digest
+
+    leaves = [item_digest({"i": i}) for i in range(37)]
+    a, b = MerkleLog(), MerkleLog()
+    assert a.root == _mth([])
+    for n, d in enumerate(leaves, start=1):
+        a.append(d)
+        assert a.root == _mth(leaves[:n])
+        b.append(item_digest({"i": -1}) if n - 1 in (5, 30) else d)
+
+    assert a.diff(a) == []
+    assert a.diff(b) == [5, 30]
+    c = MerkleLog()
+    for d in leaves[:33]:
+        c.append(d)
+    assert a.diff(c) == [33, 34, 35, 36]
+
+    for log in (MerkleLog(), c, a):
+        back = MerkleLog.from_bytes(log.to_bytes())
+        assert back.root == log.root and back.diff(log) == []
+    grown = MerkleLog.from_bytes(c.to_bytes())
+    for d in leaves[33:]:
+        grown.append(d)
+    assert grown.root == a.root
+    with pytest.raises(ValueError):
+        MerkleLog.from_bytes(a.to_bytes()[:-1])
+
+
+def test_index_store_merkle_roots_track_content():
+    from memory_router.core.index_store import IndexStore
+
+    s1, s2 = IndexStore(), IndexStore()
+    for s in (s1, s2):
+        s.agent("code").add("def x(): pass", 10, {"block_id": "b1"})
+        s.agent("preferences").add("prefiero vim", 11)
+    assert s1.merkle_roots() == s2.merkle_roots()
+    s2.agent("code").add("let y = 1;", 12)
+    assert s1.merkle_roots()["preferences"] == s2.merkle_roots()["preferences"]
+    assert s1.by_agent["code"].merkle.diff(s2.by_agent["code"].merkle) == [1]
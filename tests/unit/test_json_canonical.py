@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import json
+import math
+import random
+from dataclasses import asdict, dataclass, is_dataclass
+from enum import Enum, IntEnum
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+import pytest
+
+from memory_router.utils import json_canonical as jc
+
+
+# --- encoder de referencia: implementación original (asdict + isinstance) ---
+def _ref_jsonable(x: Any) -> Any:
+    if x is None or isinstance(x, (bool, int, float, str)):
+        return x
+    if isinstance(x, Path):
+        return str(x)
+    if is_dataclass(x):
+        return _ref_jsonable(asdict(x))
+    if isinstance(x, dict):
+        return {str(k): _ref_jsonable(v) for k, v in x.items()}
+    if isinstance(x, (list, tuple)):
+        return [_ref_jsonable(v) for v in x]
+    if isinstance(x, set):
+        return sorted(
+            [_ref_jsonable(v) for v in x],
+            key=lambda z: json.dumps(
+                z, sort_keys=True, separators=(",", ":"), ensure_ascii=False
+            ),
+        )
+    d = getattr(x, "__dict__", None)
+    if isinstance(d, dict):
+        clean = {k: v for k, v in d.items() if not str(k).startswith("_")}
+        return _ref_jsonable(clean)
+    return str(x)
+
+
+def _ref_dumps(obj: Any) -> str:
+    j = _ref_jsonable(obj)
+    return json.dumps(j, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+
+
+class Color(Enum):
+    RED = "r"
+
+
+class Level(IntEnum):
+    HIGH = 3
+
+
+class Plain:
+    def __init__(self, a: Any) -> None:
+        self.a = a
+        self._hidden = 1
+
+
+@dataclass(frozen=True)
+class Leaf:
+    name: str
+    score: float
+    tags: tuple
+
+
+@dataclass
+class Node:
+    leaf: Leaf
+    children: list
+    meta: dict
+
+
+FLOATS = [
+    0.0,
+    -0.0,
+    1.0,
+    0.1,
+    1e-4,
+    9.99e-5,
+    1e-7,
+    123456789012345.6,
+    1e16,
+    -2.5e20,
+    float("nan"),
+    float("inf"),
+    -float("inf"),
+    np.float64(0.25),
+    np.float64(1e-9),
+]
+STRINGS = ["", "a", "ñandú", "\x00\x1f\x7f", " ", '"\\/', "\ud800", "emoji 😀"]
+INTS = [0, -1, 2**63, -(2**63) - 1, 2**64, 10**30, True, False, Level.HIGH]
+
+
+def _rand_obj(rng: random.Random, depth: int) -> Any:
+    if depth <= 0 or rng.random() < 0.3:
+        return rng.choice(
+            FLOATS
+            + STRINGS
+            + INTS
+            + [None, Path("a/b"), Color.RED, rng.random() * 10 ** rng.randint(-8, 20)]
+        )
+    kind = rng.randrange(7)
+    if kind == 0:
+        keys = [rng.choice(STRINGS + [1, 2.5, None, True, "k"]) for _ in range(4)]
+        return {k: _rand_obj(rng, depth - 1) for k in keys}
+    if kind == 1:
+        return [_rand_obj(rng, depth - 1) for _ in range(rng.randint(0, 4))]
+    if kind == 2:
+        return tuple(_rand_obj(rng, depth - 1) for _ in range(rng.randint(0, 3)))
+    if kind == 3:
+        return {rng.choice(STRINGS[:6]), rng.randint(0, 3), rng.random()}
+    if kind == 4:
+        return Leaf(rng.choice(STRINGS), rng.choice(FLOATS), (1, "x"))
+    if kind == 5:
+        return Node(
+            Leaf("n", 0.5, ()),
+            [_rand_obj(rng, depth - 1)],
+            {"k": _rand_obj(rng, depth - 1), 7: frozenset({1})},
+        )
+    return Plain(_rand_obj(rng, depth - 1))
+
+
+def _same(a: float, b: float) -> bool:
+    return a == b or (math.isnan(a) and math.isnan(b))
+
+
+@pytest.mark.parametrize("native", [True, False])
+def test_canonical_dumps_conformance(monkeypatch, native: bool):
+    if not native:
+        monkeypatch.setattr(jc, "orjson", None)
+    rng = random.Random(2026)
+    for _ in range(3000):
+        obj = _rand_obj(rng, 4)
+        assert jc.canonical_dumps(obj) == _ref_dumps(obj)
+
+
+def test_dispatch_handles_edge_scalars():
+    for x in FLOATS:
+        assert jc.canonical_dumps(x) == _ref_dumps(x)
+        assert _same(json.loads(jc.canonical_dumps([x]))[0], float(x))
+    for x in STRINGS + INTS:
+        assert jc.canonical_dumps({"v": x}) == _ref_dumps({"v": x})
@@ -0,0 +1,176 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import sys
+from pathlib import Path
+from typing import List
+
+import numpy as np
+import pytest
+
+import memory_router.core.multi_agent as multi_agent
+from memory_router import cli_multi_agent
+from memory_router.core import MultiAgentMemorySystem
+from memory_router.core.embed_pool import EmbeddingPool
+
+# Encoder de prueba (sin sentence-transformers): bolsa de palabras con hash,
+# normalizada. Textos que comparten palabras quedan cerca => el gate pasa.
+DIM = 32
+NOW = 1_700_000_000
+
+
+class _HashEncoder:
+    def __init__(self, model_name: str) -> None:
+        self.model_name = model_name
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return DIM
+
+    def encode(
+        self, texts: List[str], convert_to_numpy=True, normalize_embeddings=True
+    ):
+        out = np.zeros((len(texts), DIM), dtype=np.float32)
+        for i, t in enumerate(texts):
+            for w in re.findall(r"\w+", t.lower()):
+                h = hashlib.sha256(w.encode("utf-8")).digest()
+                out[i, h[0] % DIM] += 1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.where(norms > 0, norms, 1.0)
+
+
+@pytest.fixture(autouse=True)
+def _stub_encoder(monkeypatch):
+    monkeypatch.setattr(multi_agent, "SentenceTransformer", _HashEncoder)
+
+
+def _turns(n: int):
+    return [
+        {
+            "stable_id": t,
+            "turn_index_1based": t,
+            "text": f"Turn {t}: prefiero Linux para dev.",
+            "ts_unix": NOW - t,
+            "meta": {"turn_end": t},
+        }
+        for t in range(1, n + 1)
+    ]
+
+
+def test_index_turns_batch_matches_single(tmp_path: Path):
+    single = MultiAgentMemorySystem(store_dir=tmp_path / "single")
+    for t in _turns(25):
+        single.index_turn(**t)
+    batch = MultiAgentMemorySystem(store_dir=tmp_path / "batch")
+    chunks = batch.index_turns(_turns(25))
+
+    assert [c.stable_id for c in chunks] == list(range(1, 26))
+    for agent in single.agents:
+        assert single.shards[agent]._chunks == batch.shards[agent]._chunks
+    assert single.merkle_roots() == batch.merkle_roots()
+
+    qs = ["Linux para dev", "prefiero Linux", "nada que ver"]
+    assert batch.query_many(qs, now_unix=NOW) == [
+        single.query(q, now_unix=NOW) for q in qs
+    ]
+
+
+def _run_cli(monkeypatch, capsys, *argv: str) -> List[dict]:
+    monkeypatch.setattr(sys, "argv", ["mem5", *argv])
+    assert cli_multi_agent.main() == 0
+    out = capsys.readouterr().out
+    return [json.loads(line) for line in out.splitlines() if line.strip()]
+
+
+def test_cli_jsonl_modes_roundtrip(tmp_path: Path, monkeypatch, capsys):
+    store = tmp_path / "store"
+    turns = tmp_path / "turns.jsonl"
+    turns.write_text(
+        "".join(
+            json.dumps(
+                {
+                    "stable_id": t["stable_id"],
+                    "turn_index": t["turn_index_1based"],
+                    "text": t["text"],
+                    "ts_unix": t["ts_unix"],
+                }
+            )
+            + "\n"
+            for t in _turns(23)
+        ),
+        encoding="utf-8",
+    )
+    got = _run_cli(
+        monkeypatch,
+        capsys,
+        "--store",
+        str(store),
+        "--mode",
+        "index-jsonl",
+        "--input",
+        str(turns),
+        "--batch-size",
+        "5",
+        "--persist-every",
+        "10",
+    )
+    assert [r["stable_id"] for r in got] == list(range(1, 24))
+    assert {r["status"] for r in got} == {"ok"}
+    assert got[0]["agent"] == "agent1" and got[10]["agent"] == "agent2"
+
+    queries = tmp_path / "queries.jsonl"
+    qs = ["Linux para dev", "prefiero Linux", "Turn 7"]
+    queries.write_text(
+        "\n".join(json.dumps({"query": q}) for q in qs) + "\n\n", encoding="utf-8"
+    )
+    monkeypatch.setattr(cli_multi_agent.time, "time", lambda: float(NOW))
+    got = _run_cli(
+        monkeypatch,
+        capsys,
+        "--store",
+        str(store),
+        "--mode",
+        "query-jsonl",
+        "--input",
+        str(queries),
+        "--batch-size",
+        "2",
+    )
+    # mismo resultado que query() sobre el store persistido por index-jsonl
+    ref = MultiAgentMemorySystem(store_dir=store)
+    assert got == [ref.query(q, now_unix=NOW) for q in qs]
+    assert any(a["passed_gate"] for a in got[0]["per_agent"])
+
+
+def test_embedding_pool_preserves_input_order():
+    # trozos de 3 repartidos entre 2 procesos: la salida sigue el orden de entrada
+    texts = [f"Turn {t}: prefiero Linux {t % 4} para dev." for t in range(1, 12)]
+    ref = _HashEncoder("stub").encode(texts)
+    with EmbeddingPool(
+        "stub", DIM, workers=2, batch_size=3, model_factory=_HashEncoder
+    ) as pool:
+        got = pool.encode(texts)
+        assert pool.encode([]).shape == (0, DIM)
+        stats = pool.worker_throughput()
+
+    assert np.array_equal(got, ref)
+    assert sum(w["items"] for w in stats) == len(texts)
+    with pytest.raises(RuntimeError):
+        pool.encode(texts)
+
+
+def test_index_turns_with_encode_pool_matches_in_process(tmp_path: Path):
+    plain = MultiAgentMemorySystem(store_dir=tmp_path / "plain")
+    plain.index_turns(_turns(12))
+    pooled = MultiAgentMemorySystem(
+        store_dir=tmp_path / "pooled", encode_workers=2, encode_batch_size=4
+    )
+    try:
+        pooled.index_turns(_turns(12))
+        # dim sale de un worker: el proceso padre no carga el modelo
+        assert pooled.encode_pool.dim == DIM
+        assert pooled._model is None
+    finally:
+        pooled.close()
+    assert pooled.merkle_roots() == plain.merkle_roots()
@@ -3,7 +3,10 @@ import pytest
 from pathlib import Path
 import hashlib
 
+import numpy as np
+
 from memory_router.core import MultiAgentMemorySystem, Budgets, Thresholds
+from memory_router.core.embed_pool import EmbeddingPool
 
 
 pytestmark = pytest.mark.embeddings
@@ -52,3 +55,43 @@ def test_multi_agent_faiss_deterministic(tmp_path: Path):
 
     assert h1 == h2
     assert out1["fused_tokens"] == out2["fused_tokens"]
+
+
+def test_index_turns_batch_matches_single_sharding(tmp_path: Path):
+    now = 1_700_000_000
+    turns = [
+        {
+            "stable_id": t,
+            "turn_index_1based": t,
+            "text": f"Turn {t}: prefiero Linux para dev.",
+            "ts_unix": now - t,
+            "meta": {"turn": t},
+        }
+        for t in range(1, 26)
+    ]
+
+    single = MultiAgentMemorySystem(store_dir=tmp_path / "single")
+    for t in turns:
+        single.index_turn(**t)
+    batch = MultiAgentMemorySystem(store_dir=tmp_path / "batch")
+    batch.index_turns(turns)
+
+    for agent in single.agents:
+        assert single.shards[agent]._chunks == batch.shards[agent]._chunks
+
+
+def test_embedding_pool_preserves_input_order(tmp_path: Path):
+    texts = [f"Turn {t}: prefiero Linux para dev." for t in range(1, 12)]
+    sys1 = MultiAgentMemorySystem(store_dir=tmp_path / "a")
+    ref = sys1._encode(texts)
+
+    pool = EmbeddingPool(sys1.model_name, ref.shape[1], workers=2, batch_size=3)
+    try:
+        got = pool.encode(texts)
+        stats = pool.worker_throughput()
+    finally:
+        pool.close()
+
+    assert got.shape == ref.shape
+    assert np.allclose(got, ref, atol=1e-5)
+    assert sum(w["items"] for w in stats) == len(texts)
@@ -1,5 +1,12 @@
+import pytest
+
 from memory_router.core.index_store import IndexStore
-from memory_router.core.retrieval import retrieve_topk, ScoreWeights
+from memory_router.core.retrieval import (
+    ScoreWeights,
+    retrieve_topk,
+    retrieve_topk_stream,
+)
+from memory_router.core.similarity import tokenize
 
 
 def test_retrieval_order_stable_tiebreak():
@@ -29,3 +36,66 @@ def test_scoring_ranges_and_priority_present():
     )
     assert all(0.0 <= x.priority <= 1.0 for x in out)
     assert all(0.0 <= x.score_global <= 1.0 for x in out)
+
+
+def test_bm25_incremental_stats_match_adhoc_and_tiebreak():
+    s = IndexStore()
+    now = 1_700_000_000
+    a = s.agent("conversation")
+    a.add("linux kernel tuning notes", ts_unix=now - 10, meta={})
+    a.add("hello world", ts_unix=now - 10, meta={})
+    a.add("hello world", ts_unix=now - 10, meta={})
+    a.add("linux linux desktop", ts_unix=now - 10, meta={})
+
+    w = ScoreWeights(scorer="bm25")
+    out = retrieve_topk(
+        "hello", a.items, now_unix=now, topk=4, weights=w, stats=s.stats
+    )
+    adhoc = retrieve_topk("hello", a.items, now_unix=now, topk=4, weights=w)
+    assert out == adhoc
+    # empate exacto => stable_id asc
+    assert [x.stable_id for x in out[:2]] == [2, 3]
+    assert out[0].match_query == 1.0
+    assert all(0.0 <= x.score_global <= 1.0 for x in out)
+
+
+def test_bm25_plus_ranks_and_rejects_unknown_scorer():
+    s = IndexStore()
+    now = 1_700_000_000
+    a = s.agent("conversation")
+    a.add("linux desktop setup", ts_unix=now, meta={})
+    a.add("windows desktop setup with many extra words here", ts_unix=now, meta={})
+
+    out = retrieve_topk(
+        "linux",
+        a.items,
+        now_unix=now,
+        topk=2,
+        weights=ScoreWeights(scorer="bm25+"),
+        stats=s.stats,
+    )
+    assert [x.stable_id for x in out] == [1, 2]
+
+    with pytest.raises(ValueError):
+        retrieve_topk("linux", a.items, now_unix=now, weights=ScoreWeights(scorer="x"))
+
+
+def test_retrieve_topk_stream_matches_retrieve_topk():
+    s = IndexStore()
+    now = 1_700_000_000
+    a = s.agent("conversation")
+    texts = ["offline query notes", "hello world", "offline_query here", "x y z"]
+    for i in range(40):
+        a.add(texts[i % 4] + f" {i % 3}", ts_unix=now - i, meta={"i": i})
+
+    df: dict = {}
+    for it in a.items:
+        for t in set(tokenize(it.text)):
+            df[t] = df.get(t, 0) + 1
+
+    for q in ("offline_query", "hello 1", "nothing"):
+        exp = retrieve_topk(q, a.items, now_unix=now, topk=7)
+        got = retrieve_topk_stream(
+            q, iter(a.items), now_unix=now, df=df, n_docs=len(a.items), topk=7
+        )
+        assert got == exp
@@ -1,5 +1,13 @@
 from pathlib import Path
-from memory_router.utils.schema_validator import SchemaRegistry, validate_payload
+
+import pytest
+from jsonschema import ValidationError
+
+from memory_router.utils.schema_validator import (
+    SchemaRegistry,
+    ValidationPolicy,
+    validate_payload,
+)
 
 
 def test_validate_block_classifier_ok():
@@ -14,3 +22,30 @@ def test_validate_block_classifier_ok():
         "notes": "ok",
     }
     validate_payload(payload, "block_classifier.v1", reg)
+
+
+def test_registry_caches_validator_and_policy_counts():
+    repo_root = Path(__file__).resolve().parents[2]
+    schemas_dir = repo_root / "src" / "memory_router" / "config" / "schemas"
+    payload = {
+        "schema_id": "block_classifier.v1",
+        "config_version": "router_v1.0.0",
+        "trace_id": "t1",
+        "labels": [{"name": "conversation", "confidence": 1.0}],
+        "notes": "ok",
+    }
+
+    reg = SchemaRegistry(schemas_dir)
+    assert reg.validator("block_classifier.v1") is reg.validator("block_classifier.v1")
+
+    sampled = SchemaRegistry(schemas_dir, ValidationPolicy("sampled", sample_every=3))
+    off = SchemaRegistry(schemas_dir, ValidationPolicy("off"))
+    for _ in range(7):
+        validate_payload(payload, "block_classifier.v1", sampled)
+        validate_payload(payload, "block_classifier.v1", off)
+    assert (sampled.seen, sampled.validated) == (7, 3)
+    assert (off.seen, off.validated) == (7, 0)
+
+    bad = dict(payload, labels="nope")
+    with pytest.raises(ValidationError):
+        validate_payload(bad, "block_classifier.v1", reg)
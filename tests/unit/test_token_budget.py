@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import random
+
+from memory_router.core.multi_agent import DeterministicFusion
+from memory_router.core.tokens import TokenBudget, _clip_to_tokens, _simple_token_count
+
+WORDS = ["Linux", "linux", "dev", "prefiero", "def", "x():", "ok", "  ", "\t"]
+
+
+def _rand_text(rng: random.Random) -> str:
+    lines = []
+    for _ in range(rng.randint(0, 4)):
+        lines.append(" ".join(rng.choice(WORDS) for _ in range(rng.randint(0, 6))))
+    return "\n".join(lines)
+
+
+def test_token_budget_matches_clip_semantics():
+    rng = random.Random(7)
+    for _ in range(500):
+        texts = [_rand_text(rng).strip() for _ in range(rng.randint(0, 4))]
+        texts = [t for t in texts if t]
+        max_tokens = rng.randint(-1, 12)
+
+        b = TokenBudget(max_tokens)
+        for t in texts:
+            if not b.feed(t):
+                break
+        expected = _clip_to_tokens("\n".join(texts), max_tokens)
+        assert b.text() == expected
+        assert b.count == _simple_token_count(expected)
+
+
+def test_fuse_budgeted_matches_fuse_then_clip():
+    rng = random.Random(11)
+    fusion = DeterministicFusion()
+    for _ in range(300):
+        per_agent_text = []
+        per_agent_budget = []
+        for i in range(rng.randint(0, 5)):
+            texts = [t for t in (_rand_text(rng).strip() for _ in range(3)) if t]
+            b = TokenBudget(rng.randint(0, 10))
+            for t in texts:
+                if not b.feed(t):
+                    break
+            key = (f"agent{i}", rng.choice([0.5, 0.7]), rng.randint(1, 3))
+            per_agent_text.append((*key, b.text()))
+            per_agent_budget.append((*key, b))
+        max_recall = rng.randint(0, 15)
+
+        expected = _clip_to_tokens(fusion.fuse(per_agent_text), max_recall)
+        got = fusion.fuse_budgeted(per_agent_budget, max_recall)
+        assert got.text() == expected
+        assert got.count == _simple_token_count(expected)